@@ -1,56 +1,100 @@
 import os, logging
 from flask import Flask, jsonify
 from flask_cors import CORS
+from flask_migrate import Migrate, stamp
+from sqlalchemy import inspect
 
 from config import config
 from models.database import db  # db + modeller bu pakette
 
-import logging
-
 # Logging ayarı
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# --- Flask & Config ---
-app = Flask(__name__)
-CORS(app, 
-     origins=['http://localhost:8000', 'http://127.0.0.1:8000'],
-     supports_credentials=True,
-     allow_headers=['Content-Type', 'Authorization', 'Access-Control-Allow-Credentials'],
-     methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-     expose_headers=['Content-Type', 'Authorization'])
+migrate = Migrate()
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+def create_app(config_name=None, **overrides):
+    """Uygulama fabrikası: flask CLI (--app app), wsgi.py ve testler buradan oluşturur.
+
+    overrides: config değerleri (testlerde geçici DB / klasörler)
+    """
+    app = Flask(__name__)
+    CORS(app,
+         origins=['http://localhost:8000', 'http://127.0.0.1:8000'],
+         supports_credentials=True,
+         allow_headers=['Content-Type', 'Authorization', 'Access-Control-Allow-Credentials', 'Upload-Offset'],
+         methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
+         expose_headers=['Content-Type', 'Authorization'])
+
+    app.config.from_object(config[config_name or os.environ.get('FLASK_ENV', 'development')])
+    app.config.update(overrides)
+
+    # DB init
+    db.init_app(app)
+    # Şema değişiklikleri: flask --app app db upgrade
+    migrate.init_app(app, db)
+
+    # Arka plan çıkarma kuyruğu
+    from services import jobs, indexing, stats, auth_cache, metrics, replica, response_cache, retrieval, changes
+    metrics.init_app(app)
+    replica.init_app(app)
+    jobs.init_app(app)
+    stats.init_app(app)
+    auth_cache.init_app(app)
+    response_cache.init_app(app)
+    indexing.init_app(app)
+    retrieval.init_app(app)
+    changes.init_app(app)
+
+    # Klasör oluştur
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    # --- Blueprints ---
+    from routes.auth_routes import auth_bp
+    from routes.document_routes import documents_bp
+    from routes.search_routes import search_bp
+    from routes.chat_routes import chat_bp
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(documents_bp, url_prefix='/api/documents')
+    app.register_blueprint(search_bp, url_prefix='/api/search')
+    app.register_blueprint(chat_bp, url_prefix='/api/chat')
 
-env = os.environ.get('FLASK_ENV', 'development')
-app.config.from_object(config[env])
+    # --- Basic routes ---
+    @app.route('/')
+    def home():
+        return jsonify({'message':'Döküman Yönetim Sistemi API','status':'active'})
 
-# DB init
-db.init_app(app)
+    @app.route('/health')
+    def health():
+        return jsonify({'status':'healthy'})
 
-# Klasör oluştur
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    @app.cli.command('init-db')
+    def init_db():
+        """Tabloları, arama şemasını ve demo kullanıcıyı oluştur.
 
-# --- Blueprints ---
-from routes.auth_routes import auth_bp
-from routes.document_routes import documents_bp
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(documents_bp, url_prefix='/api/documents')
+        Boş veritabanı migration head'i olarak işaretlenir; sonraki şema değişiklikleri db upgrade ile gelir.
+        """
+        with app.app_context():
+            fresh = not inspect(db.engine).get_table_names()
+        create_tables(app)
+        if fresh:
+            with app.app_context():
+                stamp()
 
-# --- Basic routes ---
-@app.route('/')
-def home():
-    return jsonify({'message':'Döküman Yönetim Sistemi API','status':'active'})
+    return app
 
-@app.route('/health')
-def health():
-    return jsonify({'status':'healthy'})
+def start_background(app):
+    """Bu süreçte çıkarma/indeksleme çalıştırıcılarını başlat (EXTRACTION_RUNNER=external ise no-op)"""
+    from services import jobs, indexing
+    jobs.get_runner(app).start()
+    indexing.get_indexer(app).start()
 
 # --- Create tables and demo data ---
-def create_tables():
+def create_tables(app):
     with app.app_context():
         db.create_all()
+        from services import search
+        search.init_schema()
         # demo şirket/kullanıcı yoksa ekle
         from models.database import Company, User
         if not Company.query.first():
@@ -62,6 +106,11 @@ def create_tables():
             app.logger.info("Demo kullanıcı eklendi: admin@demo.com / 123456")
 
 if __name__ == '__main__':
-    create_tables()
+    # Geliştirme sunucusu; üretimde: gunicorn -c gunicorn.conf.py wsgi:app
+    app = create_app()
+    create_tables(app)
     print(f"DB URI => {app.config['SQLALCHEMY_DATABASE_URI']}")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Reloader'ın ebeveyn sürecinde işçi havuzu açma
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background(app)
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=True)
@@ -0,0 +1 @@
+# Performans ölçüm paketi: python -m bench.run
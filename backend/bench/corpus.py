@@ -0,0 +1,126 @@
+"""Sentetik belge korpusu üretici (metin PDF, taranmış PDF/görsel, büyük xlsx, tablolu docx, txt).
+
+Aynı seed ve boyutlarla her çalıştırmada aynı dosyalar üretilir.
+"""
+import os, random
+
+# PDF Type1 fontları yalnızca ASCII güvenle basar; Türkçe karakterler docx/xlsx/txt'de kullanılır
+WORDS_ASCII = ('rapor fatura sozlesme teslim tarih tutar musteri urun depo siparis odeme banka '
+               'vergi kdv iade proje butce plan toplanti karar madde ek sayfa tablo ozet toplam').split()
+WORDS = WORDS_ASCII + 'şirket çalışan müşteri ürün ödeme işlem güncelleme bölüm öneri değerlendirme'.split()
+
+# Boyut profilleri: (pdf sayfa, görsel sayısı, xlsx satır, docx paragraf, docx tablo satırı, txt satır)
+PROFILES = {
+    'small':  dict(pdf_pages=5,   images=1, xlsx_rows=2000,   docx_paragraphs=50,   docx_table_rows=20,   txt_lines=1000),
+    'medium': dict(pdf_pages=50,  images=3, xlsx_rows=50000,  docx_paragraphs=1000, docx_table_rows=500,  txt_lines=50000),
+    'large':  dict(pdf_pages=300, images=5, xlsx_rows=500000, docx_paragraphs=10000, docx_table_rows=5000, txt_lines=500000),
+}
+
+def _sentence(rng, words=WORDS, n=12):
+    return " ".join(rng.choice(words) for _ in range(n))
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def make_text_pdf(path, pages, rng, lines_per_page=40):
+    """Harici kütüphane olmadan çok sayfalı, metin katmanlı PDF yaz"""
+    n = pages
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>",
+            "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{3+2*i} 0 R" for i in range(n)), n)]
+    font_id = 3 + 2 * n
+    for i in range(n):
+        lines = " T* ".join(f"({_pdf_escape(_sentence(rng, WORDS_ASCII))}) Tj" for _ in range(lines_per_page))
+        stream = f"BT /F1 10 Tf 14 TL 50 760 Td {lines} ET"
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4+2*i} 0 R "
+                    f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>")
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objs.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    with open(path, 'wb') as f:
+        out = b"%PDF-1.4\n"; offsets = []
+        for i, o in enumerate(objs):
+            offsets.append(len(out)); out += f"{i+1} 0 obj\n{o}\nendobj\n".encode()
+        xref = len(out)
+        out += f"xref\n0 {len(objs)+1}\n0000000000 65535 f \n".encode()
+        out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+        out += f"trailer\n<< /Size {len(objs)+1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        f.write(out)
+
+def make_scanned_image(path, rng, size=(1654, 2339), lines=45):
+    """A4 / 200 dpi taranmış sayfa benzeri görsel: siyah metin, hafif gürültü"""
+    from PIL import Image, ImageDraw, ImageFilter
+    img = Image.new('L', size, 245)
+    draw = ImageDraw.Draw(img)
+    for i in range(lines):
+        draw.text((120, 120 + i * 46), _sentence(rng, WORDS_ASCII, 8), fill=20)
+    img = img.filter(ImageFilter.GaussianBlur(0.6)).rotate(rng.uniform(-1, 1), fillcolor=245)
+    img.save(path)
+
+def make_scanned_pdf(path, pages, rng):
+    """Metin katmanı olmayan, her sayfası tek JPEG olan PDF (tarayıcı çıktısı gibi)"""
+    import tempfile
+    from PIL import Image
+    imgs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(pages):
+            make_scanned_image(os.path.join(tmp, f"{i}.png"), rng)
+            with Image.open(os.path.join(tmp, f"{i}.png")) as img:
+                imgs.append(img.convert('L'))
+    imgs[0].save(path, save_all=True, append_images=imgs[1:], resolution=200)
+
+def make_xlsx(path, rows, rng, sheets=2):
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    for s in range(sheets):
+        ws = wb.create_sheet(f"Sayfa{s+1}")
+        ws.append(['no', 'müşteri', 'açıklama', 'tutar', 'tarih'])
+        for i in range(rows // sheets):
+            ws.append([i, rng.choice(WORDS), _sentence(rng, n=6), round(rng.uniform(1, 10000), 2),
+                       f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"])
+    wb.save(path)
+
+def make_docx(path, paragraphs, table_rows, rng):
+    import docx
+    d = docx.Document()
+    d.sections[0].header.paragraphs[0].text = "Gizli - " + _sentence(rng, n=3)
+    d.sections[0].footer.paragraphs[0].text = "Sayfa altı - " + _sentence(rng, n=3)
+    for i in range(paragraphs):
+        d.add_paragraph(_sentence(rng, n=rng.randint(10, 40)))
+        if table_rows and i == paragraphs // 2:
+            t = d.add_table(rows=table_rows, cols=4)
+            for r in range(table_rows):
+                for c, cell in enumerate(t.rows[r].cells):
+                    cell.text = str(r) if c == 0 else rng.choice(WORDS)
+    d.save(path)
+
+def make_txt(path, lines, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(lines):
+            f.write(_sentence(rng) + "\n")
+
+def generate(out_dir, profile='small', seed=42, kinds=None):
+    """Korpusu out_dir'e üret; var olan dosyalar yeniden yazılmaz.
+
+    Dönüş: [{'path', 'ext', 'kind', 'size'}]
+    """
+    p = PROFILES[profile] if isinstance(profile, str) else profile
+    os.makedirs(out_dir, exist_ok=True)
+    plan = [
+        ('pdf',  'text_pdf',  'pdf',  lambda path, rng: make_text_pdf(path, p['pdf_pages'], rng)),
+        ('pdf',  'scan_pdf',  'scanned_pdf', lambda path, rng: make_scanned_pdf(path, p['images'], rng)),
+        ('xlsx', 'xlsx',      'xlsx', lambda path, rng: make_xlsx(path, p['xlsx_rows'], rng)),
+        ('docx', 'docx',      'docx', lambda path, rng: make_docx(path, p['docx_paragraphs'], p['docx_table_rows'], rng)),
+        ('txt',  'txt',       'txt',  lambda path, rng: make_txt(path, p['txt_lines'], rng)),
+    ] + [('png', f'scan_{i+1}', 'image', lambda path, rng: make_scanned_image(path, rng))
+         for i in range(p['images'])]
+    files = []
+    for ext, name, kind, build in plan:
+        if kinds and kind not in kinds:
+            continue
+        path = os.path.join(out_dir, f"{name}.{ext}")
+        if not os.path.exists(path):
+            # Her dosyanın kendi seed'i: bir türü atlamak diğerlerinin içeriğini değiştirmez
+            tmp = os.path.join(out_dir, f"{name}.part.{ext}")  # PIL/openpyxl biçimi uzantıdan seçer
+            build(tmp, random.Random(f"{seed}:{name}"))
+            os.replace(tmp, path)
+        files.append({'path': path, 'ext': ext, 'kind': kind, 'size': os.path.getsize(path)})
+    return files
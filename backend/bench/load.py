@@ -0,0 +1,261 @@
+"""Eşzamanlı bağlantı kapasitesi: açık SSE sohbet akışları altında /health gecikmesi.
+
+    cd backend
+    python -m bench.load --serve dev --serve gevent --serve gthread --streams 200 --out load.json
+    python -m bench.load --url http://127.0.0.1:5000 --streams 500   # çalışan bir sunucuya karşı
+
+--serve ile her mod için geçici SQLite veritabanı hazırlanır ve sunucu ayrı süreçte başlatılır
+(dev: python app.py, diğerleri: gunicorn -c gunicorn.conf.py wsgi:app). Stub LLM token başına
+--token-delay bekler, böylece her akış gerçek bir LLM yanıtı kadar açık kalır. Aynı anda
+--streams akış açıkken /health sürekli yoklanır; akış başına ilk byte ve toplam süre ile
+yoklama gecikmesi/hataları, sunucu sürecinin en yüksek RSS ve thread sayısı raporlanır.
+"""
+import argparse, asyncio, json, os, signal, subprocess, sys, tempfile, time
+from urllib.parse import urlsplit
+
+from .run import _meta, summarize
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ---- Raw HTTP client ----
+async def request(host, port, method, path, body=None, headers=None, timeout=60.0):
+    """Tek bağlantılık HTTP/1.1 isteği -> (status, gövde, ilk byte süresi, toplam süre)"""
+    t = time.perf_counter()
+    payload = json.dumps(body).encode() if body is not None else b''
+    head = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close",
+            f"Content-Length: {len(payload)}"]
+    if body is not None:
+        head.append("Content-Type: application/json")
+    head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+
+    async def exchange():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+            await writer.drain()
+            status_line = await reader.readline()
+            ttfb = time.perf_counter() - t
+            rest = await reader.read()  # Connection: close -> sunucu kapatana kadar
+            return status_line, rest, ttfb
+        finally:
+            writer.close()
+
+    status_line, rest, ttfb = await asyncio.wait_for(exchange(), timeout)
+    status = int(status_line.split()[1]) if status_line else 0
+    raw_headers, _, data = rest.partition(b"\r\n\r\n")
+    if b'transfer-encoding: chunked' in raw_headers.lower():
+        data = _dechunk(data)
+    return status, data, ttfb, time.perf_counter() - t
+
+def _dechunk(data):
+    out = b''
+    while data:
+        size, _, data = data.partition(b"\r\n")
+        n = int(size.split(b';')[0] or b'0', 16)
+        if not n:
+            break
+        out += data[:n]; data = data[n + 2:]
+    return out
+
+# ---- Scenario ----
+async def _wait_ready(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, *_ = await request(host, port, 'GET', '/health', timeout=2)
+            if status == 200:
+                return
+        except (OSError, asyncio.TimeoutError):
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Sunucu {timeout}s içinde hazır olmadı: {host}:{port}")
+
+async def scenario(host, port, opts, sample=None):
+    status, data, *_ = await request(host, port, 'POST', '/api/auth/login',
+                                     {'email': opts['email'], 'password': opts['password']})
+    if status != 200:
+        raise RuntimeError(f"Giriş başarısız: {status} {data[:200]!r}")
+    auth = {'Authorization': f"Bearer {json.loads(data)['token']}", 'Accept': 'text/event-stream'}
+
+    streams, probes = [], []
+    done = asyncio.Event()
+    open_now = peak = 0
+    server_peak = {}
+
+    async def stream(i):
+        nonlocal open_now, peak
+        await asyncio.sleep(opts['ramp'] * i / max(1, opts['streams']))
+        open_now += 1; peak = max(peak, open_now)
+        try:
+            status, body, ttfb, total = await request(
+                host, port, 'POST', '/api/chat/message',
+                {'message': f'yük testi {i}', 'stream': True}, auth, timeout=opts['timeout'])
+            ok = status == 200 and b'event: done' in body
+            streams.append({'ok': ok, 'ttfb': ttfb, 'total': total, 'status': status})
+        except (OSError, asyncio.TimeoutError) as e:
+            streams.append({'ok': False, 'error': type(e).__name__})
+        finally:
+            open_now -= 1
+
+    async def probe():
+        nonlocal server_peak
+        while not done.is_set():
+            if sample is not None:
+                stats = sample()
+                server_peak = {k: max(v, server_peak.get(k, 0)) for k, v in stats.items()}
+            try:
+                status, _, _, total = await request(host, port, 'GET', '/health', timeout=opts['probe_timeout'])
+                probes.append({'ok': status == 200, 'total': total, 'open': open_now})
+            except (OSError, asyncio.TimeoutError) as e:
+                probes.append({'ok': False, 'error': type(e).__name__, 'open': open_now})
+            await asyncio.sleep(opts['probe_interval'])
+
+    prober = asyncio.ensure_future(probe())
+    t = time.perf_counter()
+    await asyncio.gather(*(stream(i) for i in range(opts['streams'])))
+    wall = time.perf_counter() - t
+    done.set(); await prober
+
+    ok = [s for s in streams if s['ok']]
+    # Yalnızca akışların çoğu açıkken yapılan yoklamalar kapasiteyi gösterir
+    loaded = [p for p in probes if p['open'] >= opts['streams'] // 2] or probes
+    out = []
+    if ok:
+        out.append(summarize('load.stream.ttfb', [s['ttfb'] for s in ok]))
+        out.append(summarize('load.stream.total', [s['total'] for s in ok]))
+    probe_ok = [p['total'] for p in loaded if p['ok']]
+    out.append(summarize('load.health', probe_ok) if probe_ok else {'name': 'load.health', 'n': 0})
+    out[-1].update(probe_errors=sum(1 for p in loaded if not p['ok']))
+    return {'results': out, 'streams': opts['streams'], 'streams_ok': len(ok),
+            'stream_errors': len(streams) - len(ok), 'peak_open': peak, 'wall_s': round(wall, 2),
+            **{f'server_peak_{k}': v for k, v in server_peak.items()}}
+
+# ---- Server processes ----
+def _server_env(tmp, mode, opts):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(tmp, 'load.db')}",
+        'VECTOR_INDEX_FOLDER': os.path.join(tmp, 'vectors'),
+        'EMBEDDING_BACKEND': 'hashing',
+        'EXTRACTION_RUNNER': 'external',
+        'LLM_BACKEND': 'stub',
+        'LLM_STUB_DELAY': str(opts['token_delay']),
+        'PORT': str(opts['port']),
+        'SERVER_MODE': mode,
+        'WEB_CONCURRENCY': str(opts['web_workers']),
+        'PYTHONUNBUFFERED': '1',
+    })
+    return env
+
+def start_server(mode, tmp, opts, log):
+    env = _server_env(tmp, mode, opts)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=BACKEND, env=env,
+                   check=True, stdout=log, stderr=subprocess.STDOUT)
+    if mode == 'dev':
+        cmd = [sys.executable, 'app.py']
+    else:
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+    # Kendi süreç grubunda: reloader/worker çocukları da birlikte sonlandırılır
+    return subprocess.Popen(cmd, cwd=BACKEND, env=env, stdout=log, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+
+def group_stats(pgid):
+    """Süreç grubunun toplam RSS'i (MB) ve thread sayısı; /proc yoksa (Linux dışı) boş"""
+    rss = threads = 0
+    page = os.sysconf('SC_PAGE_SIZE')
+    for pid in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == pgid:  # pgrp
+            threads += int(fields[17]); rss += int(fields[21]) * page
+    return {'rss_mb': round(rss / 1024**2, 1), 'threads': threads} if threads else {}
+
+def stop_server(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    except ProcessLookupError:
+        pass
+
+def run_target(name, host, port, opts, proc=None):
+    async def main():
+        await _wait_ready(host, port, opts['startup_timeout'])
+        return await scenario(host, port, opts, proc and (lambda: group_stats(proc.pid)))
+    try:
+        result = asyncio.run(main())
+    except Exception as e:
+        result = {'results': [], 'skipped': f"{type(e).__name__}: {e}"}
+    finally:
+        if proc is not None:
+            stop_server(proc)
+    for r in result['results']:
+        r['name'] = f"{r['name']}.{name}"
+    return {'target': name, **result}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--serve', action='append', choices=['dev', 'gevent', 'gthread', 'sync'],
+                        help='Başlatılıp ölçülecek sunucu modu (tekrarlanabilir)')
+    parser.add_argument('--url', help='Çalışan sunucu (ör. http://127.0.0.1:5000); --serve yerine')
+    parser.add_argument('--streams', type=int, default=200, help='Eşzamanlı SSE sohbet akışı')
+    parser.add_argument('--token-delay', type=float, default=0.5, help='Stub LLM token başına bekleme (s)')
+    parser.add_argument('--ramp', type=float, default=2.0, help='Akışların açılma süresi (s)')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Akış başına zaman aşımı (s)')
+    parser.add_argument('--probe-interval', type=float, default=0.05)
+    parser.add_argument('--probe-timeout', type=float, default=5.0)
+    parser.add_argument('--web-workers', type=int, default=2, help='gunicorn WEB_CONCURRENCY')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--startup-timeout', type=float, default=60.0)
+    parser.add_argument('--email', default='admin@demo.com')
+    parser.add_argument('--password', default='123456')
+    parser.add_argument('--out', help='JSON çıktı dosyası (varsayılan: stdout)')
+    args = parser.parse_args(argv)
+    if not args.serve and not args.url:
+        parser.error('--serve ya da --url gerekli')
+    opts = {k: getattr(args, k) for k in ('streams', 'token_delay', 'ramp', 'timeout', 'probe_interval',
+                                          'probe_timeout', 'web_workers', 'port', 'startup_timeout',
+                                          'email', 'password')}
+
+    targets = []
+    if args.url:
+        u = urlsplit(args.url)
+        r = run_target('url', u.hostname, u.port or 80, opts)
+        targets.append(r)
+    for mode in args.serve or []:
+        with tempfile.TemporaryDirectory(prefix=f'bench-load-{mode}-') as tmp, \
+                open(os.path.join(tmp, 'server.log'), 'w') as log:
+            proc = start_server(mode, tmp, opts, log)
+            r = run_target(mode, '127.0.0.1', args.port, opts, proc)
+            if 'skipped' in r:
+                log.flush()
+                with open(log.name) as f:
+                    r['log_tail'] = f.read()[-2000:]
+        targets.append(r)
+    for r in targets:
+        health = next((x for x in r['results'] if x['name'].startswith('load.health')), {})
+        print(f"  {r['target']}: akış {r.get('streams_ok', 0)}/{args.streams}, "
+              f"health p99 {health.get('p99_ms')} ms, hata {health.get('probe_errors', '-')}, "
+              f"thread {r.get('server_peak_threads', '-')}, rss {r.get('server_peak_rss_mb', '-')} MB"
+              + (f" ({r['skipped']})" if 'skipped' in r else ''), file=sys.stderr)
+
+    meta = {k: v for k, v in _meta(argparse.Namespace(profile=None, seed=None, repeat=None)).items()
+            if k not in ('profile', 'seed', 'repeat', 'database')}
+    report = {'meta': {**meta, **{k: v for k, v in opts.items() if k != 'password'}}, 'targets': targets}
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0 if all('skipped' not in r for r in targets) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""Çıkarma ve HTTP uç noktaları için tekrarlanabilir performans ölçümü.
+
+    cd backend
+    python -m bench.run --profile small --out bench.json
+    python -m bench.run --profile small --compare bench.json   # eşik aşılırsa çıkış kodu 1
+
+Her çıkarıcı ve HTTP aşaması ayrı (spawn) süreçte çalışır; peak_rss_mb o sürecin
+en yüksek bellek kullanımıdır. DATABASE_URL verilmezse geçici SQLite kullanılır;
+Postgres ile ölçerken boş bir veritabanı verin.
+"""
+import argparse, io, json, multiprocessing as mp, os, platform, random, subprocess, sys, tempfile, time
+from datetime import datetime
+
+from . import corpus
+
+# ---- Measurement helpers ----
+def percentile(values, q):
+    """Doğrusal ara değerli yüzdelik (q: 0-100)"""
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * q / 100.0
+    lo = int(k); hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+def peak_rss_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024**2 if sys.platform == 'darwin' else 1024), 1)  # macOS byte, Linux KB
+
+def summarize(name, durations, work=None, **extra):
+    """Süre listesinden (saniye) sonuç kaydı; work={'pages': 12} gibi birimler saniye başına verilir"""
+    total = sum(durations) or 1e-9
+    out = {
+        'name': name,
+        'n': len(durations),
+        'mean_ms': round(total / max(1, len(durations)) * 1000, 3),
+        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+        'p99_ms': round(percentile(durations, 99) * 1000, 3),
+        'max_ms': round(max(durations) * 1000, 3),
+        'ops_per_s': round(len(durations) / total, 2),
+    }
+    for unit, amount in (work or {}).items():
+        out[f'{unit}_per_s'] = round(amount / total, 2)
+    out.update(extra)
+    return out
+
+def _timed(fn, *args, **kwargs):
+    t = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - t, result
+
+# ---- Extraction cases (child process) ----
+def _extract_case(file, repeat, warmup):
+    from services.extraction import extract_pages
+    name = f"extract.{file['kind']}.{os.path.basename(file['path']).split('.')[0]}"
+    try:
+        durations, pages = [], []
+        for i in range(warmup + repeat):
+            dt, pages = _timed(extract_pages, file['path'], file['ext'])
+            if i >= warmup:
+                durations.append(dt)
+    except Exception as e:
+        return {'name': name, 'skipped': f"{type(e).__name__}: {e}"}
+    chars = sum(len(text) for _, text, _ in pages)
+    return summarize(name, durations,
+                     work={'mb': file['size'] / 1024**2 * len(durations), 'pages': len(pages) * len(durations)},
+                     file_size=file['size'], pages=len(pages), chars=chars, peak_rss_mb=peak_rss_mb())
+
+# ---- HTTP cases (child process) ----
+def _http_phase(files, opts):
+    tmp = tempfile.mkdtemp(prefix='bench-http-')
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{tmp}/bench.db")
+    os.environ.setdefault('EMBEDDING_BACKEND', 'hashing')
+    os.environ['EXTRACTION_RUNNER'] = 'external'  # yükleme süresine çıkarma karışmasın
+    os.environ['VECTOR_INDEX_FOLDER'] = os.path.join(tmp, 'vectors')
+
+    from app import create_app, create_tables
+    from services.jobs import InlineRunner
+    from services.indexing import index_pending
+    app = create_app()
+    app.config['UPLOAD_FOLDER'] = os.path.join(tmp, 'uploads')
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    create_tables(app)
+
+    rng = random.Random(opts['seed'])
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'admin@demo.com', 'password': '123456'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    results = []
+
+    def call(method, url, **kwargs):
+        dt, resp = _timed(getattr(client, method), url, headers=headers, **kwargs)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"{method.upper()} {url}: {resp.status_code} {resp.get_data(as_text=True)[:200]}")
+        return dt, resp
+
+    # Yükleme: benzersiz içerikli küçük metinler (dedup devreye girmesin) + korpus dosyaları
+    durations = []
+    for i in range(opts['docs']):
+        body = f"belge {i} {rng.random()}\n" + "\n".join(corpus._sentence(rng) for _ in range(50))
+        dt, _ = call('post', '/api/documents/upload', content_type='multipart/form-data',
+                     data={'files': [(io.BytesIO(body.encode()), f'doc_{i}.txt')]})
+        durations.append(dt)
+    results.append(summarize('http.upload.txt', durations))
+
+    durations, total_bytes = [], 0
+    for f in files:
+        with open(f['path'], 'rb') as fh:
+            dt, _ = call('put', f"/api/documents/upload/stream?filename={os.path.basename(f['path'])}", data=fh)
+        durations.append(dt); total_bytes += f['size']
+    results.append(summarize('http.upload.corpus', durations, work={'mb': total_bytes / 1024**2}))
+
+    # Arka plan aşamaları: tüm kuyruk tek seferde (bekleme yok, yalnızca iş süresi)
+    with app.app_context():
+        dt, _ = _timed(InlineRunner(app).notify)
+        results.append(summarize('pipeline.extract_all', [dt], work={'docs': opts['docs'] + len(files)}))
+        indexed, t = 0, time.perf_counter()
+        while True:
+            n = index_pending(limit=50)
+            if not n: break
+            indexed += n
+        results.append(summarize('pipeline.index_all', [time.perf_counter() - t], work={'docs': indexed}))
+
+    # Liste: tüm sayfaları keyset cursor ile dolaş
+    durations = []
+    for _ in range(opts['repeat']):
+        cursor = None
+        while True:
+            dt, resp = call('get', '/api/documents/list?limit=50' + (f'&cursor={cursor}' if cursor else ''))
+            durations.append(dt)
+            cursor = json.loads(resp.get_data())['next_cursor']
+            if not cursor: break
+    results.append(summarize('http.list', durations))
+
+    durations = []
+    for _ in range(opts['queries']):
+        q = " ".join(rng.sample(corpus.WORDS, rng.randint(1, 3)))
+        dt, _ = call('post', '/api/search', json={'query': q, 'limit': 20})
+        durations.append(dt)
+    results.append(summarize('http.search', durations))
+
+    for name, url in (('http.stats', '/api/documents/stats'), ('http.me', '/api/auth/me')):
+        durations = [call('get', url)[0] for _ in range(opts['queries'])]
+        results.append(summarize(name, durations))
+
+    rss = peak_rss_mb()
+    for r in results:
+        r['peak_rss_mb'] = rss  # tüm HTTP aşaması aynı süreçte
+    return results
+
+# ---- Orchestration ----
+def _in_child(fn, *args):
+    """fn'i temiz bir süreçte çalıştır; peak RSS önceki ölçümlerden etkilenmesin"""
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(fn, args)
+
+def _meta(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'profile': args.profile,
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'database': 'env' if os.environ.get('DATABASE_URL') else 'sqlite-temp',
+    }
+
+def compare(current, baseline, threshold):
+    """Ortak ölçümlerde p50 ya da peak RSS eşikten fazla arttıysa gerileme listesi döndür"""
+    base = {r['name']: r for r in baseline['results'] if 'skipped' not in r}
+    regressions = []
+    for r in current['results']:
+        old = base.get(r['name'])
+        if not old or 'skipped' in r:
+            continue
+        for key in ('p50_ms', 'peak_rss_mb'):
+            if old.get(key) and r.get(key) and r[key] > old[key] * (1 + threshold):
+                regressions.append({'name': r['name'], 'metric': key, 'baseline': old[key], 'current': r[key],
+                                    'change': round(r[key] / old[key] - 1, 3)})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', choices=sorted(corpus.PROFILES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--corpus-dir', help='Korpus klasörü (varsayılan: geçici dizinde profil başına önbellek)')
+    parser.add_argument('--only', choices=['extract', 'http'], help='Yalnızca bir grup')
+    parser.add_argument('--kinds', help='Çıkarma türleri: pdf,scanned_pdf,xlsx,docx,txt,image')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--docs', type=int, default=200, help='HTTP aşamasında yüklenecek metin belge sayısı')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--out', help='JSON çıktı dosyası (varsayılan: stdout)')
+    parser.add_argument('--compare', help='Karşılaştırılacak önceki JSON çıktısı')
+    parser.add_argument('--threshold', type=float, default=0.2, help='İzin verilen göreli artış (0.2 = %%20)')
+    args = parser.parse_args(argv)
+
+    corpus_dir = args.corpus_dir or os.path.join(tempfile.gettempdir(), 'ai-doc-bench', f'{args.profile}-{args.seed}')
+    kinds = set(args.kinds.split(',')) if args.kinds else None
+    t = time.perf_counter()
+    files = corpus.generate(corpus_dir, args.profile, args.seed, kinds)
+    print(f"korpus: {len(files)} dosya, {time.perf_counter() - t:.1f}s ({corpus_dir})", file=sys.stderr)
+
+    results = []
+    if args.only in (None, 'extract'):
+        for f in files:
+            r = _in_child(_extract_case, f, args.repeat, args.warmup)
+            print(f"  {r['name']}: {r.get('p50_ms', r.get('skipped'))}", file=sys.stderr)
+            results.append(r)
+    if args.only in (None, 'http'):
+        opts = {'seed': args.seed, 'docs': args.docs, 'queries': args.queries, 'repeat': args.repeat}
+        for r in _in_child(_http_phase, files, opts):
+            print(f"  {r['name']}: {r['p50_ms']}", file=sys.stderr)
+            results.append(r)
+
+    report = {'meta': _meta(args), 'results': results}
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            report['regressions'] = compare(report, json.load(f), args.threshold)
+        for reg in report['regressions']:
+            print(f"GERİLEME {reg['name']} {reg['metric']}: {reg['baseline']} -> {reg['current']}", file=sys.stderr)
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return exit_code
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""gunicorn ayarları (gunicorn -c gunicorn.conf.py wsgi:app); hepsi ortam değişkeniyle değiştirilebilir.
+
+SERVER_MODE:
+    gevent  - worker başına WORKER_CONNECTIONS eşzamanlı bağlantı (SSE/sohbet, yavaş istemciler)
+    gthread - worker başına WORKER_THREADS thread; her açık akış bir thread tutar
+    sync    - worker başına tek istek
+"""
+import glob, multiprocessing, os, tempfile
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'gevent')
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+worker_class = SERVER_MODE
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count())))
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+threads = int(os.environ.get('WORKER_THREADS', 8)) if SERVER_MODE == 'gthread' else 1
+# gevent worker'da timeout yalnızca donmuş süreci yakalar; uzun SSE akışlarını kesmez
+timeout = int(os.environ.get('WORKER_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('WORKER_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('KEEPALIVE', 5))
+max_requests = int(os.environ.get('MAX_REQUESTS', 0))  # bellek sızıntısına karşı worker yenileme
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get('ACCESS_LOG') or None
+
+# Prometheus çok süreçli mod: her worker metriklerini bu dizindeki mmap dosyalarına yazar, /metrics
+# hepsini birleştirir. Worker'lar uygulamayı import etmeden önce ayarlanmalı (preload kapalı).
+if os.environ.get('METRICS_ENABLED', '1') not in ('0', 'false', 'no'):
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                          os.path.join(tempfile.gettempdir(), f"prometheus-{bind.rsplit(':', 1)[-1]}"))
+
+def on_starting(server):
+    """Önceki çalıştırmadan kalan metrik dosyalarını temizle"""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for f in glob.glob(os.path.join(path, '*.db')):
+            os.remove(f)
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,66 @@
+"""full-text search schema
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 23:40:12.418305
+
+Arama şeması modellerde yoktur (PostgreSQL generated tsvector kolonu + GIN indeksi, SQLite FTS5
+sanal tablosu + tetikleyiciler); init-db ile kurulmuş veritabanlarında zaten varsa dokunulmaz.
+DDL bu sürümün anlık görüntüsüdür (services/search.py ile aynı).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+PG_DDL = [
+    """ALTER TABLE document_contents ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (to_tsvector('turkish', coalesce(content, ''))
+                            || to_tsvector('english', coalesce(content, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_document_contents_search ON document_contents USING GIN (search_vector)",
+]
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS document_contents_fts USING fts5(
+       content, content='document_contents', content_rowid='id',
+       tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS document_contents_fts_ai AFTER INSERT ON document_contents BEGIN
+       INSERT INTO document_contents_fts(rowid, content) VALUES (new.id, new.content); END""",
+    """CREATE TRIGGER IF NOT EXISTS document_contents_fts_ad AFTER DELETE ON document_contents BEGIN
+       INSERT INTO document_contents_fts(document_contents_fts, rowid, content) VALUES ('delete', old.id, old.content); END""",
+    """CREATE TRIGGER IF NOT EXISTS document_contents_fts_au AFTER UPDATE ON document_contents BEGIN
+       INSERT INTO document_contents_fts(document_contents_fts, rowid, content) VALUES ('delete', old.id, old.content);
+       INSERT INTO document_contents_fts(rowid, content) VALUES (new.id, new.content); END""",
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for ddl in PG_DDL:
+            op.execute(ddl)
+    elif bind.dialect.name == 'sqlite':
+        exists = bind.execute(sa.text(
+            "SELECT 1 FROM sqlite_master WHERE name='document_contents_fts'")).first()
+        for ddl in SQLITE_DDL:
+            op.execute(ddl)
+        if not exists:
+            # Mevcut içerikleri indekse al
+            op.execute("INSERT INTO document_contents_fts(document_contents_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_document_contents_search")
+        op.execute("ALTER TABLE document_contents DROP COLUMN IF EXISTS search_vector")
+    elif bind.dialect.name == 'sqlite':
+        for trigger in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS document_contents_fts_{trigger}")
+        op.execute("DROP TABLE IF EXISTS document_contents_fts")
@@ -0,0 +1,33 @@
+"""backfill company stats
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:12:37.520914
+
+company_stats sayaçları olmayan şirketler için documents tablosundan doldurulur
+(GET /stats artık yazmaz; eksik sayaçları toplu sorguyla hesaplar).
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        INSERT INTO company_stats (company_id, file_type, total, processed, bytes)
+        SELECT company_id, coalesce(file_type, ''), count(id),
+               sum(CASE WHEN is_processed THEN 1 ELSE 0 END), coalesce(sum(file_size), 0)
+        FROM documents
+        WHERE company_id NOT IN (SELECT company_id FROM company_stats)
+        GROUP BY company_id, coalesce(file_type, '')
+    """)
+
+
+def downgrade():
+    # Veri taşıması; sayaçlar yerinde kalır (reconcile-stats ile yeniden hesaplanabilir)
+    pass
@@ -1,2 +1,2 @@
 # Models paketi
-from .database import db, Company, User, Document, DocumentContent, ChatSession, ChatMessage
+from .database import db, Company, User, Document, DocumentContent, ChatSession, ChatMessage, ExtractionJob, UploadSession, FileBlob, ExtractionResult, DocumentChunk, CompanyStats, RevokedToken
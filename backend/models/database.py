@@ -1,3 +1,4 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -13,6 +14,9 @@ class Company(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    storage_quota = db.Column(db.BigInteger)  # byte; None ise config'teki varsayılan
+    # Belge/istatistik yazımlarında artar; liste ve /stats ETag'leri buna bağlıdır
+    data_version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
     
     # İlişkiler
     users = db.relationship('User', backref='company', lazy=True)
@@ -75,12 +79,21 @@ class Document(db.Model):
     original_filename = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
     file_type = db.Column(db.String(50), nullable=False)
-    file_size = db.Column(db.Integer, nullable=False)
+    file_size = db.Column(db.BigInteger, nullable=False)
+    content_hash = db.Column(db.String(64), index=True)  # sha256 hex
     company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_processed = db.Column(db.Boolean, default=False)
+    is_indexed = db.Column(db.Boolean, default=False)  # vektör indeksine eklendi mi
+    index_claimed_at = db.Column(db.DateTime)  # indeksleyici sahiplendi; içerik değişince sıfırlanır
+    content_truncated = db.Column(db.Boolean, default=False)  # içerik EXTRACT_MAX_CHARS'ta kesildi
+    
+    __table_args__ = (
+        # Listeleme sorgusu: WHERE company_id = ? ORDER BY created_at DESC, id DESC (keyset)
+        db.Index('ix_documents_company_created_id', 'company_id', created_at.desc(), id.desc()),
+    )
     
     # İlişkiler
     uploader = db.relationship('User', backref='uploaded_documents')
@@ -93,11 +106,13 @@ class Document(db.Model):
             'original_filename': self.original_filename,
             'file_type': self.file_type,
             'file_size': self.file_size,
+            'content_hash': self.content_hash,
             'company_id': self.company_id,
             'uploaded_by': self.uploaded_by,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'is_processed': self.is_processed
+            'is_processed': self.is_processed,
+            'content_truncated': bool(self.content_truncated)
         }
 
 class DocumentContent(db.Model):
@@ -111,6 +126,11 @@ class DocumentContent(db.Model):
     page_number = db.Column(db.Integer, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Belge içeriğini sayfa sırasıyla okuma / silme
+    __table_args__ = (
+        db.Index('ix_document_contents_document_page', 'document_id', 'page_number'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -131,10 +151,20 @@ class ChatSession(db.Model):
     title = db.Column(db.String(200), default='Yeni Sohbet')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    message_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Kayan özet: id'si summary_until'e kadar olan mesajlar summary'de özetlenmiştir
+    summary = db.Column(db.Text)
+    summary_until = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Kullanıcının sohbet listesi (updated_at DESC)
+    __table_args__ = (
+        db.Index('ix_chat_sessions_user_company_updated', 'user_id', 'company_id', 'updated_at'),
+    )
     
     # İlişkiler
     user = db.relationship('User', backref='chat_sessions')
-    messages = db.relationship('ChatMessage', backref='session', lazy=True)
+    # Sorgu döner (uzun sohbette tüm mesajlar belleğe alınmaz); sayfalı okumak için filtre + limit
+    messages = db.relationship('ChatMessage', backref='session', lazy='dynamic', order_by='ChatMessage.id')
     
     def to_dict(self):
         return {
@@ -142,6 +172,7 @@ class ChatSession(db.Model):
             'user_id': self.user_id,
             'company_id': self.company_id,
             'title': self.title,
+            'message_count': self.message_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -157,6 +188,11 @@ class ChatMessage(db.Model):
     message_type = db.Column(db.String(20), default='user')  # user, assistant
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Sohbet geçmişi: session_id ile filtre, id sırası
+    __table_args__ = (
+        db.Index('ix_chat_messages_session_id', 'session_id', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -167,4 +203,160 @@ class ChatMessage(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class ExtractionJob(db.Model):
+    """Arka plan metin çıkarma işi"""
+    __tablename__ = 'extraction_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=False, index=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, running, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    # İlişkiler
+    document = db.relationship('Document', backref=db.backref('jobs', lazy=True))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'document_id': self.document_id,
+            'company_id': self.company_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class UploadSession(db.Model):
+    """Parça parça (devam ettirilebilir) yükleme oturumu"""
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(36), primary_key=True)  # uuid4
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    file_type = db.Column(db.String(50), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, default=0)
+    temp_path = db.Column(db.String(500), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'original_filename': self.original_filename,
+            'file_type': self.file_type,
+            'total_size': self.total_size,
+            'received': self.received,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class FileBlob(db.Model):
+    """İçerik adresli dosya (sha256); aynı dosyayı paylaşan belgeler için referans sayacı"""
+    __tablename__ = 'file_blobs'
+    
+    content_hash = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ExtractionResult(db.Model):
+    """İçerik hash'i + çıkarıcı sürümüne göre önbelleğe alınmış çıkarma sonucu"""
+    __tablename__ = 'extraction_results'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    extractor_version = db.Column(db.String(20), nullable=False)
+    pages = db.Column(db.Text, nullable=False)  # JSON: [[page_number, text, content_type], ...]
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'extractor_version', name='unique_extraction_result'),
+    )
+
+class DocumentChunk(db.Model):
+    """Vektör indeksine giren metin parçası; id vektör indeksindeki anahtardır"""
+    __tablename__ = 'document_chunks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=False, index=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
+    page_number = db.Column(db.Integer, default=1)
+    chunk_index = db.Column(db.Integer, nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'document_id': self.document_id,
+            'page_number': self.page_number,
+            'chunk_index': self.chunk_index,
+            'content': self.content
+        }
+
+class CompanyStats(db.Model):
+    """Şirket + dosya türü başına sayaçlar; belge olaylarıyla aynı transaction'da güncellenir"""
+    __tablename__ = 'company_stats'
+    
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), primary_key=True)
+    file_type = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RevokedToken(db.Model):
+    """Çıkış yapılmış (iptal edilmiş) token'lar; süreçler listeyi periyodik olarak belleğe çeker"""
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DocumentChange(db.Model):
+    """Belge değişiklik günlüğü (outbox): değişikliği yapan transaction'da yazılır; türetilmiş
+    indeksler seq sırasıyla okuyup kaldıkları yerden devam eder"""
+    __tablename__ = 'document_changes'
+    
+    # SQLite'ta AUTOINCREMENT: budanan/geri alınan sıra numaraları yeniden kullanılmaz
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    company_id = db.Column(db.Integer, nullable=False)
+    document_id = db.Column(db.Integer, nullable=False)  # belge silinse de kayıt kalır (FK yok)
+    op = db.Column(db.String(20), nullable=False)  # created, content, deleted
+    payload = db.Column(db.Text)  # JSON; deleted: {"chunk_ids": [...]}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Şirket bazlı akış: WHERE company_id = ? AND seq > ? ORDER BY seq
+    __table_args__ = (
+        db.Index('ix_document_changes_company_seq', 'company_id', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+    
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'company_id': self.company_id,
+            'document_id': self.document_id,
+            'op': self.op,
+            'payload': json.loads(self.payload) if self.payload else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
 
+class ChangeConsumer(db.Model):
+    """Değişiklik günlüğü tüketicisinin kaldığı yer (en son işlenen seq)"""
+    __tablename__ = 'change_consumers'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    last_seq = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
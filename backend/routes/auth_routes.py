@@ -1,10 +1,14 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 from functools import wraps
-import jwt
+import jwt, uuid
+from sqlalchemy.orm import joinedload
 
 # Models import
 from models.database import db, Company, User
+from services.auth_cache import cached_payload, get_profile, revoke
+from services.offload import run_blocking
+from services.response_cache import hashed_json
 
 # Blueprint oluştur
 auth_bp = Blueprint('auth', __name__)
@@ -14,6 +18,7 @@ def generate_token(user_id, company_id):
     payload = {
         'user_id': user_id,
         'company_id': company_id,
+        'jti': str(uuid.uuid4()),
         'exp': datetime.utcnow() + timedelta(hours=24)
     }
     return jwt.encode(payload, 'dev-secret', algorithm='HS256')
@@ -34,7 +39,7 @@ def token_required(f):
             return jsonify({'error': 'Token gerekli'}), 401
         
         token = token[7:]  # "Bearer " kısmını çıkar
-        payload = verify_token(token)
+        payload = cached_payload(token, verify_token)
         if not payload:
             return jsonify({'error': 'Geçersiz token'}), 401
         
@@ -54,8 +59,8 @@ def login():
         if not email or not password:
             return jsonify({'error': 'Email ve şifre gerekli'}), 400
         
-        user = User.query.filter_by(email=email).first()
-        if not user or not user.check_password(password):
+        user = User.query.options(joinedload(User.company)).filter_by(email=email).first()
+        if not user or not run_blocking(user.check_password, password):
             return jsonify({'error': 'Geçersiz email veya şifre'}), 401
         
         if not user.is_active:
@@ -102,7 +107,7 @@ def register():
             company_id=company.id,
             role='admin'
         )
-        user.set_password(data['password'])
+        run_blocking(user.set_password, data['password'])
         db.session.add(user)
         db.session.commit()
         
@@ -118,17 +123,22 @@ def register():
 
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
-    """Çıkış"""
+    """Çıkış: geçerli bir token gönderildiyse iptal listesine eklenir"""
+    token = request.headers.get('Authorization', '')
+    payload = verify_token(token[7:]) if token.startswith('Bearer ') else None
+    if payload:
+        try:
+            revoke(payload)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
     return jsonify({'message': 'Çıkış başarılı'})
 
 @auth_bp.route('/me')
 @token_required
 def me():
     """Kullanıcı bilgisi"""
-    user = User.query.get(request.user_id)
-    if not user:
+    profile = get_profile(request.user_id, request.company_id)
+    if not profile:
         return jsonify({'error': 'Kullanıcı bulunamadı'}), 404
-    return jsonify({
-        'user': user.to_dict(),
-        'company': user.company.to_dict()
-    })
+    return hashed_json(profile)
@@ -0,0 +1,163 @@
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+import json
+from datetime import datetime
+
+from models.database import db, Document, ChatSession, ChatMessage
+from services.retrieval import retrieve
+from services.llm import get_llm, build_messages
+from services.chat_context import load_history, fit_sources, compact_later
+from services.listing import encode_cursor, decode_cursor, ListingError
+from .auth_routes import token_required
+
+chat_bp = Blueprint('chat_bp', __name__)
+
+def _sse(data, event=None):
+    out = f"event: {event}\n" if event else ""
+    return out + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _get_session(session_id):
+    return ChatSession.query.filter_by(id=session_id, user_id=request.user_id,
+                                       company_id=request.company_id).first()
+
+def _sources(company_id, question):
+    """Sorunun bağlamı: anahtar kelime + vektör aramasının birleşik en iyi k pasajı"""
+    hits = retrieve(company_id, question, k=current_app.config.get('CHAT_TOP_K', 5))
+    names = dict(db.session.query(Document.id, Document.original_filename)
+                 .filter(Document.id.in_({h['document_id'] for h in hits})))
+    return [{
+        'chunk_id': h['chunk_id'],
+        'document_id': h['document_id'],
+        'original_filename': names.get(h['document_id'], ''),
+        'page_number': h['page_number'],
+        'content': h['content'],
+        'score': round(h['score'], 4),
+        'matched': h['matched']
+    } for h in hits]
+
+@chat_bp.route('/message', methods=['POST'])
+@token_required
+def send_message():
+    """Mesaj gönder. Accept: text/event-stream ise yanıt SSE ile token token akar, değilse JSON döner"""
+    try:
+        data = request.get_json() or {}
+        text = (data.get('message') or '').strip()
+        if not text:
+            return jsonify({'error':'Mesaj gerekli'}), 400
+
+        if data.get('session_id'):
+            session = _get_session(data['session_id'])
+            if not session:
+                return jsonify({'error':'Sohbet bulunamadı'}), 404
+        else:
+            session = ChatSession(user_id=request.user_id, company_id=request.company_id, title=text[:200])
+            db.session.add(session); db.session.flush()
+
+        msg = ChatMessage(session_id=session.id, message=text, message_type='user')
+        session.updated_at = datetime.utcnow()
+        session.message_count = ChatSession.message_count + 1  # eşzamanlı mesajlarda kayıp artış olmasın
+        db.session.add(msg); db.session.commit()
+
+        # Bağlam: token bütçesine sığan pasajlar + kayan özet ve son mesajlar (tüm geçmiş okunmaz)
+        sources = fit_sources(_sources(request.company_id, text), current_app.config.get('CHAT_SOURCES_TOKENS', 3000))
+        history = load_history(session, msg.id)
+        llm = get_llm(current_app.config)
+        messages = build_messages(text, sources, history)
+        public_sources = [{k: v for k, v in s.items() if k != 'content'} for s in sources]
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Chat error")
+        return jsonify({'error':'Mesaj işlenirken hata oluştu'}), 500
+
+    wants_stream = data.get('stream') or 'text/event-stream' in request.headers.get('Accept', '')
+    if not wants_stream:
+        try:
+            msg.response = "".join(llm.stream(messages))
+            payload = {'session_id': session.id, 'message_id': msg.id,
+                       'response': msg.response, 'sources': public_sources}
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Chat LLM error")
+            return jsonify({'error':'Yanıt oluşturulurken hata oluştu'}), 502
+        compact_later(payload['session_id'], llm)
+        return jsonify(payload)
+
+    session_id, message_id = session.id, msg.id
+    # Akış boyunca havuzdan bağlantı tutulmasın; sonda kayıt için kısa süreliğine yeniden alınır
+    db.session.close()
+
+    def generate():
+        parts = []
+        yield _sse({'session_id': session_id, 'message_id': message_id, 'sources': public_sources}, 'meta')
+        try:
+            for tok in llm.stream(messages):
+                parts.append(tok)
+                yield _sse({'token': tok})
+            yield _sse({'message_id': message_id}, 'done')
+        except GeneratorExit:
+            raise  # istemci bağlantıyı kapattı; finally kısmi yanıtı kaydeder
+        except Exception:
+            current_app.logger.exception("Chat stream error")
+            yield _sse({'error':'Yanıt oluşturulurken hata oluştu'}, 'error')
+        finally:
+            # Yanıt akış bittiğinde (ya da kesildiğinde) tek seferde kaydedilir
+            try:
+                ChatMessage.query.filter_by(id=message_id).update({'response': "".join(parts)})
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception("Chat response save error")
+            else:
+                compact_later(session_id, llm)  # arka planda; akışı ve worker'ı bekletmez
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@chat_bp.route('/sessions', methods=['GET'])
+@token_required
+def list_sessions():
+    """Keyset sayfalı sohbet listesi (son güncellenen önce): ?limit=&cursor=; next_cursor yoksa null"""
+    try:
+        limit = min(max(int(request.args.get('limit', current_app.config.get('CHAT_PAGE_SIZE', 50))), 1), 200)
+        q = (ChatSession.query.filter_by(user_id=request.user_id, company_id=request.company_id)
+             .order_by(ChatSession.updated_at.desc(), ChatSession.id.desc()))
+        if request.args.get('cursor'):
+            updated_at, sid = decode_cursor(request.args['cursor'])
+            q = q.filter(db.or_(ChatSession.updated_at < updated_at,
+                                db.and_(ChatSession.updated_at == updated_at, ChatSession.id < sid)))
+        sessions = q.limit(limit + 1).all()
+        more, sessions = len(sessions) > limit, sessions[:limit]
+        cursor = encode_cursor(sessions[-1].updated_at, sessions[-1].id) if more else None
+        return jsonify({'sessions': [s.to_dict() for s in sessions], 'next_cursor': cursor})
+    except ListingError as e:
+        return jsonify({'error':str(e)}), 400
+    except ValueError:
+        return jsonify({'error':'Geçersiz limit'}), 400
+    except Exception:
+        current_app.logger.exception("Chat sessions error")
+        return jsonify({'error':'Sohbetler alınırken hata oluştu'}), 500
+
+@chat_bp.route('/history/<int:session_id>', methods=['GET'])
+@token_required
+def history(session_id:int):
+    """Sayfalı geçmiş, sondan geriye: ?limit=&before=<mesaj id>. Sayfa içi kronolojik;
+    next_before ile daha eski mesajlar istenir (yoksa null)"""
+    try:
+        limit = min(max(int(request.args.get('limit', current_app.config.get('CHAT_PAGE_SIZE', 50))), 1), 200)
+        before = request.args.get('before', type=int)
+    except ValueError:
+        return jsonify({'error':'Geçersiz limit'}), 400
+    try:
+        session = _get_session(session_id)
+        if not session:
+            return jsonify({'error':'Sohbet bulunamadı'}), 404
+        q = session.messages.order_by(None).order_by(ChatMessage.id.desc())
+        if before:
+            q = q.filter(ChatMessage.id < before)
+        msgs = q.limit(limit + 1).all()
+        more, msgs = len(msgs) > limit, msgs[:limit][::-1]
+        return jsonify({'session': session.to_dict(), 'messages': [m.to_dict() for m in msgs],
+                        'next_before': msgs[0].id if more else None})
+    except Exception:
+        current_app.logger.exception("Chat history error")
+        return jsonify({'error':'Sohbet geçmişi alınırken hata oluştu'}), 500
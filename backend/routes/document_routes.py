@@ -1,172 +1,546 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context, url_for
 from werkzeug.utils import secure_filename
-import os, uuid, pdfplumber, docx, openpyxl
-import pytesseract
-from PIL import Image
+import os, uuid, json
+from datetime import datetime, timedelta
 
-from models.database import db, Document, DocumentContent
+from models.database import db, Document, DocumentContent, ExtractionJob, UploadSession
+from services.jobs import enqueue_extractions, notify_runner
+from services.indexing import notify_indexer
+from services.storage import (UploadError, save_stream, copy_stream, upload_limit, new_temp_path, parse_upload_form,
+                              put_blob, blob_key, unlink_later, upload_hasher, save_upload_hasher,
+                              finish_upload_hash, discard_upload_hasher)
+from services.stats import bump, get_stats
+from services.changes import record, read_changes, latest_seq, CREATED
+from services.listing import (ListingError, FILTERS, apply_filters, parse_fields, page_query,
+                              serialize_row, encode_cursor)
+from services.delivery import sign_download, verify_download, send_document, content_pages
+from services.response_cache import versioned_json
+from services.bulk import parse_selection, run_batches, delete_documents, reprocess_documents, export_ndjson, export_zip
 from .auth_routes import token_required
 
 documents_bp = Blueprint('documents_bp', __name__)
 
-# Tesseract (Windows yolu)
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-
-ALLOWED_EXT = {'txt','pdf','png','jpg','jpeg','gif','doc','docx','xls','xlsx'}
+ALLOWED_EXT = {'txt','pdf','png','jpg','jpeg','gif','tif','tiff','doc','docx','xls','xlsx'}
 
 def allowed_file(name): 
     return '.' in name and name.rsplit('.',1)[1].lower() in ALLOWED_EXT
 
-# ---- Text extraction helpers ----
-def _extract_pdf(path):
-    out=[]
-    with pdfplumber.open(path) as pdf:
-        for p in pdf.pages:
-            t = p.extract_text() or ""
-            if t.strip(): out.append(t)
-    return "\n".join(out).strip()
-
-def _extract_docx(path):
-    d = docx.Document(path)
-    return "\n".join(p.text for p in d.paragraphs).strip()
-
-def _extract_xlsx(path):
-    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
-    parts=[]
-    for ws in wb.worksheets:
-        for row in ws.iter_rows(values_only=True):
-            vals=[str(c) for c in row if c is not None]
-            if vals: parts.append(" ".join(vals))
-    return "\n".join(parts).strip()
-
-def _extract_img(path):
-    try:
-        return pytesseract.image_to_string(Image.open(path), lang="tur+eng").strip()
-    except Exception:
-        return pytesseract.image_to_string(Image.open(path)).strip()
-
-def _extract_txt(path):
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        return f.read().strip()
-
-def extract_by_ext(path, ext):
-    ext=(ext or "").lower()
-    if ext=='pdf':  return _extract_pdf(path)
-    if ext=='docx': return _extract_docx(path)
-    if ext in ('xlsx','xls'): return _extract_xlsx(path)
-    if ext in ('png','jpg','jpeg','gif'): return _extract_img(path)
-    if ext=='txt':  return _extract_txt(path)
-    return ""
-# ---------------------------------
+def _split_name(original):
+    filename = secure_filename(original)
+    ext = filename.rsplit('.',1)[1].lower() if '.' in filename else ''
+    return filename, ext
+
+def _register_documents(items, created_blobs):
+    """Geçici dosyaları blob deposuna al, Document + çıkarma işlerini toplu oluştur (commit çağırana ait).
+
+    items: [(filename, ext, temp_path, size, sha), ...]
+    Belgeler ve işler birer flush'ta toplu INSERT ile yazılır. Aynı içerik daha önce
+    yüklendiyse disk ve çıkarma maliyeti sıfırdır.
+    """
+    docs, totals = [], {}
+    for filename, ext, temp_path, size, sha in items:
+        save_path, created = put_blob(temp_path, sha, size)
+        if created: created_blobs.append(save_path)
+        docs.append(Document(
+            filename=blob_key(sha),
+            original_filename=filename,
+            file_path=save_path,
+            file_type=ext,
+            file_size=size,
+            content_hash=sha,
+            company_id=request.company_id,
+            uploaded_by=request.user_id
+        ))
+        count, total_size = totals.get(ext, (0, 0))
+        totals[ext] = (count + 1, total_size + size)
+    if not docs:
+        return []
+    db.session.add_all(docs); db.session.flush()
+    for ext, (count, total_size) in sorted(totals.items()):
+        bump(request.company_id, ext, total=count, size=total_size)
+    record(request.company_id, [d.id for d in docs], CREATED)
+
+    # Metin çıkarma arka planda yapılır; belgeler is_processed=False ile döner
+    jobs = enqueue_extractions(docs, fresh=True); db.session.flush()
+    return [{**doc.to_dict(), 'job_id': job.id} for doc, job in zip(docs, jobs)]
+
+def _remove_quietly(paths):
+    for path in paths:
+        try:
+            if os.path.exists(path): os.remove(path)
+        except Exception as e:
+            current_app.logger.warning(f"File delete warn: {e}")
+
+def _discard(saved, temps):
+    """Başarısız yüklemenin dosyaları: geçiciler silinir; bu istekte oluşan blob'lar ise kilit altında
+    yeniden denetlenerek kaldırılır (aynı içerik eşzamanlı yüklenmiş olabilir)"""
+    _remove_quietly([t for t in temps if t])
+    unlink_later(saved)
 
 @documents_bp.route('/upload', methods=['POST'])
 @token_required
 def upload_documents():
+    saved, temps = [], []
     try:
-        if 'files' not in request.files:
+        # Bildirilen boyutla kota kontrolü gövdeye dokunmadan yapılır; gövde request.files ile
+        # biriktirilmez, dosya parçaları gelirken geçici dosyalara yazılıp sınır yolda uygulanır
+        limit = upload_limit(request.company_id, request.content_length)
+        form_files = parse_upload_form(limit, temps)
+
+        if 'files' not in form_files:
             return jsonify({'error':'Dosya seçilmemiş'}), 400
 
-        files = request.files.getlist('files')
+        files = form_files.getlist('files')
         if not files:
             return jsonify({'error':'Dosya bulunamadı'}), 400
 
-        os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-        uploaded=[]
+        items=[]
         for f in files:
             if not f or f.filename=='' or not allowed_file(f.filename):
                 continue
 
-            filename = secure_filename(f.filename)
-            ext = filename.rsplit('.',1)[1].lower() if '.' in filename else ''
-            unique = f"{uuid.uuid4()}_{filename}"
-            save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique)
-            f.save(save_path)
-
-            doc = Document(
-                filename=unique,
-                original_filename=filename,
-                file_path=save_path,
-                file_type=ext,
-                file_size=os.path.getsize(save_path),
-                company_id=request.company_id,
-                uploaded_by=request.user_id
-            )
-            db.session.add(doc); db.session.flush()
-
-            content = ""
-            try:
-                content = extract_by_ext(save_path, ext)
-            except Exception as e:
-                current_app.logger.warning(f"Extract fail doc {doc.id}: {e}")
-
-            if content:
-                dc = DocumentContent(document_id=doc.id, content=content)
-                db.session.add(dc)
-                if hasattr(doc, "is_processed"):
-                    doc.is_processed = True
-            else:
-                if hasattr(doc, "is_processed"):
-                    doc.is_processed = False
-
-            uploaded.append(doc.to_dict())
+            filename, ext = _split_name(f.filename)
+            target = f.stream
+            items.append((filename, ext, target.path, target.size, target.hasher.hexdigest()))
 
+        uploaded = _register_documents(items, saved)
         db.session.commit()
+        if uploaded:
+            notify_runner(); notify_indexer()
         return jsonify({
             'message': f'{len(uploaded)} dosya başarıyla yüklendi', 
             'uploaded_count': len(uploaded),
             'files': uploaded
         }), 201
 
+    except UploadError as e:
+        db.session.rollback(); unlink_later(saved)
+        return jsonify({'error':str(e)}), e.status
     except Exception:
-        db.session.rollback()
+        db.session.rollback(); unlink_later(saved)
         current_app.logger.exception("Upload error")
         return jsonify({'error':'Dosya yüklenirken hata oluştu'}), 500
+    finally:
+        # Blob'lar geçici dosyalara sabit bağlantıdır; geçiciler her durumda silinir
+        _remove_quietly(temps)
+
+@documents_bp.route('/upload/stream', methods=['PUT'])
+@token_required
+def upload_stream():
+    """Tek dosyayı ham istek gövdesi olarak al (?filename=...), parçalar halinde diske yaz"""
+    saved, tmp = [], None
+    try:
+        original = request.args.get('filename', '')
+        if not original or not allowed_file(original):
+            return jsonify({'error':'Geçersiz dosya adı'}), 400
+
+        limit = upload_limit(request.company_id, request.content_length)
+        filename, ext = _split_name(original)
+        tmp = new_temp_path()
+        size, sha = save_stream(request.stream, tmp, limit=limit)
+
+        uploaded = _register_documents([(filename, ext, tmp, size, sha)], saved)[0]
+        db.session.commit()
+        _remove_quietly([tmp])
+        notify_runner(); notify_indexer()
+        return jsonify({'message':'Dosya başarıyla yüklendi', 'file': uploaded}), 201
+
+    except UploadError as e:
+        db.session.rollback(); _discard(saved, [tmp])
+        return jsonify({'error':str(e)}), e.status
+    except Exception:
+        db.session.rollback(); _discard(saved, [tmp])
+        current_app.logger.exception("Stream upload error")
+        return jsonify({'error':'Dosya yüklenirken hata oluştu'}), 500
+
+# ---- Resumable (chunked) uploads ----
+def _get_upload_session(upload_id):
+    return UploadSession.query.filter_by(id=upload_id, company_id=request.company_id).first()
+
+def _purge_stale_sessions():
+    """Süresi dolmuş yarım yüklemeleri ve rezervlerini temizle"""
+    ttl = current_app.config.get('UPLOAD_SESSION_TTL', 24 * 3600)
+    stale = UploadSession.query.filter(
+        UploadSession.updated_at < datetime.utcnow() - timedelta(seconds=ttl)).all()
+    _remove_quietly([s.temp_path for s in stale])
+    for s in stale:
+        db.session.delete(s)
+
+@documents_bp.route('/uploads', methods=['POST'])
+@token_required
+def init_upload():
+    """Devam ettirilebilir yükleme başlat: {filename, size}"""
+    try:
+        data = request.get_json() or {}
+        original = data.get('filename') or ''
+        if not original or not allowed_file(original):
+            return jsonify({'error':'Geçersiz dosya adı'}), 400
+        try:
+            size = int(data.get('size'))
+        except (TypeError, ValueError):
+            size = -1
+        if size < 0:
+            return jsonify({'error':'size gerekli'}), 400
+
+        _purge_stale_sessions()
+        upload_limit(request.company_id, size)
+
+        filename, ext = _split_name(original)
+        upload_id = str(uuid.uuid4())
+        partial_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], '.partial')
+        os.makedirs(partial_dir, exist_ok=True)
+        temp_path = os.path.join(partial_dir, upload_id)
+        open(temp_path, 'wb').close()
+
+        us = UploadSession(id=upload_id, company_id=request.company_id, user_id=request.user_id,
+                           original_filename=filename, file_type=ext, total_size=size,
+                           temp_path=temp_path)
+        db.session.add(us); db.session.commit()
+        return jsonify({**us.to_dict(), 'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']}), 201
+
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'error':str(e)}), e.status
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Upload init error")
+        return jsonify({'error':'Yükleme başlatılırken hata oluştu'}), 500
+
+@documents_bp.route('/uploads/<upload_id>', methods=['GET'])
+@token_required
+def upload_status(upload_id):
+    us = _get_upload_session(upload_id)
+    if not us:
+        return jsonify({'error':'Yükleme bulunamadı'}), 404
+    return jsonify(us.to_dict())
+
+@documents_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@token_required
+def append_upload(upload_id):
+    """Parça ekle; Upload-Offset başlığı sunucudaki received ile aynı olmalı"""
+    try:
+        us = _get_upload_session(upload_id)
+        if not us:
+            return jsonify({'error':'Yükleme bulunamadı'}), 404
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return jsonify({'error':'Upload-Offset gerekli'}), 400
+        if offset != us.received:
+            return jsonify({'error':'Offset uyuşmuyor', 'received': us.received}), 409
+
+        # Aynı offset'e yazmak idempotenttir; tekrar gönderilen parça aynı byte'ları ezer.
+        # sha256 parçalar geldikçe sürdürülür, tamamlamada dosya yeniden okunmaz.
+        hasher = upload_hasher(us.id, offset)
+        with open(us.temp_path, 'r+b') as dst:
+            dst.seek(offset)
+            size, _ = copy_stream(request.stream, dst, limit=us.total_size - offset, hasher=hasher)
+
+        n = UploadSession.query.filter_by(id=us.id, received=offset)\
+            .update({'received': offset + size, 'updated_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        if not n:
+            db.session.refresh(us)
+            return jsonify({'error':'Offset uyuşmuyor', 'received': us.received}), 409
+        save_upload_hasher(us.id, offset + size, hasher)
+        return jsonify({'upload_id': us.id, 'received': offset + size, 'total_size': us.total_size})
+
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'error':str(e)}), e.status
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Upload append error")
+        return jsonify({'error':'Parça yüklenirken hata oluştu'}), 500
+
+@documents_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+@token_required
+def complete_upload(upload_id):
+    """Tüm parçalar geldiyse dosyayı kalıcı konuma taşı ve belgeyi oluştur"""
+    saved, us = [], None
+    try:
+        us = _get_upload_session(upload_id)
+        if not us:
+            return jsonify({'error':'Yükleme bulunamadı'}), 404
+        if us.received != us.total_size:
+            return jsonify({'error':'Yükleme tamamlanmadı', 'received': us.received}), 409
+
+        sha = finish_upload_hash(us.id, us.temp_path)
+        expected = ((request.get_json(silent=True) or {}).get('sha256') or '').lower()
+        if expected and expected != sha:
+            return jsonify({'error':'Hash uyuşmuyor', 'sha256': sha}), 422
+
+        temp_path = us.temp_path
+        uploaded = _register_documents([(us.original_filename, us.file_type, temp_path, us.total_size, sha)], saved)[0]
+        db.session.delete(us)
+        db.session.commit()
+        # Geçici dosya yalnızca commit başarılıysa silinir; aksi halde oturum yeniden tamamlanabilir
+        discard_upload_hasher(upload_id); _remove_quietly([temp_path])
+        notify_runner(); notify_indexer()
+        return jsonify({'message':'Dosya başarıyla yüklendi', 'file': uploaded}), 201
+
+    except Exception:
+        db.session.rollback()
+        # Geçici dosya yerinde; bu istekte oluşan blob kilit altında yeniden denetlenip kaldırılır
+        unlink_later(saved)
+        current_app.logger.exception("Upload complete error")
+        return jsonify({'error':'Yükleme tamamlanırken hata oluştu'}), 500
+
+@documents_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@token_required
+def abort_upload(upload_id):
+    try:
+        us = _get_upload_session(upload_id)
+        if not us:
+            return jsonify({'error':'Yükleme bulunamadı'}), 404
+        _remove_quietly([us.temp_path]); discard_upload_hasher(us.id)
+        db.session.delete(us); db.session.commit()
+        return jsonify({'message':'Yükleme iptal edildi'})
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Upload abort error")
+        return jsonify({'error':'Yükleme iptal edilirken hata oluştu'}), 500
 
 @documents_bp.route('/list', methods=['GET'])
 @token_required
 def list_documents():
+    """Keyset sayfalı liste: ?limit=&cursor=&fields=&file_type=&is_processed=&uploaded_by=&created_from=&created_to=
+
+    next_cursor bir sonraki sayfa için verilir (yoksa null). Yanıt şirket veri sürümüne bağlı
+    zayıf ETag taşır (If-None-Match -> 304); RESPONSE_CACHE_MAX_BYTES'ı aşan sayfa önbelleğe
+    alınmadan satır satır akıtılır.
+    """
     try:
-        docs = Document.query.filter_by(company_id=request.company_id).order_by(Document.created_at.desc()).all()
-        return jsonify({'documents':[d.to_dict() for d in docs]})
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        fields = parse_fields(request.args.get('fields'))
+        q = page_query(request.company_id, request.args, fields, limit)
+    except ListingError as e:
+        return jsonify({'error':str(e)}), 400
+    except ValueError:
+        return jsonify({'error':'Geçersiz limit'}), 400
+
+    def rows():
+        """Sayfanın JSON parçaları; sonda next_cursor ve count"""
+        yield '{"documents":['
+        last, n = None, 0
+        for row in q.yield_per(100):
+            if n == limit:
+                break  # limit+1'inci satır yalnızca devamı olduğunu gösterir
+            yield (',' if n else '') + json.dumps(serialize_row(row, fields), ensure_ascii=False)
+            last, n = row, n + 1
+        else:
+            last = None
+        cursor = encode_cursor(last.created_at, last.id) if last is not None else None
+        yield '],"next_cursor":' + json.dumps(cursor) + ',"count":' + str(n) + '}'
+
+    def generate(parts):
+        # Önbelleğe sığmayan sayfa akıtılır; başlık gönderildikten sonraki hata gövdede bildirilir
+        sent = False
+        try:
+            for part in parts:
+                sent = True
+                yield part
+        except Exception:
+            current_app.logger.exception("List docs error")
+            yield ('' if sent else '{"documents":[') + '],"next_cursor":null,"error":"Belgeler alınırken hata oluştu"}'
+
+    try:
+        return versioned_json('list', request.company_id, lambda version: rows(), stream=generate)
     except Exception:
         current_app.logger.exception("List docs error")
         return jsonify({'error':'Belgeler alınırken hata oluştu'}), 500
 
-@documents_bp.route('/delete/<int:doc_id>', methods=['DELETE'])
+def _get_document(doc_id, company_id=None):
+    return Document.query.filter_by(id=doc_id, company_id=company_id or request.company_id).first()
+
+@documents_bp.route('/<int:doc_id>', methods=['GET'])
 @token_required
-def delete_document(doc_id:int):
+def get_document(doc_id:int):
     try:
-        doc = Document.query.filter_by(id=doc_id, company_id=request.company_id).first()
+        doc = _get_document(doc_id)
         if not doc:
             return jsonify({'error':'Belge bulunamadı'}), 404
+        pages = db.session.query(db.func.count(DocumentContent.id)).filter_by(document_id=doc.id).scalar()
+        return jsonify({'document': {**doc.to_dict(), 'page_count': pages}})
+    except Exception:
+        current_app.logger.exception("Get doc error")
+        return jsonify({'error':'Belge alınırken hata oluştu'}), 500
 
-        try:
-            if os.path.exists(doc.file_path):
-                os.remove(doc.file_path)
-        except Exception as e:
-            current_app.logger.warning(f"File delete warn: {e}")
+@documents_bp.route('/<int:doc_id>/download-url', methods=['GET'])
+@token_required
+def download_url(doc_id:int):
+    """Tarayıcı indirmesi için kısa ömürlü imzalı bağlantı (Authorization başlığı gerekmez)"""
+    try:
+        doc = _get_document(doc_id)
+        if not doc:
+            return jsonify({'error':'Belge bulunamadı'}), 404
+        return jsonify({'url': url_for('documents_bp.download_document', doc_id=doc.id, sig=sign_download(doc)),
+                        'expires_in': current_app.config.get('DOWNLOAD_URL_TTL', 300)})
+    except Exception:
+        current_app.logger.exception("Download url error")
+        return jsonify({'error':'İndirme bağlantısı oluşturulurken hata oluştu'}), 500
 
-        DocumentContent.query.filter_by(document_id=doc.id).delete(synchronize_session=False)
-        db.session.delete(doc)
-        db.session.commit()
+def _send(doc_id, company_id):
+    try:
+        doc = _get_document(doc_id, company_id)
+        if not doc:
+            return jsonify({'error':'Belge bulunamadı'}), 404
+        if not os.path.exists(doc.file_path):
+            current_app.logger.error(f"Missing file for document {doc.id}: {doc.file_path}")
+            return jsonify({'error':'Dosya bulunamadı'}), 404
+        return send_document(doc, inline=request.args.get('inline') in ('1', 'true'))
+    except Exception:
+        current_app.logger.exception("Download error")
+        return jsonify({'error':'Dosya indirilirken hata oluştu'}), 500
+
+@documents_bp.route('/download/<int:doc_id>', methods=['GET'])
+def download_document(doc_id:int):
+    """Dosyayı indir (Range, ETag / If-None-Match, If-Range). Bearer token ya da ?sig= ile"""
+    if 'sig' in request.args:
+        claims = verify_download(request.args['sig'])
+        if not claims or claims[0] != doc_id:
+            return jsonify({'error':'Geçersiz ya da süresi dolmuş bağlantı'}), 403
+        return _send(doc_id, claims[1])
+    return token_required(lambda: _send(doc_id, request.company_id))()
+
+@documents_bp.route('/<int:doc_id>/content', methods=['GET'])
+@token_required
+def document_content(doc_id:int):
+    """Çıkarılmış metnin sayfalı önizlemesi: ?after=<page_number>&limit=&max_chars="""
+    try:
+        after = int(request.args.get('after', 0))
+        limit = min(max(int(request.args.get('limit', 5)), 1), 50)
+        max_chars = int(request.args['max_chars']) if request.args.get('max_chars') else None
+    except ValueError:
+        return jsonify({'error':'Geçersiz parametre'}), 400
+    try:
+        doc = _get_document(doc_id)
+        if not doc:
+            return jsonify({'error':'Belge bulunamadı'}), 404
+        pages, next_after = content_pages(doc.id, after, limit, max_chars)
+        return jsonify({'document_id': doc.id, 'is_processed': doc.is_processed,
+                        'pages': pages, 'next_after': next_after})
+    except Exception:
+        current_app.logger.exception("Document content error")
+        return jsonify({'error':'Belge içeriği alınırken hata oluştu'}), 500
+
+@documents_bp.route('/delete/<int:doc_id>', methods=['DELETE'])
+@token_required
+def delete_document(doc_id:int):
+    try:
+        # Blob başka belgelerce de kullanılıyorsa dosya yerinde kalır; dosya commit sonrası arka planda silinir
+        if not delete_documents(request.company_id, [doc_id]):
+            return jsonify({'error':'Belge bulunamadı'}), 404
         return jsonify({'message':'Belge başarıyla silindi'})
     except Exception:
         db.session.rollback()
         current_app.logger.exception("Delete doc error")
         return jsonify({'error':'Belge silinirken hata oluştu'}), 500
 
+# ---- Bulk operations ----
+# Gövde: {"ids": [...]} ya da {"filter": {...liste filtreleri}}, "after": <id>. Her istek en fazla
+# BULK_MAX_PER_REQUEST belge işler; yanıttaki next_after null olana kadar after ile tekrarlanır.
+@documents_bp.route('/bulk/delete', methods=['POST'])
+@token_required
+def bulk_delete():
+    try:
+        result = run_batches(request.company_id, request.get_json(silent=True) or {}, delete_documents, require=True)
+        return jsonify({**result, 'deleted': result['affected']})
+    except ListingError as e:
+        return jsonify({'error':str(e)}), 400
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Bulk delete error")
+        return jsonify({'error':'Belgeler silinirken hata oluştu'}), 500
+
+@documents_bp.route('/bulk/reprocess', methods=['POST'])
+@token_required
+def bulk_reprocess():
+    """Metni yeniden çıkar; "force": true değilse yalnızca eski çıkarıcı sürümüyle işlenmiş belgeler"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = run_batches(request.company_id, data, reprocess_documents, force=bool(data.get('force')))
+        if result['affected']:
+            notify_runner()
+        return jsonify({**result, 'queued': result['affected']})
+    except ListingError as e:
+        return jsonify({'error':str(e)}), 400
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Bulk reprocess error")
+        return jsonify({'error':'Belgeler yeniden işlenirken hata oluştu'}), 500
+
+@documents_bp.route('/export', methods=['GET'])
+@token_required
+def export_documents():
+    """Şirket belgelerini akış halinde dışa aktar: ?format=ndjson|zip&files=0&after=<id> + liste filtreleri"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'zip'):
+        return jsonify({'error':'Geçersiz format'}), 400
+    try:
+        _, filters, after = parse_selection({'filter': {k: v for k, v in request.args.items() if k in FILTERS},
+                                             'after': request.args.get('after')})
+        apply_filters(Document.query, filters)  # filtre hataları akış başlamadan 400 dönsün
+    except ListingError as e:
+        return jsonify({'error':str(e)}), 400
+
+    company_id = request.company_id
+    if fmt == 'zip':
+        body = export_zip(company_id, filters, after, include_files=request.args.get('files', '1') != '0')
+        mimetype = 'application/zip'
+    else:
+        body = export_ndjson(company_id, filters, after)
+        mimetype = 'application/x-ndjson'
+
+    def generate():
+        try:
+            yield from body
+        except Exception:
+            # Başlık zaten gönderildi; yarım kalan çıktı istemcide bozuk/eksik görünür
+            current_app.logger.exception("Export error")
+
+    rv = Response(stream_with_context(generate()), mimetype=mimetype)
+    rv.headers['Content-Disposition'] = f'attachment; filename="documents-{company_id}.{fmt}"'
+    return rv
+
 @documents_bp.route('/stats', methods=['GET'])
 @token_required
 def stats():
     try:
-        total = Document.query.filter_by(company_id=request.company_id).count()
-        processed = Document.query.filter_by(company_id=request.company_id, is_processed=True).count()
-        return jsonify({
-            'total_documents': total,
-            'processed_documents': processed,
-            'pending_documents': total - processed
-        })
+        # Sayaçlar yükleme/silme/işleme ile aynı transaction'da güncellenir; burada COUNT yok
+        return versioned_json('stats', request.company_id,
+                              lambda version: current_app.json.dumps(get_stats(request.company_id, version)))
     except Exception:
         current_app.logger.exception("Stats error")
         return jsonify({'error':'İstatistikler alınırken hata oluştu'}), 500
+
+@documents_bp.route('/changes', methods=['GET'])
+@token_required
+def document_changes():
+    """Şirketin belge değişiklik akışı: ?after=<seq>&limit=. Harici indeksleyiciler next_after'ı
+    saklayıp aynı istekle devam eder; has_more false ise şimdilik sona gelinmiştir (şirket filtresi
+    taramayı CHANGE_FEED_SCAN kayıtta durdurduğundan boş sayfa da has_more true olabilir)"""
+    try:
+        after = max(int(request.args.get('after', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 500)), 1), 5000)
+    except ValueError:
+        return jsonify({'error':'Geçersiz parametre'}), 400
+    try:
+        changes, next_after = read_changes(after, limit, company_id=request.company_id)
+        return jsonify({'changes': [c.to_dict() for c in changes], 'next_after': next_after,
+                        'has_more': next_after < latest_seq()})
+    except Exception:
+        current_app.logger.exception("Document changes error")
+        return jsonify({'error':'Değişiklikler alınırken hata oluştu'}), 500
+
+@documents_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def job_status(job_id:int):
+    try:
+        job = ExtractionJob.query.filter_by(id=job_id, company_id=request.company_id).first()
+        if not job:
+            return jsonify({'error':'İş bulunamadı'}), 404
+        return jsonify({'job': job.to_dict()})
+    except Exception:
+        current_app.logger.exception("Job status error")
+        return jsonify({'error':'İş durumu alınırken hata oluştu'}), 500
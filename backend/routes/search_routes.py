@@ -0,0 +1,26 @@
+from flask import Blueprint, request, jsonify, current_app
+
+from services.search import search
+from .auth_routes import token_required
+
+search_bp = Blueprint('search_bp', __name__)
+
+@search_bp.route('', methods=['POST'])
+@token_required
+def search_documents():
+    try:
+        data = request.get_json() or {}
+        q = (data.get('query') or '').strip()
+        if not q:
+            return jsonify({'error':'query gerekli'}), 400
+
+        limit = min(max(int(data.get('limit', 20)), 1), 100)
+        offset = max(int(data.get('offset', 0)), 0)
+        results = search(request.company_id, q, limit=limit, offset=offset,
+                         file_type=data.get('file_type'))
+        return jsonify({'query': q, 'results': results, 'limit': limit, 'offset': offset})
+    except (TypeError, ValueError):
+        return jsonify({'error':'Geçersiz limit/offset'}), 400
+    except Exception:
+        current_app.logger.exception("Search error")
+        return jsonify({'error':'Arama yapılırken hata oluştu'}), 500
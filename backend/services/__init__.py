@@ -0,0 +1 @@
+# Servisler paketi
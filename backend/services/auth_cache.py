@@ -0,0 +1,211 @@
+import threading, time
+from collections import OrderedDict
+from datetime import datetime
+
+import click
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import joinedload
+
+from models.database import db, Company, User, RevokedToken
+
+class TTLCache:
+    """Boyutu sınırlı, girdi başına son kullanma süreli LRU önbellek (thread-safe)"""
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def drop_where(self, predicate):
+        """predicate(key, value) doğru olan girdileri sil"""
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class RevocationList:
+    """İptal edilmiş jti'lerin bellek içi kopyası.
+
+    İstek başına DB'ye gidilmez; liste en fazla `interval` saniyede bir yalnızca
+    yeni satırlar (id > son görülen) çekilerek tazelenir.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self._jtis = {}  # jti -> expires_at
+        self._last_id = 0
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._jtis[jti] = expires_at
+
+    def _refresh(self):
+        rows = (db.session.query(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+                .filter(RevokedToken.id > self._last_id).order_by(RevokedToken.id).all())
+        now = datetime.utcnow()
+        with self._lock:
+            for row_id, jti, expires_at in rows:
+                self._jtis[jti] = expires_at
+                self._last_id = row_id
+            # Süresi dolmuş token zaten çözülemez; listede tutmaya gerek yok
+            for jti in [j for j, exp in self._jtis.items() if exp <= now]:
+                del self._jtis[jti]
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self._next_refresh:
+            self._next_refresh = time.monotonic() + self.interval
+            try:
+                self._refresh()
+            except Exception:
+                current_app.logger.exception("Revocation refresh error")
+        return jti in self._jtis
+
+class AuthCache:
+    """Doğrulanmış token payload'ları + kullanıcı/şirket profilleri + iptal listesi"""
+    def __init__(self, config):
+        size = config.get('AUTH_CACHE_SIZE', 10000)
+        self.tokens = TTLCache(size, config.get('AUTH_TOKEN_CACHE_TTL', 300))
+        self.profiles = TTLCache(size, config.get('AUTH_PROFILE_CACHE_TTL', 60))
+        self.revoked = RevocationList(config.get('AUTH_REVOCATION_REFRESH', 5))
+
+    def invalidate_user(self, user_id):
+        self.profiles.drop_where(lambda key, _: key[0] == user_id)
+
+    def invalidate_company(self, company_id):
+        self.profiles.drop_where(lambda _, p: p['company'] and p['company']['id'] == company_id)
+
+def get_auth_cache(app=None):
+    app = app or current_app._get_current_object()
+    return app.extensions['auth_cache']
+
+def cached_payload(token, decode):
+    """Token'ı önbellekten ya da decode(token) ile doğrula; iptal edilmişse None.
+
+    Önbellek süresi token'ın exp'ini hiçbir zaman aşmaz.
+    """
+    cache = get_auth_cache()
+    payload = cache.tokens.get(token)
+    if payload is None:
+        payload = decode(token)
+        if not payload:
+            return None
+        left = payload.get('exp', 0) - time.time()
+        cache.tokens.set(token, payload, ttl=min(cache.tokens.ttl, left))
+    if payload.get('jti') and cache.revoked.is_revoked(payload['jti']):
+        return None
+    return payload
+
+def revoke(payload):
+    """Token'ı iptal et (commit çağırana ait)"""
+    if not payload.get('jti'):
+        return
+    expires_at = datetime.utcfromtimestamp(payload['exp'])
+    db.session.add(RevokedToken(jti=payload['jti'], user_id=payload['user_id'], expires_at=expires_at))
+    cache = get_auth_cache()
+    cache.revoked.add(payload['jti'], expires_at)
+    cache.tokens.drop_where(lambda _, p: p.get('jti') == payload['jti'])
+
+def get_profile(user_id, company_id):
+    """{'user': ..., 'company': ...} — tek sorguda (joinedload) yüklenir ve önbelleklenir; yoksa None
+
+    Anahtar şirketin veri sürümünü içerir: kullanıcı/şirket yazımları sürümü artırdığından başka
+    süreçlerdeki kopyalar da en geç VERSION_CACHE_TTL (Redis önbelleğinde commit) sonra bayatlar.
+    """
+    from .response_cache import company_version  # response_cache bu modülü içe aktarır
+    cache = get_auth_cache()
+    key = (user_id, company_version(company_id))
+    profile = cache.profiles.get(key)
+    if profile is None:
+        user = User.query.options(joinedload(User.company)).filter_by(id=user_id).first()
+        if not user:
+            return None
+        profile = {'user': user.to_dict(), 'company': user.company.to_dict() if user.company else None}
+        cache.profiles.set(key, profile)
+    return profile
+
+def purge_revoked():
+    """Süresi dolmuş iptal kayıtlarını sil"""
+    n = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+    db.session.commit()
+    return n
+
+# ---- Invalidation ----
+# Yalnızca bunlar değiştiyse şirket veri sürümü artırılmaz: her girişte liste/istatistik önbelleği
+# düşmesin, giriş yoluna companies yazımı eklenmesin. Diğer süreçlerdeki profil kopyası
+# AUTH_PROFILE_CACHE_TTL içinde tazelenir.
+VOLATILE_USER_FIELDS = {'last_login'}
+
+def _changed_fields(obj):
+    return {attr.key for attr in inspect(obj).attrs if attr.history.has_changes()}
+
+def _collect_changes(session, flush_context, instances):
+    from .response_cache import touch
+    dirty = session.info.setdefault('profile_dirty', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, User):
+            dirty.add(('user', obj.id))
+            if obj in session.deleted or not _changed_fields(obj) <= VOLATILE_USER_FIELDS:
+                touch(obj.company_id, session)  # diğer süreçlerin profil önbelleği için
+        elif isinstance(obj, Company):
+            dirty.add(('company', obj.id))
+            touch(obj.id, session)
+
+def _after_commit(session):
+    changes = session.info.pop('profile_dirty', ())
+    if not changes:
+        return
+    cache = get_auth_cache()
+    for kind, obj_id in changes:
+        if kind == 'user':
+            cache.invalidate_user(obj_id)
+        else:
+            cache.invalidate_company(obj_id)
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:  # savepoint geri alınması dış transaction'ın değişikliklerini silmesin
+        session.info.pop('profile_dirty', None)
+
+def init_app(app):
+    app.extensions['auth_cache'] = AuthCache(app.config)
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'before_flush', _collect_changes)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_transaction_end', _after_transaction_end)
+
+    @app.cli.command('purge-revoked-tokens')
+    def purge_revoked_tokens():
+        """Süresi dolmuş iptal kayıtlarını sil"""
+        click.echo(f"{purge_revoked()} kayıt silindi")
@@ -0,0 +1,232 @@
+import io, json, os, tempfile, zipfile
+from collections import Counter, defaultdict
+
+from flask import current_app
+
+from models.database import db, Document, DocumentContent, ExtractionJob, ExtractionResult
+from .extraction import EXTRACTOR_VERSION
+from .indexing import delete_chunks, drop_vectors
+from .jobs import enqueue_extractions
+from .listing import FILTERS, ListingError, apply_filters
+from .stats import bump
+from .changes import record, DELETED
+from .storage import release_blobs, unlink_later
+
+# ---- Selection ----
+def parse_selection(data, require=False):
+    """{ids: [...]} ya da {filter: {...}} + after -> (ids, filters, after).
+
+    require: silme gibi geri alınamaz işlemlerde boş seçim (tüm belgeler) kabul edilmez.
+    """
+    ids, filters = data.get('ids'), data.get('filter') or {}
+    if ids is not None:
+        if not isinstance(ids, list):
+            raise ListingError('ids liste olmalı')
+        try:
+            ids = sorted({int(i) for i in ids})
+        except (TypeError, ValueError):
+            raise ListingError('Geçersiz id')
+        if len(ids) > current_app.config.get('BULK_MAX_IDS', 10000):
+            raise ListingError('Çok fazla id; after ile parçalara bölün ya da filter kullanın')
+    if not isinstance(filters, dict):
+        raise ListingError('filter nesne olmalı')
+    unknown = [k for k in filters if k not in FILTERS]
+    if unknown:
+        raise ListingError(f"Bilinmeyen filtre: {', '.join(unknown)}")
+    filters = {k: ','.join(map(str, v)) if isinstance(v, list) else str(v)
+               for k, v in filters.items() if v is not None}
+    if require and ids is None and not filters:
+        raise ListingError('ids ya da filter gerekli')
+    try:
+        after = int(data.get('after') or 0)
+    except (TypeError, ValueError):
+        raise ListingError('Geçersiz after')
+    return ids, filters, after
+
+def select_ids(company_id, ids, filters, after, limit):
+    q = db.session.query(Document.id).filter(Document.company_id == company_id, Document.id > after)
+    if ids is not None:
+        q = q.filter(Document.id.in_(ids))
+    q = apply_filters(q, filters)
+    return [i for (i,) in q.order_by(Document.id).limit(limit)]
+
+def run_batches(company_id, data, op, require=False, **kwargs):
+    """Seçilen belgeleri id sırasıyla BULK_BATCH_SIZE'lık partilerde op ile işle.
+
+    Her parti kendi transaction'ında commit edilir; hata yalnızca o partiyi geri alır.
+    İstek başına en fazla BULK_MAX_PER_REQUEST belge taranır; yanıttaki next_after ile
+    aynı istek tekrarlanarak devam edilir (null ise bitti).
+    """
+    ids, filters, after = parse_selection(data, require)
+    batch_size = current_app.config.get('BULK_BATCH_SIZE', 500)
+    budget = current_app.config.get('BULK_MAX_PER_REQUEST', 5000)
+    matched = affected = 0
+    while matched < budget:
+        batch = select_ids(company_id, ids, filters, after, min(batch_size, budget - matched))
+        if not batch:
+            return {'matched': matched, 'affected': affected, 'next_after': None}
+        affected += op(company_id, batch, **kwargs)
+        matched += len(batch); after = batch[-1]
+    return {'matched': matched, 'affected': affected, 'next_after': after}
+
+# ---- Operations ----
+def delete_documents(company_id, ids):
+    """Belgeleri küme tabanlı SQL ile sil ve commit et. Dönüş: silinen belge sayısı.
+
+    İstatistik, blob referansları ve bağlı tablolar parti başına birkaç sorguyla güncellenir;
+    vektörler ve dosyalar commit'ten sonra düşülür (dosyalar arka planda).
+    """
+    rows = (db.session.query(Document.id, Document.file_type, Document.is_processed, Document.file_size,
+                             Document.content_hash, Document.file_path)
+            .filter(Document.company_id == company_id, Document.id.in_(ids)).all())
+    if not rows:
+        return 0
+    ids = [r.id for r in rows]
+    totals, blobs, legacy = defaultdict(lambda: [0, 0, 0]), Counter(), []
+    for r in rows:
+        t = totals[r.file_type]
+        t[0] += 1; t[1] += 1 if r.is_processed else 0; t[2] += r.file_size or 0
+        if r.content_hash: blobs[r.content_hash] += 1
+        else: legacy.append(r.file_path)  # eski (hash'siz) kayıtların dosyası paylaşılmaz
+    try:
+        for file_type, (count, processed, size) in sorted(totals.items(), key=lambda kv: kv[0] or ''):
+            bump(company_id, file_type, total=-count, processed=-processed, size=-size)
+        chunks = delete_chunks(ids)
+        record(company_id, ids, DELETED, {doc_id: {'chunk_ids': c} for doc_id, c in chunks.items()})
+        for model in (DocumentContent, ExtractionJob):
+            model.query.filter(model.document_id.in_(ids)).delete(synchronize_session=False)
+        Document.query.filter(Document.id.in_(ids)).delete(synchronize_session=False)
+        unlink = release_blobs(blobs) + legacy
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    drop_vectors(company_id, [c for ids in chunks.values() for c in ids])
+    unlink_later(unlink)
+    return len(ids)
+
+def reprocess_documents(company_id, ids, force=False):
+    """Belgeler için yeni çıkarma işi aç ve commit et. Dönüş: kuyruğa alınan belge sayısı.
+
+    Bekleyen/çalışan işi olan belgeler atlanır. force yoksa yalnızca güncel çıkarıcı
+    sürümüyle sonucu önbellekte olmayanlar (eski sürümle işlenmiş ya da hash'siz) alınır;
+    force ile bu içeriklerin güncel sürüm önbelleği silinip hepsi yeniden çıkarılır.
+    """
+    active = (db.session.query(ExtractionJob.document_id)
+              .filter(ExtractionJob.document_id.in_(ids), ExtractionJob.status.in_(('pending', 'running'))))
+    q = Document.query.filter(Document.company_id == company_id, Document.id.in_(ids), ~Document.id.in_(active))
+    current = (db.session.query(ExtractionResult.content_hash)
+               .filter(ExtractionResult.extractor_version == EXTRACTOR_VERSION))
+    if not force:
+        q = q.filter(Document.content_hash.is_(None) | ~Document.content_hash.in_(current))
+    docs = q.all()
+    if not docs:
+        return 0
+    try:
+        hashes = list({d.content_hash for d in docs if d.content_hash})
+        if force and hashes:
+            ExtractionResult.query.filter(ExtractionResult.content_hash.in_(hashes),
+                                          ExtractionResult.extractor_version == EXTRACTOR_VERSION)\
+                .delete(synchronize_session=False)
+        enqueue_extractions(docs)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(docs)
+
+# ---- Export ----
+def _doc_batches(company_id, filters, after):
+    batch_size = current_app.config.get('BULK_BATCH_SIZE', 500)
+    while True:
+        docs = (apply_filters(Document.query.filter(Document.company_id == company_id, Document.id > after), filters)
+                .order_by(Document.id).limit(batch_size).all())
+        if not docs:
+            return
+        yield docs
+        after = docs[-1].id
+        db.session.expunge_all()  # uzun dışa aktarımda kimlik haritası büyümesin
+
+def _pages(ids):
+    """Partinin sayfaları (document_id, page_number) sırasıyla, sunucu tarafı imleçle"""
+    return (db.session.query(DocumentContent.document_id, DocumentContent.page_number,
+                             DocumentContent.content_type, DocumentContent.content)
+            .filter(DocumentContent.document_id.in_(ids))
+            .order_by(DocumentContent.document_id, DocumentContent.page_number)
+            .yield_per(100))
+
+def _with_pages(docs):
+    """[(doc, sayfa üreteci)] - sayfalar tek sorgudan belge sırasına göre dağıtılır"""
+    rows = iter(_pages([d.id for d in docs]))
+    pending = [next(rows, None)]
+    def pages_of(doc_id):
+        while pending[0] is not None and pending[0].document_id < doc_id:
+            pending[0] = next(rows, None)  # önceki belgenin okunmamış sayfaları
+        while pending[0] is not None and pending[0].document_id == doc_id:
+            yield pending[0]
+            pending[0] = next(rows, None)
+    for doc in docs:
+        yield doc, pages_of(doc.id)
+
+def export_ndjson(company_id, filters, after=0):
+    """Belge başına bir {"type":"document"} satırı ve ardından sayfa başına {"type":"page"} satırları.
+
+    id sırasıyla akar; yarıda kalan dışa aktarım son görülen belge id'si after verilerek sürdürülür.
+    """
+    for docs in _doc_batches(company_id, filters, after):
+        for doc, pages in _with_pages(docs):
+            yield json.dumps({'type': 'document', **doc.to_dict()}, ensure_ascii=False) + "\n"
+            for p in pages:
+                yield json.dumps({'type': 'page', 'document_id': p.document_id, 'page_number': p.page_number,
+                                  'content_type': p.content_type, 'content': p.content}, ensure_ascii=False) + "\n"
+
+class _Sink(io.RawIOBase):
+    """ZipFile'ın yazdığı byte'ları biriktirir; akış üreteci her adımda boşaltır (seek desteklemez)"""
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def pop(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+def export_zip(company_id, filters, after=0, include_files=True, chunk_size=None):
+    """files/<id>_<ad> (orijinal dosya), text/<id>.txt (sayfalar form feed ile) ve documents.ndjson.
+
+    Zip doğrudan yanıta akıtılır; dosyalar parça parça okunur, manifest geçici dosyada tutulur.
+    """
+    chunk_size = chunk_size or current_app.config.get('UPLOAD_CHUNK_SIZE', 1024**2)
+    sink = _Sink()
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as manifest:
+        with zipfile.ZipFile(sink, 'w', allowZip64=True) as zf:
+            for docs in _doc_batches(company_id, filters, after):
+                for doc, pages in _with_pages(docs):
+                    manifest.write(json.dumps(doc.to_dict(), ensure_ascii=False) + "\n")
+                    if include_files and os.path.exists(doc.file_path):
+                        info = zipfile.ZipInfo(f"files/{doc.id}_{doc.original_filename}")
+                        info.compress_type = zipfile.ZIP_STORED
+                        with open(doc.file_path, 'rb') as src, \
+                                zf.open(info, 'w', force_zip64=(doc.file_size or 0) > 2**31) as dst:
+                            for chunk in iter(lambda: src.read(chunk_size), b''):
+                                dst.write(chunk)
+                                yield sink.pop()
+                    info = zipfile.ZipInfo(f"text/{doc.id}.txt")
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    with zf.open(info, 'w') as dst:
+                        for i, p in enumerate(pages):
+                            dst.write(('\f\n' if i else '').encode() + p.content.encode('utf-8'))
+                            yield sink.pop()
+            manifest.seek(0)
+            info = zipfile.ZipInfo('documents.ndjson')
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zf.open(info, 'w') as dst:
+                for line in manifest:
+                    dst.write(line.encode('utf-8'))
+        yield sink.pop()
@@ -0,0 +1,143 @@
+import json
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import event, func, insert, text
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db, DocumentChange, ChangeConsumer
+
+# Değişiklik türleri
+CREATED, CONTENT, DELETED = 'created', 'content', 'deleted'
+
+# PostgreSQL: günlük kayıtları commit anında yazılır; seq alımından commit'e kadar (yalnızca INSERT +
+# COMMIT süresince) bu advisory lock'ta sıraya girilir, böylece seq sırası commit sırasıyla aynıdır.
+# SQLite zaten tek yazarlıdır.
+CHANGE_LOG_LOCK = 7240022
+
+# ---- Write ----
+def record(company_id, document_ids, op, payloads=None):
+    """Belge değişikliklerini günlüğe ekle (commit çağırana ait; değişiklikle aynı transaction).
+
+    payloads: {document_id: dict} (isteğe bağlı). Kayıtlar session'da bekler ve commit'te
+    (_before_commit) tek INSERT (executemany) ile yazılır; yükleme/çıkarma/silme işinin kendisi
+    küresel kilidi tutmaz.
+    """
+    if not document_ids:
+        return
+    payloads = payloads or {}
+    db.session.info.setdefault('change_rows', []).extend(
+        {'company_id': company_id, 'document_id': doc_id, 'op': op,
+         'payload': json.dumps(payloads[doc_id]) if doc_id in payloads else None,
+         'created_at': datetime.utcnow()} for doc_id in document_ids)
+
+def _before_commit(session):
+    rows = session.info.pop('change_rows', None)
+    if not rows:
+        return
+    session.flush()  # bekleyen ORM değişiklikleri kilit alınmadan yazılsın
+    if session.get_bind().dialect.name == 'postgresql':
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': CHANGE_LOG_LOCK})
+    session.execute(insert(DocumentChange), rows)
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:  # geri alınan transaction'ın kayıtları sonrakine taşınmasın
+        session.info.pop('change_rows', None)
+
+# ---- Read ----
+def _horizon(after, scan):
+    """after'dan sonraki en fazla scan kaydın son seq'i (şirket filtresinde atlanacak aralık).
+
+    Yazarlar commit anında seq alımından commit'e kadar sıraya girdiği için görünen bir seq'ten
+    küçük ve görünmeyen her seq geri alınmış bir transaction'a aittir; boşluk beklenmeden
+    atlanabilir, uzun süren bir yazar daha sonra küçük bir seq ile commit edemez.
+    """
+    last = (db.session.query(func.max(DocumentChange.seq))
+            .filter(DocumentChange.seq.in_(db.session.query(DocumentChange.seq)
+                                           .filter(DocumentChange.seq > after)
+                                           .order_by(DocumentChange.seq).limit(scan)))
+            .scalar())
+    return last or after
+
+def read_changes(after=0, limit=500, company_id=None):
+    """seq > after olan değişiklikler, seq sırasıyla en fazla limit kayıt.
+
+    company_id verilirse yalnızca o şirketin kayıtları döner; şirket filtresinde tarama CHANGE_FEED_SCAN
+    kayıtta durduğu için limit'ten az (hatta hiç) kayıt dönüp arkada yenileri kalabilir, devamı olup
+    olmadığı next_after < latest_seq() ile anlaşılır. Dönüş: (changes, next_after); bir sonraki çağrı
+    after=next_after ile yapılır (başka şirketlerin kayıtları da atlanmış olur).
+    """
+    horizon = _horizon(after, max(limit, current_app.config.get('CHANGE_FEED_SCAN', 5000)))
+    q = DocumentChange.query.filter(DocumentChange.seq > after, DocumentChange.seq <= horizon)
+    if company_id is not None:
+        q = q.filter(DocumentChange.company_id == company_id)
+    changes = q.order_by(DocumentChange.seq).limit(limit).all()
+    next_after = changes[-1].seq if len(changes) == limit else horizon
+    return changes, next_after
+
+def latest_seq():
+    return db.session.query(func.max(DocumentChange.seq)).scalar() or 0
+
+# ---- Consumers ----
+def get_offset(name):
+    consumer = db.session.get(ChangeConsumer, name)
+    return consumer.last_seq if consumer else 0
+
+def consume(name, handler, limit=None):
+    """Tüketicinin kaldığı yerden bir parti oku, handler([change dict]) ile işle, konumu ilerlet.
+
+    handler hata verirse konum ilerlemez ve parti bir sonraki çağrıda yeniden gelir
+    (en az bir kez teslim); handler'lar idempotent olmalıdır. Dönüş: işlenen kayıt sayısı.
+    """
+    limit = limit or current_app.config.get('CHANGE_FEED_BATCH', 500)
+    offset = get_offset(name)
+    changes, next_after = read_changes(offset, limit)
+    changes = [c.to_dict() for c in changes]
+    db.session.commit()  # handler (ör. vektör indeksi) sürerken okuma transaction'ı açık kalmasın
+    if changes:
+        handler(changes)
+    if next_after != offset:
+        n = (ChangeConsumer.query.filter(ChangeConsumer.name == name, ChangeConsumer.last_seq < next_after)
+             .update({'last_seq': next_after}, synchronize_session=False))
+        if not n and db.session.get(ChangeConsumer, name) is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ChangeConsumer(name=name, last_seq=next_after))
+            except IntegrityError:
+                pass  # aynı adlı başka süreç önce kaydetti; parti bir kez daha işlenebilir
+        db.session.commit()
+    return len(changes)
+
+def prune(retention_days=None):
+    """Tüm kayıtlı tüketicilerin işlediği ve saklama süresini aşan kayıtları sil.
+
+    Kayıtlı olmayan (HTTP ile okuyan) tüketiciler için yalnızca saklama süresi korunur.
+    """
+    days = current_app.config.get('CHANGE_FEED_RETENTION_DAYS', 7) if retention_days is None else retention_days
+    q = DocumentChange.query.filter(DocumentChange.created_at < datetime.utcnow() - timedelta(days=days))
+    consumed = db.session.query(func.min(ChangeConsumer.last_seq)).scalar()
+    if consumed is not None:
+        q = q.filter(DocumentChange.seq <= consumed)
+    n = q.delete(synchronize_session=False)
+    db.session.commit()
+    return n
+
+def init_app(app):
+    if not event.contains(db.session, 'before_commit', _before_commit):
+        event.listen(db.session, 'before_commit', _before_commit)
+        event.listen(db.session, 'after_transaction_end', _after_transaction_end)
+
+    @app.cli.command('prune-changes')
+    @click.option('--days', type=int, default=None, help='Saklama süresi (gün)')
+    def prune_changes(days):
+        """İşlenmiş ve süresi dolmuş belge değişikliği kayıtlarını sil"""
+        click.echo(f"{prune(days)} kayıt silindi")
+
+    @app.cli.command('change-consumers')
+    def change_consumers():
+        """Tüketicilerin konumu ve günlüğün sonu (gecikme)"""
+        latest = latest_seq()
+        click.echo(f"son seq: {latest}")
+        for c in ChangeConsumer.query.order_by(ChangeConsumer.name):
+            click.echo(f"{c.name}: {c.last_seq} (geride {latest - c.last_seq})")
@@ -0,0 +1,128 @@
+import logging, threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from models.database import db, ChatSession, ChatMessage
+from .llm import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Rol başına mesaj çerçevesi (rol adı, ayraçlar) için eklenen token payı
+MESSAGE_OVERHEAD = 4
+
+def _cost(text):
+    return count_tokens(text) + MESSAGE_OVERHEAD
+
+def fit_sources(sources, budget):
+    """Belge pasajlarını (skor sırasıyla) CHAT_SOURCES_TOKENS bütçesine sığdır; ilk pasaj her zaman kalır"""
+    out = []
+    for s in sources:
+        cost = _cost(s['content'])
+        if out and cost > budget:
+            break
+        budget -= cost
+        out.append(s)
+    return out
+
+def load_history(session, before_id):
+    """Modele gidecek geçmiş: kayan özet + özetlenmemiş son mesajlar.
+
+    Oturumun tüm mesajları değil, yalnızca son CHAT_HISTORY_TURNS + CHAT_SUMMARY_BATCH
+    satır tek sorguyla okunur; en yeniden eskiye CHAT_HISTORY_TOKENS bütçesi dolana kadar eklenir.
+    Dönüş: [{'role', 'content'}] (kronolojik)
+    """
+    cfg = current_app.config
+    window = cfg.get('CHAT_HISTORY_TURNS', 6) + cfg.get('CHAT_SUMMARY_BATCH', 4)
+    rows = (ChatMessage.query.with_entities(ChatMessage.message, ChatMessage.response)
+            .filter(ChatMessage.session_id == session.id, ChatMessage.id > session.summary_until,
+                    ChatMessage.id < before_id, ChatMessage.response.isnot(None))
+            .order_by(ChatMessage.id.desc()).limit(window).all())
+    budget, out = cfg.get('CHAT_HISTORY_TOKENS', 2000), []
+    for question, answer in rows:
+        cost = _cost(question) + _cost(answer)
+        if cost > budget:
+            break
+        budget -= cost
+        out[:0] = [{'role': 'user', 'content': question}, {'role': 'assistant', 'content': answer}]
+    if session.summary:
+        out.insert(0, {'role': 'system', 'content': f"Önceki konuşmanın özeti:\n{session.summary}"})
+    return out
+
+def compact(session_id, llm):
+    """Pencerenin dışına taşan eski mesajları oturumun kayan özetine kat.
+
+    Özetlenmemiş mesaj sayısı CHAT_HISTORY_TURNS + CHAT_SUMMARY_BATCH'e ulaşınca en eskiler
+    (her seferde en fazla 2 * CHAT_SUMMARY_BATCH) önceki özetle birlikte yeniden özetlenir;
+    böylece her tur sabit maliyetli kalır, eski oturumlar da birkaç turda yetişir. LLM çağrısı
+    sırasında DB bağlantısı tutulmaz; aynı oturumu eşzamanlı özetleyen istekten yalnızca biri
+    yazar (summary_until koşullu UPDATE). Dönüş: özete katılan mesaj sayısı.
+    """
+    cfg = current_app.config
+    keep, batch = cfg.get('CHAT_HISTORY_TURNS', 6), cfg.get('CHAT_SUMMARY_BATCH', 4)
+    session = db.session.get(ChatSession, session_id)
+    if session is None:
+        return 0
+    previous, until = session.summary, session.summary_until
+    rows = (ChatMessage.query.with_entities(ChatMessage.id, ChatMessage.message, ChatMessage.response)
+            .filter(ChatMessage.session_id == session_id, ChatMessage.id > until)
+            .order_by(ChatMessage.id).limit(keep + 2 * batch).all())
+    db.session.rollback()  # okuma transaction'ı LLM çağrısı boyunca açık kalmasın
+    if len(rows) < keep + batch:
+        return 0
+    fold = rows[:len(rows) - keep]
+    summary = llm.summarize(previous, [(q, a or '') for _, q, a in fold],
+                            cfg.get('CHAT_SUMMARY_TOKENS', 400))
+    updated = (ChatSession.query.filter_by(id=session_id, summary_until=until)
+               .update({'summary': summary, 'summary_until': fold[-1][0]}, synchronize_session=False))
+    db.session.commit()
+    return len(fold) if updated else 0
+
+def compact_quietly(session_id, llm):
+    """Yanıt kaydedildikten sonra çağrılır; özetleme hatası sohbeti bozmaz (sonraki turda yeniden denenir)"""
+    try:
+        return compact(session_id, llm)
+    except Exception:
+        db.session.rollback()
+        logger.exception("Chat summary error")
+        return 0
+
+class Compactor:
+    """Özetlemeyi yanıt yolunun dışında, arka plan thread'lerinde (gevent altında greenlet) yapar.
+
+    Aynı oturum için bekleyen iş varsa yenisi eklenmez; istemci bağlantıyı kapatsa da özet yazılır.
+    """
+    def __init__(self, app, workers=2):
+        self.app = app
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat-summary')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, llm):
+        with self._lock:
+            if session_id in self._pending:
+                return None
+            self._pending.add(session_id)
+        return self.pool.submit(self._run, session_id, llm)
+
+    def _run(self, session_id, llm):
+        with self.app.app_context():
+            try:
+                return compact_quietly(session_id, llm)
+            finally:
+                with self._lock:
+                    self._pending.discard(session_id)
+                db.session.remove()
+
+_compactor_lock = threading.Lock()
+
+def compact_later(session_id, llm):
+    """Yanıt kaydedildikten sonra çağrılır; CHAT_SUMMARY_ASYNC kapalıysa hemen özetler"""
+    app = current_app._get_current_object()
+    if not app.config.get('CHAT_SUMMARY_ASYNC', True):
+        return compact_quietly(session_id, llm)
+    with _compactor_lock:
+        compactor = app.extensions.get('chat_compactor')
+        if compactor is None:
+            compactor = app.extensions['chat_compactor'] = Compactor(app, app.config.get('CHAT_SUMMARY_THREADS', 2))
+    return compactor.submit(session_id, llm)
@@ -0,0 +1,87 @@
+import mimetypes, os, unicodedata
+from urllib.parse import quote
+
+from flask import Response, current_app, request, send_file
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import func
+
+from models.database import db, DocumentContent
+
+# ---- Signed download links ----
+# <a href> / tarayıcı indirmesi Authorization başlığı gönderemez; kısa ömürlü imzalı bağlantı verilir
+def _signer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='document-download')
+
+def sign_download(doc):
+    return _signer().dumps([doc.id, doc.company_id])
+
+def verify_download(sig):
+    """İmzalı bağlantıdan (doc_id, company_id); geçersiz ya da süresi dolmuşsa None"""
+    try:
+        doc_id, company_id = _signer().loads(sig, max_age=current_app.config.get('DOWNLOAD_URL_TTL', 300))
+        return int(doc_id), int(company_id)
+    except (BadSignature, ValueError, TypeError):
+        return None
+
+# ---- File responses ----
+def _content_disposition(name, inline):
+    kind = 'inline' if inline else 'attachment'
+    try:
+        name.encode('ascii')
+        return f'{kind}; filename="{name}"'
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+        return f'{kind}; filename="{simple}"; filename*=UTF-8\'\'{quote(name, safe="!#$&+^`|~")}'
+
+def _cache_headers(rv):
+    max_age = current_app.config.get('DOWNLOAD_CACHE_MAX_AGE', 0)
+    rv.cache_control.public = False
+    rv.cache_control.private = True
+    rv.cache_control.max_age = max_age
+    rv.cache_control.no_cache = True if not max_age else None
+    return rv
+
+def send_document(doc, inline=False):
+    """Belgenin dosyasını gönder; gövde hiçbir zaman Python belleğine alınmaz.
+
+    ETag içerik hash'idir (blob içerik adreslidir, aynı hash aynı byte'lar demektir).
+    DOWNLOAD_ACCEL_PREFIX tanımlıysa gövdeyi nginx X-Accel-Redirect ile gönderir (Range
+    dahil); USE_X_SENDFILE ise Flask'ın X-Sendfile desteği kullanılır. İkisi de yoksa
+    send_file Range / If-Range / If-None-Match'i karşılar, gövdeyi wsgi.file_wrapper ile
+    (gunicorn'da sendfile) akıtır.
+    """
+    mimetype = mimetypes.guess_type(doc.original_filename)[0] or 'application/octet-stream'
+    prefix = current_app.config.get('DOWNLOAD_ACCEL_PREFIX')
+    if prefix:
+        etag = doc.content_hash
+        if etag and request.if_none_match.contains(etag):
+            rv = Response(status=304)
+        else:
+            rel = os.path.relpath(doc.file_path, current_app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+            rv = Response(mimetype=mimetype)
+            rv.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(rel)
+            rv.headers['Content-Disposition'] = _content_disposition(doc.original_filename, inline)
+        if etag:
+            rv.set_etag(etag)
+        return _cache_headers(rv)
+    rv = send_file(doc.file_path, mimetype=mimetype, as_attachment=not inline,
+                   download_name=doc.original_filename, etag=doc.content_hash or True,
+                   conditional=True, max_age=None)
+    return _cache_headers(rv)
+
+# ---- Text preview ----
+def content_pages(doc_id, after=0, limit=5, max_chars=None):
+    """Çıkarılmış metnin page_number > after olan ilk limit sayfası (document_id, page_number indeksiyle).
+
+    max_chars verilirse sayfa metni veritabanında kırpılır; uzun sayfa belleğe alınmaz.
+    Dönüş: (sayfalar, next_after) - next_after devam yoksa None.
+    """
+    content = func.substr(DocumentContent.content, 1, max_chars) if max_chars else DocumentContent.content
+    rows = (db.session.query(DocumentContent.page_number, DocumentContent.content_type,
+                             func.length(DocumentContent.content), content)
+            .filter(DocumentContent.document_id == doc_id, DocumentContent.page_number > after)
+            .order_by(DocumentContent.page_number).limit(limit + 1).all())
+    pages = [{'page_number': n, 'content_type': ctype, 'chars': chars, 'content': text,
+              'truncated': len(text) < chars}
+             for n, ctype, chars, text in rows[:limit]]
+    return pages, (pages[-1]['page_number'] if len(rows) > limit else None)
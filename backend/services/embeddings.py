@@ -0,0 +1,104 @@
+import logging, re, threading, zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+class HashingEmbedder:
+    """Model gerektirmeyen deterministik embedding (özellik hash'leme, unigram + bigram).
+
+    Dev/test ortamı ve sentence-transformers kurulu olmadığında kullanılır.
+    crc32 süreçler arasında sabittir (Python hash'inin aksine).
+    """
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+
+    def _features(self, text):
+        toks = _TOKEN_RE.findall(text.lower())
+        feats = toks + [a + ' ' + b for a, b in zip(toks, toks[1:])]
+        return [zlib.crc32(f.encode('utf-8')) for f in feats]
+
+    def encode(self, texts, batch_size=64):
+        rows, hashes = [], []
+        for i, t in enumerate(texts):
+            h = self._features(t)
+            rows.extend([i] * len(h)); hashes.extend(h)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if hashes:
+            h = np.asarray(hashes, dtype=np.uint32)
+            cols = (h % self.dim).astype(np.int64)
+            signs = np.where((h >> 31) & 1, -1.0, 1.0).astype(np.float32)
+            flat = np.asarray(rows, dtype=np.int64) * self.dim + cols
+            out = np.bincount(flat, weights=signs, minlength=out.size).astype(np.float32).reshape(out.shape)
+        return normalize(out)
+
+class SentenceTransformerEmbedder:
+    """sentence-transformers modeli, yalnızca CPU"""
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name.replace('/', '_')
+
+    def encode(self, texts, batch_size=64):
+        vecs = self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True,
+                                 normalize_embeddings=True, show_progress_bar=False)
+        return vecs.astype(np.float32, copy=False)
+
+class CrossEncoderReranker:
+    """sentence-transformers CrossEncoder: (soru, parça) çiftlerini birlikte puanlar, yalnızca CPU"""
+    def __init__(self, model_name, max_length=512):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device='cpu', max_length=max_length)
+        self.name = model_name.replace('/', '_')
+
+    def score(self, query, texts, batch_size=16):
+        if not texts:
+            return []
+        scores = self.model.predict([(query, t) for t in texts], batch_size=batch_size,
+                                    convert_to_numpy=True, show_progress_bar=False)
+        return [float(s) for s in scores]
+
+def normalize(vecs):
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vecs / norms).astype(np.float32, copy=False)
+
+_embedders = {}
+_lock = threading.Lock()
+
+def get_embedder(config):
+    """Config'e göre süreç başına tek embedder (model bir kez yüklenir)"""
+    backend = config.get('EMBEDDING_BACKEND', 'hashing')
+    model = config.get('EMBEDDING_MODEL')
+    key = (backend, model)
+    with _lock:
+        if key not in _embedders:
+            if backend == 'sentence-transformers':
+                try:
+                    _embedders[key] = SentenceTransformerEmbedder(model)
+                except ImportError:
+                    logger.warning("sentence-transformers kurulu değil; hashing embedder kullanılıyor")
+                    _embedders[key] = HashingEmbedder(config.get('EMBEDDING_DIM', 384))
+            else:
+                _embedders[key] = HashingEmbedder(config.get('EMBEDDING_DIM', 384))
+        return _embedders[key]
+
+_rerankers = {}
+
+def get_reranker(config):
+    """RERANK_MODEL verilmişse süreç başına tek cross-encoder; yoksa ya da yüklenemezse None"""
+    model = config.get('RERANK_MODEL')
+    if not model:
+        return None
+    with _lock:
+        if model not in _rerankers:
+            try:
+                _rerankers[model] = CrossEncoderReranker(model)
+            except ImportError:
+                logger.warning("sentence-transformers kurulu değil; yeniden sıralama kapalı")
+                _rerankers[model] = None
+        return _rerankers[model]
@@ -0,0 +1,428 @@
+import json, os, shutil, subprocess, tempfile, zipfile
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from concurrent.futures import wait, FIRST_COMPLETED
+
+import pdfplumber, openpyxl
+from PIL import Image
+
+from . import ocr
+
+# Çıkarıcıların çıktısını değiştiren her değişiklikte artırılmalı; önbellek bu sürüme göre tutulur
+EXTRACTOR_VERSION = '4'
+
+IMAGE_EXT = {'png','jpg','jpeg','gif','tif','tiff'}
+
+# Bu yükseklikten uzun görseller yatay şeritlere bölünerek paralel OCR'lanır
+IMAGE_TILE_HEIGHT = int(os.environ.get('IMAGE_TILE_HEIGHT', 4000))
+
+# Satır/paragraf akışı yapan biçimler (Excel, Word, txt) bu sınırlarla sayfalara bölünür.
+# EXTRACT_MAX_CHARS belge başına tavandır (sayfalar yazılırken uygulanır); işçide her birim de
+# bu tavanda kesilir, böylece tek bir birim sınırın ötesini hiç okumaz.
+STREAM_EXT = {'xlsx','xls','docx','doc','txt'}
+EXTRACT_ROWS_PER_PAGE = int(os.environ.get('EXTRACT_ROWS_PER_PAGE', 500))
+EXTRACT_PAGE_CHARS = int(os.environ.get('EXTRACT_PAGE_CHARS', 64 * 1024))
+EXTRACT_MAX_CHARS = int(os.environ.get('EXTRACT_MAX_CHARS', 50 * 1024**2))
+TRUNCATED_NOTE = "[... içerik boyut sınırı nedeniyle kesildi]"
+
+# Paralel çıkarmanın iş birimi: bir PDF sayfası, bir görsel karesi/şeridi, bir Excel sayfası
+# ya da tüm dosya. seq birimin plan içindeki sırasıdır; aynı sayfanın şeritleri seq sırasıyla
+# birleştirilir. Akış birimlerinin (sheet/stream) page_number'ı None'dır; ürettikleri sayfalar
+# birleştirme sırasında numaralanır.
+Unit = namedtuple('Unit', 'seq page_number kind path ext args')
+
+class SpooledPages:
+    """Akış biriminin (sheet/stream) sayfaları: işçi süreçte geçici dosyaya satır başına JSON
+    olarak yazılır, süreçler arasında yalnızca yol taşınır; yazılırken sayfa sayfa okunur"""
+    def __init__(self, path, count):
+        self.path, self.count = path, count
+
+    def __iter__(self):
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+def _spool(pages):
+    fd, path = tempfile.mkstemp(prefix='extract-', suffix='.jsonl')
+    count = 0
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for text in pages:
+                f.write(json.dumps(text, ensure_ascii=False) + '\n'); count += 1
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledPages(path, count)
+
+def discard_results(results):
+    """Yazılmadan bırakılan (hatalı / iptal) işin biriktirilmiş sayfa dosyalarını sil"""
+    for result in results.values():
+        if isinstance(result, SpooledPages):
+            result.discard()
+
+# ---- Text extraction helpers ----
+# Bu fonksiyonlar arka plan işçi süreçlerinde çalışır; Flask/DB'ye dokunmamalı.
+def _page_text(page, path, index):
+    """PDF sayfasının metin katmanı; taranmış sayfalar rasterleştirilip OCR'lanır"""
+    text = (page.extract_text() or "").strip()
+    if ocr.needs_ocr(page, text):
+        return ocr.ocr_pdf_page(page, path, index) or text
+    return text
+
+def _extract_pdf(path):
+    out=[]
+    with pdfplumber.open(path) as pdf:
+        for i, p in enumerate(pdf.pages):
+            t = _page_text(p, path, i)
+            if t: out.append(t)
+    return "\n".join(out).strip()
+
+# ---- Streaming extractors ----
+# Satırlar tek tek üretilir; hiçbir zaman tüm belgenin satır listesi bellekte tutulmaz.
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+def _is_zip(path):
+    with open(path, 'rb') as f:
+        return f.read(2) == b'PK'
+
+# openpyxl dosya adının uzantısına bakar; blob yolları uzantısız olduğundan dosya nesnesi verilir
+def _xlsx_sheets(path):
+    with open(path, 'rb') as f:
+        wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        try:
+            return wb.sheetnames
+        finally:
+            wb.close()
+
+def _iter_xlsx_rows(path, sheet_index):
+    with open(path, 'rb') as f:
+        wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        try:
+            for row in wb.worksheets[sheet_index].iter_rows(values_only=True):
+                vals = [v for v in (str(c) for c in row if c is not None) if v.strip()]
+                if vals: yield " | ".join(vals)
+        finally:
+            wb.close()
+
+def _xls_sheets(path):
+    import xlrd
+    wb = xlrd.open_workbook(path, on_demand=True)
+    try:
+        return wb.sheet_names()
+    finally:
+        wb.release_resources()
+
+def _xls_value(cell, datemode):
+    import xlrd
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return None
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        return str(xlrd.xldate_as_datetime(cell.value, datemode))
+    if cell.ctype == xlrd.XL_CELL_NUMBER and float(cell.value).is_integer():
+        return str(int(cell.value))
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return str(bool(cell.value))
+    if cell.ctype == xlrd.XL_CELL_ERROR:
+        return None
+    return str(cell.value)
+
+def _iter_xls_rows(path, sheet_index):
+    import xlrd
+    # .xls en fazla 65536 satırdır; on_demand ile yalnızca istenen sayfa yüklenir
+    wb = xlrd.open_workbook(path, on_demand=True)
+    try:
+        sheet = wb.sheet_by_index(sheet_index)
+        for r in range(sheet.nrows):
+            vals = [v for v in (_xls_value(c, wb.datemode) for c in sheet.row(r)) if v and v.strip()]
+            if vals: yield " | ".join(vals)
+    finally:
+        wb.release_resources()
+
+def _run_text(p):
+    for node in p.iter():
+        if node.tag == W + 't' and node.text:
+            yield node.text
+        elif node.tag == W + 'tab':
+            yield '\t'
+        elif node.tag in (W + 'br', W + 'cr'):
+            yield '\n'
+
+def _iter_wordml(stream):
+    """WordprocessingML parçasını iterparse ile akıt: paragraflar ve tablo satırları belge sırasıyla"""
+    stack, rows, cells = [], [], []
+    for event, el in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            stack.append(el)
+            if el.tag == W + 'tr': rows.append([])
+            elif el.tag == W + 'tc': cells.append([])
+            continue
+        stack.pop()
+        if el.tag == W + 'p':
+            text = ''.join(_run_text(el))
+            if cells: cells[-1].append(text)
+            elif text.strip(): yield text
+        elif el.tag == W + 'tc':
+            rows[-1].append(' '.join(t.strip() for t in cells.pop() if t.strip()))
+        elif el.tag == W + 'tr':
+            row = ' | '.join(c for c in rows.pop() if c)
+            if cells: cells[-1].append(row)  # iç içe tablo: satır dış hücreye yazılır
+            elif row: yield row
+        else:
+            continue
+        # İşlenen düğüm ağaçtan koparılır; ağaç belge boyunca büyümez
+        if stack: stack[-1].remove(el)
+
+def _iter_docx_lines(path):
+    """Üst bilgiler, gövde (paragraf + tablolar), alt bilgiler ve dipnotlar"""
+    with zipfile.ZipFile(path) as z:
+        names = set(z.namelist())
+        def parts(prefix):
+            return sorted(n for n in names if n.startswith(f'word/{prefix}') and n.endswith('.xml'))
+        seen = set()
+        for name in parts('header'):
+            with z.open(name) as f:
+                for line in _iter_wordml(f):
+                    if line not in seen:  # bölümler aynı üst bilgiyi tekrar eder
+                        seen.add(line); yield line
+        with z.open('word/document.xml') as f:
+            yield from _iter_wordml(f)
+        seen = set()
+        for name in parts('footer') + parts('footnotes') + parts('endnotes'):
+            with z.open(name) as f:
+                for line in _iter_wordml(f):
+                    if line not in seen:
+                        seen.add(line); yield line
+
+def _iter_doc_lines(path):
+    """Eski .doc: antiword ya da LibreOffice (docx'e dönüştürüp) ile"""
+    if _is_zip(path):  # uzantısı .doc olan docx
+        yield from _iter_docx_lines(path); return
+    if shutil.which('antiword'):
+        proc = subprocess.Popen(['antiword', '-w', '0', path], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, encoding='utf-8', errors='ignore')
+        try:
+            for line in proc.stdout:
+                if line.strip(): yield line.rstrip('\n')
+        finally:
+            proc.stdout.close(); proc.wait()
+        if proc.returncode == 0:
+            return
+        raise RuntimeError(f"antiword hata kodu {proc.returncode}")
+    soffice = shutil.which('soffice') or shutil.which('libreoffice')
+    if not soffice:
+        raise RuntimeError(".doc dosyaları için antiword veya LibreOffice gerekli")
+    with tempfile.TemporaryDirectory() as out:
+        subprocess.run([soffice, '--headless', '--convert-to', 'docx', '--outdir', out, path],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=600)
+        converted = os.path.join(out, os.path.splitext(os.path.basename(path))[0] + '.docx')
+        yield from _iter_docx_lines(converted)
+
+def _iter_txt_lines(path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.strip(): yield line
+
+def sheet_names(path, ext):
+    if ext == 'xls' and not _is_zip(path):
+        return _xls_sheets(path)
+    return _xlsx_sheets(path)
+
+def _iter_sheet_rows(path, ext, sheet_index):
+    if ext == 'xls' and not _is_zip(path):
+        return _iter_xls_rows(path, sheet_index)
+    return _iter_xlsx_rows(path, sheet_index)
+
+def _iter_lines(path, ext):
+    if ext == 'docx': return _iter_docx_lines(path)
+    if ext == 'doc': return _iter_doc_lines(path)
+    return _iter_txt_lines(path)
+
+def paginate(lines, title=None, repeat_header=False):
+    """Satır akışını sayfa metinlerine böl (EXTRACT_ROWS_PER_PAGE satır / EXTRACT_PAGE_CHARS karakter).
+
+    Bellekte en fazla bir sayfalık satır bekler; toplam EXTRACT_MAX_CHARS aşılırsa
+    akış kesilir ve son sayfaya not düşülür. repeat_header ile ilk satır (tablo
+    başlığı) sonraki her sayfanın başına tekrar yazılır.
+    """
+    head = [f"[{title}]"] if title else []
+    header, buf, rows, size, total = None, list(head), 0, 0, 0
+    for line in lines:
+        line = line[:EXTRACT_PAGE_CHARS]
+        if total + len(line) > EXTRACT_MAX_CHARS:
+            buf.append(TRUNCATED_NOTE); rows += 1
+            break
+        if rows and (rows >= EXTRACT_ROWS_PER_PAGE or size + len(line) > EXTRACT_PAGE_CHARS):
+            yield "\n".join(buf)
+            buf, rows, size = head + ([header] if header is not None else []), 0, 0
+        if repeat_header and header is None:
+            header = line
+        buf.append(line)
+        rows += 1; size += len(line) + 1; total += len(line) + 1
+    if rows:
+        yield "\n".join(buf)
+
+def _extract_img(path):
+    with Image.open(path) as img:
+        return ocr.ocr_image(img)
+
+def extract_by_ext(path, ext):
+    """Tüm dosyanın metni tek parça (önizleme/yardımcı kullanım); işçiler birim bazlı çalışır"""
+    ext=(ext or "").lower()
+    if ext=='pdf':  return _extract_pdf(path)
+    if ext in IMAGE_EXT: return _extract_img(path)
+    if ext in ('xlsx','xls'):
+        return "\n".join(p for i, name in enumerate(sheet_names(path, ext))
+                         for p in paginate(_iter_sheet_rows(path, ext, i), name)).strip()
+    if ext in STREAM_EXT: return "\n".join(paginate(_iter_lines(path, ext))).strip()
+    return ""
+# ---------------------------------
+
+# ---- Page-level planning ----
+def _tile_bounds(img, tile_height=None):
+    """Uzun bir görseli satır aralarına denk gelen yerlerden yatay şeritlere böl"""
+    tile_height = tile_height or IMAGE_TILE_HEIGHT
+    w, h = img.size
+    if h <= tile_height:
+        return [(0, h)]
+    bounds, y0 = [], 0
+    window = max(1, tile_height // 10)
+    gray = img.convert('L')
+    while h - y0 > tile_height:
+        target = y0 + tile_height
+        lo, hi = max(y0 + 1, target - window), min(h - 1, target + window)
+        # Genişliği 1'e indirmek her satırın ortalama parlaklığını verir; en açık satır boşluktur.
+        # Eşit parlaklıkta hedefe en yakın satır seçilir.
+        rows = list(gray.crop((0, lo, w, hi)).resize((1, hi - lo)).getdata())
+        cut = lo + max(range(len(rows)), key=lambda i: (rows[i], -abs(lo + i - target)))
+        bounds.append((y0, cut)); y0 = cut
+    bounds.append((y0, h))
+    return bounds
+
+def plan_units(path, ext):
+    """Dosyayı bağımsız çıkarılabilecek birimlere ayır (PDF sayfası, görsel karesi/şeridi, Excel sayfası)"""
+    ext=(ext or "").lower()
+    units=[]
+    if ext=='pdf':
+        with pdfplumber.open(path) as pdf:
+            n = len(pdf.pages)
+        for i in range(n):
+            units.append(Unit(i, i+1, 'pdf', path, ext, (i,)))
+    elif ext in IMAGE_EXT:
+        with Image.open(path) as img:
+            for frame in range(getattr(img, 'n_frames', 1)):
+                img.seek(frame)
+                for y0, y1 in _tile_bounds(img):
+                    units.append(Unit(len(units), frame+1, 'img', path, ext, (frame, y0, y1)))
+    elif ext in ('xlsx','xls'):
+        for i, name in enumerate(sheet_names(path, ext)):
+            units.append(Unit(i, None, 'sheet', path, ext, (i, name)))
+    elif ext in STREAM_EXT:
+        units.append(Unit(0, None, 'stream', path, ext, ()))
+    else:
+        units.append(Unit(0, 1, 'file', path, ext, ()))
+    return units
+
+# İşçi süreç başına son açılan PDF; aynı belgenin ardışık sayfaları yeniden parse edilmez
+_open_pdf = {'key': None, 'pdf': None}
+
+def _pdf_page_text(path, index):
+    key = (path, os.path.getmtime(path))
+    if _open_pdf['key'] != key:
+        if _open_pdf['pdf'] is not None:
+            _open_pdf['pdf'].close()
+        _open_pdf.update(key=key, pdf=pdfplumber.open(path))
+    page = _open_pdf['pdf'].pages[index]
+    try:
+        return _page_text(page, path, index)
+    finally:
+        # Sayfanın ayrıştırılmış nesneleri (karakterler, kenarlar, layout) belge açık kaldıkça birikmesin
+        getattr(page, 'close', page.flush_cache)()
+
+def extract_unit(unit):
+    """Tek bir birimin metnini çıkar (süreç havuzunda çalışır). Akış birimleri SpooledPages döndürür"""
+    if unit.kind=='sheet':
+        index, name = unit.args
+        return _spool(paginate(_iter_sheet_rows(unit.path, unit.ext, index), name, repeat_header=True))
+    if unit.kind=='stream':
+        return _spool(paginate(_iter_lines(unit.path, unit.ext)))
+    if unit.kind=='pdf':
+        return _pdf_page_text(unit.path, unit.args[0])
+    if unit.kind=='img':
+        frame, y0, y1 = unit.args
+        with Image.open(unit.path) as img:
+            img.seek(frame)
+            if (y0, y1) != (0, img.size[1]):
+                img = img.crop((0, y0, img.size[0], y1))
+            return ocr.ocr_image(img)
+    return extract_by_ext(unit.path, unit.ext)
+
+def iter_pages(units, results):
+    """Birim sonuçlarını sayfa sırasıyla üret: (page_number, text, content_type).
+
+    Akış birimlerinin sayfaları biriktirildikleri dosyadan tek tek okunur; aynı sayfanın
+    şeritleri (ardışık seq) birleştirilir. Üreteç bitince ya da kapatılınca dosyalar silinir.
+    """
+    current, last = None, 0
+    try:
+        for u in sorted(units, key=lambda u: u.seq):
+            result = results.get(u.seq) or ""
+            if isinstance(result, (SpooledPages, list)):
+                # Akış birimi: her parça ayrı sayfa, numaralar kaldığı yerden devam eder
+                if current:
+                    yield current[0], "\n".join(current[1]), current[2]; current = None
+                for text in result:
+                    if text:
+                        last += 1
+                        yield last, text, 'text'
+                continue
+            if not result: continue
+            ctype = 'ocr' if u.kind=='img' or isinstance(result, ocr.OcrText) else 'text'
+            if current and current[0] == u.page_number:
+                current[1].append(result)
+                continue
+            if current:
+                yield current[0], "\n".join(current[1]), current[2]
+            current = (u.page_number, [result], ctype)
+            last = max(last, u.page_number)
+        if current:
+            yield current[0], "\n".join(current[1]), current[2]
+    finally:
+        discard_results(results)
+
+def assemble_pages(units, results):
+    """Birim sonuçlarını sayfa sırasına göre birleştir: [(page_number, text, content_type)]"""
+    return list(iter_pages(units, results))
+
+def extract_pages(path, ext, executor=None, max_inflight=4):
+    """Dosyayı sayfa sayfa çıkar; executor verilirse en fazla max_inflight birim aynı anda çalışır.
+
+    Bir birim hata verirse o ana kadar (ve hâlâ çalışan birimlerce) biriktirilen sayfa dosyaları silinir.
+    """
+    units = plan_units(path, ext)
+    results, inflight, queue = {}, {}, list(reversed(units))
+    try:
+        if executor is None:
+            for u in units:
+                results[u.seq] = extract_unit(u)
+            queue = []
+        while queue or inflight:
+            while queue and len(inflight) < max_inflight:
+                u = queue.pop()
+                inflight[executor.submit(extract_unit, u)] = u
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                results[inflight.pop(fut).seq] = fut.result()
+    except BaseException:
+        for fut, u in inflight.items():
+            if not fut.cancel() and fut.exception() is None:
+                results[u.seq] = fut.result()
+        discard_results(results)
+        raise
+    return assemble_pages(units, results)
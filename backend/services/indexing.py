@@ -0,0 +1,233 @@
+import logging, threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_
+
+from models.database import db, Document, DocumentContent, DocumentChunk
+from .changes import consume, DELETED
+from .embeddings import get_embedder
+from .vector_index import get_index
+
+logger = logging.getLogger(__name__)
+
+# ---- Chunking ----
+def chunk_text(text, size=200, overlap=40):
+    """Metni kelime bazlı, örtüşen parçalara böl"""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    chunks=[]
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + size]))
+        if start + size >= len(words):
+            break
+    return chunks
+
+# ---- Index maintenance ----
+def _embedder():
+    return get_embedder(current_app.config)
+
+def company_index(company_id):
+    return get_index(current_app.config, _embedder(), company_id)
+
+def claim_pending(limit):
+    """İşlenmiş ama indekslenmemiş belgeleri sahiplen (koşullu UPDATE; aynı belgeyi iki indeksleyici almaz).
+
+    Süresi INDEX_CLAIM_TIMEOUT'u aşan sahiplik (çöken indeksleyici) yeniden alınabilir.
+    Dönüş: {document_id: (company_id, claim zamanı)}
+    """
+    now = datetime.utcnow()
+    expired = now - timedelta(seconds=current_app.config.get('INDEX_CLAIM_TIMEOUT', 600))
+    free = or_(Document.index_claimed_at.is_(None), Document.index_claimed_at < expired)
+    rows = (db.session.query(Document.id, Document.company_id)
+            .filter(Document.is_processed == True, Document.is_indexed == False, free)
+            .order_by(Document.id).limit(limit).all())
+    claimed = {}
+    for doc_id, company_id in rows:
+        n = (Document.query.filter(Document.id == doc_id, Document.is_indexed == False, free)
+             .update({'index_claimed_at': now}, synchronize_session=False))
+        if n:
+            claimed[doc_id] = (company_id, now)
+    db.session.commit()
+    return claimed
+
+def index_pending(limit=20):
+    """İşlenmiş ama indekslenmemiş belgeleri parçala, toplu embed et ve indekse ekle.
+
+    Sıra: sahiplen -> sayfaları oku -> transaction dışında embed -> parçaları yaz (commit) ->
+    vektörleri indekse yaz -> belgeyi en son 'indekslendi' işaretle. Arada çökülürse belge
+    indekslenmemiş kalır; sahiplik süresi dolunca baştan (eski parçalar silinerek) yapılır.
+    Dönüş: indekslenen belge sayısı
+    """
+    claimed = claim_pending(limit)
+    if not claimed:
+        return 0
+    cfg = current_app.config
+    doc_ids = list(claimed)
+
+    pages = (db.session.query(DocumentContent.document_id, DocumentContent.page_number, DocumentContent.content)
+             .filter(DocumentContent.document_id.in_(doc_ids))
+             .order_by(DocumentContent.document_id, DocumentContent.page_number).all())
+    db.session.commit()  # embedding sürerken okuma transaction'ı / SQLite kilidi tutulmasın
+
+    chunks = []
+    counters = defaultdict(int)
+    for doc_id, page_number, content in pages:
+        for text in chunk_text(content, cfg['CHUNK_SIZE'], cfg['CHUNK_OVERLAP']):
+            chunks.append(DocumentChunk(document_id=doc_id, company_id=claimed[doc_id][0],
+                                        page_number=page_number, chunk_index=counters[doc_id], content=text))
+            counters[doc_id] += 1
+    embedder = _embedder()
+    batch = cfg.get('EMBEDDING_BATCH_SIZE', 64)
+    vectors = []
+    for i in range(0, len(chunks), batch):
+        vectors.extend(embedder.encode([c.content for c in chunks[i:i + batch]], batch_size=batch))
+
+    # Yeniden işlenen (ya da yarıda kalmış) belgelerin eski parçaları yenileriyle tek transaction'da değişir
+    stale = defaultdict(list)
+    for cid, company_id in (db.session.query(DocumentChunk.id, DocumentChunk.company_id)
+                            .filter(DocumentChunk.document_id.in_(doc_ids))):
+        stale[company_id].append(cid)
+    DocumentChunk.query.filter(DocumentChunk.document_id.in_(doc_ids)).delete(synchronize_session=False)
+    db.session.add_all(chunks)
+    db.session.flush()
+    by_company = defaultdict(lambda: ([], []))
+    for c, v in zip(chunks, vectors):
+        by_company[c.company_id][0].append(c.id)
+        by_company[c.company_id][1].append(v)
+    db.session.commit()
+
+    # Aramada DB'de bulunmayan vektör id'leri atlanır; yeni parçalar işaretlemeden önce indekste olur
+    for company_id, ids in stale.items():
+        company_index(company_id).remove(ids)
+    for company_id, (ids, vecs) in by_company.items():
+        company_index(company_id).add(ids, vecs)
+
+    done = 0
+    for doc_id, (_, claimed_at) in claimed.items():
+        # İndeksleme sırasında içerik değiştiyse (claim sıfırlandı) belge bekleyen kalır
+        done += (Document.query.filter(Document.id == doc_id, Document.index_claimed_at == claimed_at)
+                 .update({'is_indexed': True, 'index_claimed_at': None}, synchronize_session=False))
+    db.session.commit()
+    _invalidate_results(set(stale) | set(by_company))
+    return done
+
+def delete_document_chunks(doc):
+    """Belgenin parçalarını sil (commit çağırana ait). Dönüş: indeksten düşülecek chunk id'leri"""
+    return delete_chunks([doc.id]).get(doc.id, [])
+
+def delete_chunks(document_ids):
+    """Birden çok belgenin parçalarını tek DELETE ile sil (commit çağırana ait).
+
+    Dönüş: {document_id: [chunk id'leri]} (parçası olmayan belgeler yer almaz)
+    """
+    cond = DocumentChunk.document_id.in_(list(document_ids))
+    by_doc = defaultdict(list)
+    for cid, doc_id in db.session.query(DocumentChunk.id, DocumentChunk.document_id).filter(cond):
+        by_doc[doc_id].append(cid)
+    if by_doc:
+        DocumentChunk.query.filter(cond).delete(synchronize_session=False)
+    return dict(by_doc)
+
+def drop_vectors(company_id, chunk_ids):
+    """DB commit'inden sonra silinen parçaları vektör indeksinden çıkar"""
+    if chunk_ids:
+        try:
+            company_index(company_id).remove(chunk_ids)
+        except Exception:
+            logger.exception("Vector delete error")
+        _invalidate_results([company_id])
+
+def apply_changes(changes):
+    """Değişiklik günlüğü tüketicisi: yalnızca silmeleri uygular.
+
+    Silinen belgelerin parçaları vektör indeksinden düşülür. Silme isteği bunu commit'ten hemen
+    sonra da yapar; günlük, o adım süreç çökmesiyle kaçırıldıysa tekrarlar (tekrar zararsız).
+    created / content olayları burada işlenmez: eklemeler is_indexed bayrağıyla yürür
+    (index_pending bayrağı vektörler yazıldıktan sonra koyar, yarım kalan belge bekleyen kalır).
+    """
+    by_company = defaultdict(list)
+    for change in changes:
+        if change['op'] == DELETED and change['payload']:
+            by_company[change['company_id']].extend(change['payload'].get('chunk_ids', []))
+    for company_id, ids in by_company.items():
+        drop_vectors(company_id, ids)
+
+def _invalidate_results(company_ids):
+    """Vektör indeksi değişen şirketlerin önbellekteki retrieval sonuçlarını at"""
+    from .retrieval import invalidate  # retrieval bu modülü içe aktarır
+    for company_id in company_ids:
+        invalidate(company_id)
+
+# ---- Runner ----
+CHANGE_CONSUMER = 'vector-index'
+
+class Indexer:
+    """İndeksleme aşaması: inline (senkron), local (arka plan thread), external (ayrı worker)"""
+    def __init__(self, app, mode='local'):
+        self.app = app
+        self.mode = mode
+        self.poll_interval = app.config.get('EXTRACTION_POLL_INTERVAL', 2.0)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.mode != 'local':
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='indexer', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        if self.mode == 'inline':
+            # İndeksleme hatası çıkarmayı başarısız saymasın; belge bekleyen kalır, sonra yeniden denenir
+            try:
+                while index_pending():
+                    pass
+            except Exception:
+                logger.exception("Indexer error")
+                db.session.rollback()
+        elif self.mode == 'local':
+            self.start()
+            self._wake.set()
+
+    def stop(self):
+        self._stop.set(); self._wake.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+
+    def run_forever(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                self._wake.clear()
+                try:
+                    while index_pending() and not self._stop.is_set():
+                        pass
+                    # Kapalıyken kaçırılan vektör silmeleri: günlükte kalınan yerden devam
+                    while consume(CHANGE_CONSUMER, apply_changes) and not self._stop.is_set():
+                        pass
+                except Exception:
+                    logger.exception("Indexer error")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                self._wake.wait(self.poll_interval)
+
+def get_indexer(app=None):
+    app = app or current_app._get_current_object()
+    return app.extensions['indexer']
+
+def notify_indexer():
+    """İşlenmiş yeni içerik olduğunu indeksleyiciye bildir"""
+    get_indexer().notify()
+
+def init_app(app):
+    app.extensions['indexer'] = Indexer(app, mode=app.config.get('EXTRACTION_RUNNER', 'local'))
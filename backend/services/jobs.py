@@ -0,0 +1,466 @@
+import json, logging, threading, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db, Document, DocumentContent, ExtractionJob, ExtractionResult
+from .extraction import (EXTRACTOR_VERSION, EXTRACT_MAX_CHARS, TRUNCATED_NOTE, plan_units, extract_unit,
+                         extract_pages, iter_pages, discard_results)
+from .indexing import Indexer, notify_indexer
+from .stats import bump
+from .changes import record, CONTENT
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# ---- Extraction result cache ----
+def cached_pages(content_hash):
+    """Aynı içerik bu çıkarıcı sürümüyle daha önce işlendiyse sayfaları döndür, yoksa None"""
+    return cached_pages_many([content_hash]).get(content_hash)
+
+def cached_pages_many(hashes):
+    """Birden çok içerik için önbellek araması tek sorguda: {content_hash: pages}"""
+    hashes = [h for h in set(hashes) if h]
+    if not hashes:
+        return {}
+    rows = (db.session.query(ExtractionResult.content_hash, ExtractionResult.pages)
+            .filter(ExtractionResult.content_hash.in_(hashes),
+                    ExtractionResult.extractor_version == EXTRACTOR_VERSION))
+    return {h: [tuple(p) for p in json.loads(pages)] for h, pages in rows}
+
+def store_cached_pages(content_hash, pages):
+    if not content_hash:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(ExtractionResult(content_hash=content_hash, extractor_version=EXTRACTOR_VERSION,
+                                            pages=json.dumps([list(p) for p in pages], ensure_ascii=False)))
+    except IntegrityError:
+        pass  # başka bir işçi aynı içeriği önce kaydetti
+
+def _write_pages(doc, pages, fresh=False, cache_limit=0):
+    """Belgenin içeriğini sayfa başına DocumentContent satırlarıyla değiştir (fresh: yeni belge, silinecek satır yok)
+
+    pages: (page_number, text, content_type) listesi ya da üreteci; EXTRACTION_WRITE_BATCH sayfalık
+    toplu INSERT'lerle yazılır, belge bellekte tutulmaz. Belge toplamı EXTRACT_MAX_CHARS'ı aşarsa
+    kalan sayfalar okunmaz, son sayfaya not düşülür ve doc.content_truncated işaretlenir.
+    Dönüş: (yazılan sayfa, önbelleğe alınacak sayfalar) - toplamı cache_limit karakteri aşan ya da
+    kesilen içerik önbelleğe alınmaz (None)
+    """
+    if not fresh:
+        DocumentContent.query.filter_by(document_id=doc.id).delete(synchronize_session=False)
+    batch_size = current_app.config.get('EXTRACTION_WRITE_BATCH', 200)
+    batch, kept, count, total, truncated = [], [], 0, 0, False
+    for page_number, text, ctype in (pages or []):
+        if not text:
+            continue
+        if total + len(text) > EXTRACT_MAX_CHARS:
+            text = text[:max(0, EXTRACT_MAX_CHARS - total)] + "\n" + TRUNCATED_NOTE
+        truncated = text.endswith(TRUNCATED_NOTE)
+        total += len(text); count += 1
+        batch.append({'document_id': doc.id, 'content': text, 'content_type': ctype, 'page_number': page_number})
+        if kept is not None:
+            kept.append((page_number, text, ctype))
+            if total > cache_limit:
+                kept = None
+        if len(batch) >= batch_size:
+            db.session.execute(insert(DocumentContent), batch); batch = []
+        if truncated:
+            break
+    if batch:
+        db.session.execute(insert(DocumentContent), batch)
+    was_processed, doc.is_processed = bool(doc.is_processed), bool(count)
+    doc.content_truncated = truncated
+    doc.is_indexed = False
+    doc.index_claimed_at = None  # sürmekte olan indeksleme eski içeriği 'indekslendi' işaretleyemesin
+    if was_processed != doc.is_processed:
+        bump(doc.company_id, doc.file_type, processed=1 if doc.is_processed else -1)
+    record(doc.company_id, [doc.id], CONTENT)
+    return count, None if truncated else kept
+
+# ---- Job table helpers ----
+def enqueue_extractions(docs, fresh=False):
+    """Belgeler için çıkarma işlerini toplu oluştur (commit çağırana ait).
+
+    Önbellek tek sorguda aranır; aynı içerik önbellekteyse sonuç hemen yazılır ve
+    iş 'done' olarak oluşturulur.
+    """
+    cached = cached_pages_many(d.content_hash for d in docs)
+    jobs = []
+    for doc in docs:
+        job = ExtractionJob(document_id=doc.id, company_id=doc.company_id, status='pending')
+        pages = cached.get(doc.content_hash)
+        if pages is not None:
+            _write_pages(doc, pages, fresh=fresh)
+            job.status = 'done'
+            job.finished_at = datetime.utcnow()
+        jobs.append(job)
+    db.session.add_all(jobs)
+    return jobs
+
+def claim_jobs(limit):
+    """Bekleyen işleri 'running' durumuna çekerek sahiplen.
+
+    Koşullu UPDATE sayesinde aynı işi iki süreç birden alamaz. Aynı içerik
+    hash'ine sahip işlerden yalnızca biri çalışır; diğerleri o bitince
+    önbellekten tamamlanır.
+    Dönüş: [(job_id, file_path, file_type), ...]
+    """
+    if limit <= 0:
+        return []
+    running_hashes = (db.session.query(Document.content_hash)
+                      .join(ExtractionJob, ExtractionJob.document_id == Document.id)
+                      .filter(ExtractionJob.status == 'running', Document.content_hash.isnot(None)))
+    rows = (db.session.query(ExtractionJob.id, Document.file_path, Document.file_type, Document.content_hash)
+            .join(Document, Document.id == ExtractionJob.document_id)
+            .filter(ExtractionJob.status == 'pending')
+            .filter(or_(Document.content_hash.is_(None), ~Document.content_hash.in_(running_hashes)))
+            .order_by(ExtractionJob.id)
+            .limit(limit).all())
+    claimed, seen, hits = [], set(), []
+    for job_id, path, ext, sha in rows:
+        if sha and sha in seen:
+            continue
+        n = (ExtractionJob.query
+             .filter_by(id=job_id, status='pending')
+             .update({'status':'running', 'started_at':datetime.utcnow(),
+                      'attempts':ExtractionJob.attempts + 1}, synchronize_session=False))
+        if not n:
+            continue
+        if sha: seen.add(sha)
+        pages = cached_pages(sha)
+        if pages is not None:
+            hits.append((job_id, pages))
+        else:
+            claimed.append((job_id, path, ext))
+    db.session.commit()
+    for job_id, pages in hits:
+        complete_job(job_id, pages=pages)
+    return claimed
+
+def complete_job(job_id, pages=None, error=None):
+    """İş sonucunu kaydet: sayfa başına içerik yaz, belgeyi işlendi olarak işaretle ya da yeniden dene
+
+    pages: [(page_number, text, content_type), ...] ya da aynı biçimde üreteç (iter_pages)
+    """
+    job = db.session.get(ExtractionJob, job_id)
+    if not job:
+        return None
+    doc = db.session.get(Document, job.document_id)
+    if not doc:
+        # Belge iş sürerken silinmiş
+        db.session.delete(job); db.session.commit()
+        return None
+
+    start = time.perf_counter()
+    if error is not None:
+        max_attempts = current_app.config.get('EXTRACTION_MAX_ATTEMPTS', 3)
+        job.error = str(error)[:2000]
+        job.status = 'pending' if (job.attempts or 0) < max_attempts else 'failed'
+        if job.status == 'failed':
+            job.finished_at = datetime.utcnow()
+        logger.warning(f"Extract fail doc {doc.id} (deneme {job.attempts}): {error}")
+    else:
+        written, kept = _write_pages(doc, pages,
+                                     cache_limit=current_app.config.get('EXTRACTION_CACHE_MAX_CHARS', 5 * 1024**2))
+        if kept is not None:
+            store_cached_pages(doc.content_hash, kept)
+        job.status = 'done'
+        job.error = None
+        job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+    metrics.EXTRACTION_JOBS.labels('retry' if job.status == 'pending' else job.status).inc()
+    if job.status == 'done':
+        metrics.observe_extraction('write', doc.file_type, time.perf_counter() - start)
+        metrics.EXTRACTION_BYTES.labels(doc.file_type or '').observe(doc.file_size or 0)
+        metrics.EXTRACTION_PAGES.labels(doc.file_type or '').observe(written)
+        notify_indexer()
+    return job
+
+def recover_stale_jobs(timeout_seconds, exclude=()):
+    """Zaman aşımına uğramış 'running' işleri (çöken işçi) tekrar kuyruğa al.
+
+    exclude: çağıran sürecin hâlâ yürüttüğü işler (uzun süren iş kendi elinden alınmasın)
+    """
+    limit = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    q = ExtractionJob.query.filter(ExtractionJob.status == 'running', ExtractionJob.started_at < limit)
+    if exclude:
+        q = q.filter(~ExtractionJob.id.in_(list(exclude)))
+    n = q.update({'status':'pending'}, synchronize_session=False)
+    db.session.commit()
+    if n: logger.info(f"{n} yarım kalmış çıkarma işi yeniden kuyruğa alındı")
+    return n
+
+# ---- Runners ----
+class InlineRunner:
+    """İşleri istek içinde senkron çalıştırır (dev/test)"""
+    def __init__(self, app):
+        self.app = app
+
+    def start(self):
+        pass
+
+    def notify(self):
+        # Aynı hash'li işler sırayla önbellekten tamamlanır; bekleyen sayısı azalmayana kadar dön
+        last = None
+        while True:
+            pending = ExtractionJob.query.filter_by(status='pending').count()
+            if not pending or pending == last:
+                break
+            last = pending
+            for job_id, path, ext in claim_jobs(10):
+                try:
+                    with metrics.timed('extract', ext):
+                        pages = extract_pages(path, ext)
+                    complete_job(job_id, pages=pages)
+                except Exception as e:
+                    db.session.rollback()
+                    complete_job(job_id, error=e)
+
+    def stop(self):
+        pass
+
+class _JobState:
+    """LocalRunner içinde yürüyen bir işin sayfa birimleri ve sonuçları"""
+    def __init__(self, job_id, ext=None):
+        self.job_id = job_id
+        self.ext = ext
+        self.units = None       # plan_units sonucu; plan bitene kadar None
+        self.pending = deque()  # henüz havuza verilmemiş birimler
+        self.results = {}       # seq -> metin
+        self.inflight = 0
+        self.error = None
+
+    @property
+    def finished(self):
+        if self.inflight:
+            return False
+        return self.error is not None or (self.units is not None and not self.pending)
+
+class LocalRunner:
+    """DB kuyruğunu izleyen thread + yerel ProcessPoolExecutor.
+
+    Her iş önce sayfa birimlerine planlanır, birimler havuza işler arasında
+    sırayla (round-robin) dağıtılır. Bir belgenin aynı anda havuzda olabilecek
+    birim sayısı EXTRACTION_MAX_INFLIGHT_PER_DOC ile sınırlıdır; böylece tek bir
+    büyük yükleme diğer şirketlerin işlerini aç bırakmaz.
+    Çıkarma işçi süreçlerde yapılır, DB yazımları yalnızca bu thread'den yapılır.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.workers = app.config.get('EXTRACTION_WORKERS') or 2
+        self.poll_interval = app.config.get('EXTRACTION_POLL_INTERVAL', 2.0)
+        self.job_timeout = app.config.get('EXTRACTION_JOB_TIMEOUT', 1800)
+        self.max_active = app.config.get('EXTRACTION_MAX_ACTIVE_JOBS') or self.workers
+        self.per_doc = app.config.get('EXTRACTION_MAX_INFLIGHT_PER_DOC', 4)
+        self.recover_interval = app.config.get('EXTRACTION_RECOVER_INTERVAL', 60)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._active = deque()  # _JobState
+        self._inflight = {}     # future -> (state, unit); plan future'larında unit None
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            self._thread = threading.Thread(target=self.run_forever, name='extraction-runner', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        self.start()
+        self._wake.set()
+
+    def stop(self, wait=True):
+        self._stop.set(); self._wake.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+        if self._pool:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def run_forever(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        next_recover = 0
+        with self.app.app_context():
+            while not self._stop.is_set():
+                self._wake.clear()
+                try:
+                    # Başka süreçlerin (ya da bu sürecin önceki ömrünün) yarım bıraktığı işler
+                    if time.monotonic() >= next_recover:
+                        next_recover = time.monotonic() + self.recover_interval
+                        recover_stale_jobs(self.job_timeout, exclude=[s.job_id for s in self._active])
+                    self._reap()
+                    self._claim()
+                    self._dispatch()
+                except Exception:
+                    logger.exception("Extraction runner error")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                self._wake.wait(self.poll_interval)
+
+    def _rebuild_pool(self):
+        """Bir işçi süreci öldüğünde (ör. OOM) havuz kalıcı olarak bozulur; yenisini aç"""
+        logger.warning("Extraction process pool broken; rebuilding")
+        old, self._pool = self._pool, ProcessPoolExecutor(max_workers=self.workers)
+        old.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, state, fn, arg, unit=None):
+        try:
+            fut = self._pool.submit(fn, arg)
+        except BrokenProcessPool:
+            self._rebuild_pool()
+            fut = self._pool.submit(fn, arg)
+        state.inflight += 1
+        self._inflight[fut] = (state, unit)
+        fut.add_done_callback(lambda _f: self._wake.set())
+
+    def _claim(self):
+        for job_id, path, ext in claim_jobs(self.max_active - len(self._active)):
+            state = _JobState(job_id, ext)
+            try:
+                self._submit(state, _plan, (path, ext))
+            except Exception as e:
+                # İş 'running' olarak sahiplenildi; takılı kalmasın, hata olarak yeniden denensin
+                complete_job(job_id, error=e)
+                continue
+            self._active.append(state)
+
+    def _dispatch(self):
+        # Havuzu dolu tut ama kuyruğu şişirme: işçi başına en fazla 2 birim
+        capacity = self.workers * 2 - len(self._inflight)
+        progressed = True
+        while capacity > 0 and progressed:
+            progressed = False
+            for state in list(self._active):
+                if capacity <= 0:
+                    break
+                if state.error is None and state.pending and state.inflight < self.per_doc:
+                    unit = state.pending.popleft()
+                    try:
+                        self._submit(state, _extract, unit, unit)
+                    except Exception as e:
+                        state.error = e  # birim kayboldu; iş _reap'te hata olarak yeniden denenir
+                        state.pending.clear()
+                        continue
+                    capacity -= 1; progressed = True
+
+    def _reap(self):
+        broken = False
+        for fut in [f for f in self._inflight if f.done()]:
+            state, unit = self._inflight.pop(fut)
+            state.inflight -= 1
+            try:
+                result = fut.result()
+            except Exception as e:
+                # Havuz bozulduysa o anda havuzdaki tüm işler bu hatayı alır; her biri
+                # complete_job ile yeniden denenir (çökmeye yol açan belge EXTRACTION_MAX_ATTEMPTS'ta düşer)
+                broken = broken or isinstance(e, BrokenProcessPool)
+                state.error = e
+                state.pending.clear()
+                continue
+            result, seconds = result
+            if unit is None:
+                state.units = result
+                state.pending.extend(result)
+                metrics.observe_extraction('plan', state.ext, seconds)
+            else:
+                state.results[unit.seq] = result
+                metrics.observe_extraction(_STAGES.get(unit.kind, unit.kind), state.ext, seconds)
+
+        for state in [s for s in self._active if s.finished]:
+            self._active.remove(state)
+            try:
+                if state.error is not None:
+                    discard_results(state.results)
+                    complete_job(state.job_id, error=state.error)
+                else:
+                    # Sayfalar üreteçle okunup partiler halinde yazılır; akış birimlerinin dosyaları sonra silinir
+                    pages = iter_pages(state.units, state.results)
+                    try:
+                        complete_job(state.job_id, pages=pages)
+                    finally:
+                        pages.close()
+            except Exception as e:
+                db.session.rollback()
+                complete_job(state.job_id, error=e)
+        if broken:
+            self._rebuild_pool()
+
+# Süreç havuzunda çalışan sarmalayıcılar: süre işçide ölçülür (kuyrukta bekleme hariç)
+_STAGES = {'img': 'ocr'}
+
+def _plan(args):
+    start = time.perf_counter()
+    return plan_units(*args), time.perf_counter() - start
+
+def _extract(unit):
+    start = time.perf_counter()
+    return extract_unit(unit), time.perf_counter() - start
+
+class ExternalRunner:
+    """Yalnızca kuyruğa yazar; işleri ayrı `flask extraction-worker` süreci işler"""
+    def __init__(self, app):
+        self.app = app
+
+    def start(self):
+        pass
+
+    def notify(self):
+        pass
+
+    def stop(self):
+        pass
+
+RUNNERS = {
+    'inline': InlineRunner,
+    'local': LocalRunner,
+    'external': ExternalRunner,
+}
+
+def get_runner(app=None):
+    app = app or current_app._get_current_object()
+    return app.extensions['extraction_runner']
+
+def notify_runner():
+    """Yeni iş eklendiğini çalıştırıcıya bildir"""
+    get_runner().notify()
+
+def init_app(app):
+    """Çalıştırıcıyı config'e göre oluştur ve worker CLI komutunu kaydet"""
+    name = app.config.get('EXTRACTION_RUNNER', 'local')
+    if name not in RUNNERS:
+        raise ValueError(f"Bilinmeyen EXTRACTION_RUNNER: {name}")
+    app.extensions['extraction_runner'] = RUNNERS[name](app)
+
+    @app.cli.command('extraction-worker')
+    @click.option('--workers', type=int, default=None, help='İşçi süreç sayısı')
+    @click.option('--metrics-port', type=int, default=None, help='Prometheus /metrics için port')
+    def extraction_worker(workers, metrics_port):
+        """Çıkarma kuyruğunu ön planda işle (EXTRACTION_RUNNER=external ile)"""
+        if workers:
+            app.config['EXTRACTION_WORKERS'] = workers
+        if metrics_port:
+            metrics.start_http_server(metrics_port)
+        runner = LocalRunner(app)
+        indexer = Indexer(app, mode='local')
+        app.extensions['indexer'] = indexer
+        indexer.start()
+        click.echo(f"Extraction worker başladı ({runner.workers} süreç)")
+        try:
+            runner.run_forever()
+        except KeyboardInterrupt:
+            runner.stop(wait=False)
+            indexer.stop()
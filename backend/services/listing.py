@@ -0,0 +1,89 @@
+import base64, json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from models.database import Document
+from .replica import read_session
+
+# Listeleme API'sinde seçilebilen alanlar (Document.to_dict ile aynı adlar)
+DOCUMENT_FIELDS = ('id', 'filename', 'original_filename', 'file_type', 'file_size', 'content_hash',
+                   'company_id', 'uploaded_by', 'created_at', 'updated_at', 'is_processed',
+                   'content_truncated')
+
+class ListingError(ValueError):
+    """Geçersiz cursor/filtre/alan parametresi"""
+
+# ---- Cursor ----
+def encode_cursor(created_at, doc_id):
+    raw = json.dumps([created_at.isoformat(), doc_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, doc_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(doc_id)
+    except Exception:
+        raise ListingError('Geçersiz cursor')
+
+# ---- Query ----
+def _parse_bool(v):
+    if v.lower() in ('1', 'true', 'yes'): return True
+    if v.lower() in ('0', 'false', 'no'): return False
+    raise ListingError(f'Geçersiz boolean: {v}')
+
+def _parse_date(v):
+    try:
+        return datetime.fromisoformat(v)
+    except ValueError:
+        raise ListingError(f'Geçersiz tarih: {v}')
+
+def parse_fields(fields):
+    """?fields=id,original_filename -> sütun adları (cursor için id ve created_at her zaman okunur)"""
+    if not fields:
+        return list(DOCUMENT_FIELDS)
+    names = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in names if f not in DOCUMENT_FIELDS]
+    if unknown:
+        raise ListingError(f"Bilinmeyen alan: {', '.join(unknown)}")
+    return names
+
+FILTERS = ('file_type', 'is_processed', 'uploaded_by', 'created_from', 'created_to')
+
+def apply_filters(q, args):
+    """Liste/toplu işlem filtreleri: file_type (virgüllü), is_processed, uploaded_by, created_from, created_to"""
+    if args.get('file_type'):
+        q = q.filter(Document.file_type.in_([t.strip().lower() for t in args['file_type'].split(',')]))
+    if args.get('is_processed'):
+        q = q.filter(Document.is_processed == _parse_bool(args['is_processed']))
+    if args.get('uploaded_by'):
+        try:
+            q = q.filter(Document.uploaded_by == int(args['uploaded_by']))
+        except ValueError:
+            raise ListingError('Geçersiz uploaded_by')
+    if args.get('created_from'):
+        q = q.filter(Document.created_at >= _parse_date(args['created_from']))
+    if args.get('created_to'):
+        q = q.filter(Document.created_at < _parse_date(args['created_to']))
+    return q
+
+def page_query(company_id, args, fields, limit):
+    """(company_id, created_at DESC, id DESC) indeksine oturan keyset sayfası sorgusu.
+
+    limit+1 satır okunur; fazladan satır bir sonraki sayfanın varlığını gösterir.
+    """
+    cols = [getattr(Document, f) for f in dict.fromkeys(fields + ['created_at', 'id'])]
+    q = apply_filters(read_session().query(*cols).filter(Document.company_id == company_id), args)
+    if args.get('cursor'):
+        c_at, c_id = decode_cursor(args['cursor'])
+        q = q.filter(tuple_(Document.created_at, Document.id) < tuple_(c_at, c_id))
+
+    return q.order_by(Document.created_at.desc(), Document.id.desc()).limit(limit + 1)
+
+def serialize_row(row, fields):
+    out = {}
+    for f in fields:
+        v = getattr(row, f)
+        out[f] = v.isoformat() if isinstance(v, datetime) else v
+    return out
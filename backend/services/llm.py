@@ -0,0 +1,116 @@
+import re, threading, time
+
+SYSTEM_PROMPT = (
+    "Sen şirket belgelerine dayanarak cevap veren bir asistansın. "
+    "Yalnızca verilen belge parçalarını kullan; cevap parçalarda yoksa bunu açıkça söyle. "
+    "Kullandığın bilgiler için kaynak belgeyi ve sayfayı belirt."
+)
+
+SUMMARY_PROMPT = (
+    "Aşağıdaki sohbeti kısa bir özet halinde yaz. Önceki özet verilmişse yeni konuşmalarla birleştir. "
+    "Kullanıcının sorduğu konuları, verilen önemli cevapları, isimleri, sayıları ve belge adlarını koru. "
+    "En fazla {words} kelime."
+)
+
+def count_tokens(text):
+    """Yaklaşık token sayısı (Türkçe/İngilizce metinde ~4 karakter/token); bütçe hesabı için yeterli"""
+    return len(text or '') // 4 + 1
+
+def summary_messages(previous, turns, max_tokens):
+    """Kayan özet isteği: önceki özet + [(soru, cevap)] -> mesaj listesi"""
+    convo = "\n".join(f"Kullanıcı: {q}\nAsistan: {a}" for q, a in turns)
+    if previous:
+        convo = f"Önceki özet:\n{previous}\n\nYeni konuşmalar:\n{convo}"
+    return [{'role': 'system', 'content': SUMMARY_PROMPT.format(words=max(20, max_tokens * 3 // 4))},
+            {'role': 'user', 'content': convo}]
+
+def build_messages(question, sources, history=None):
+    """LLM'e gidecek mesaj listesi: sistem + bağlam + (varsa) geçmiş + soru"""
+    context = "\n\n".join(
+        f"[{i}] {s['original_filename']} (s.{s['page_number']}):\n{s['content']}"
+        for i, s in enumerate(sources, 1)
+    ) or "(İlgili belge parçası bulunamadı)"
+    messages = [{'role': 'system', 'content': f"{SYSTEM_PROMPT}\n\nBelge parçaları:\n{context}"}]
+    messages.extend(history or [])
+    messages.append({'role': 'user', 'content': question})
+    return messages
+
+class StubLLM:
+    """Ağ gerektirmeyen deterministik yanıtlayıcı (dev/test).
+
+    Bağlamdaki parçalardan özet bir cevap kurar ve kelime kelime akıtır.
+    delay: token başına bekleme (saniye); yük testinde gerçek LLM'in yavaş akışını taklit eder.
+    """
+    name = 'stub'
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def stream(self, messages):
+        question = messages[-1]['content']
+        context = messages[0]['content'].split("Belge parçaları:\n", 1)[-1]
+        refs = re.findall(r'^\[(\d+)\] (.+?) \(s\.(\d+)\):\n(.+)$', context, flags=re.M)
+        if not refs:
+            answer = f'"{question}" sorusuyla ilgili belgelerinizde bilgi bulamadım.'
+        else:
+            lines = [f'"{question}" için belgelerinizde şunlar bulundu:']
+            for n, fname, page, first_line in refs[:3]:
+                lines.append(f"[{n}] {fname}, sayfa {page}: {first_line[:200]}")
+            answer = "\n".join(lines)
+        for tok in re.findall(r'\S+\s*|\n', answer):
+            if self.delay:
+                time.sleep(self.delay)
+            yield tok
+
+    def summarize(self, previous, turns, max_tokens):
+        """Çıkarımsal özet: soru başına bir satır; bütçeyi aşınca en eski satırlar düşer"""
+        lines = (previous or '').splitlines()
+        for q, a in turns:
+            answer = re.split(r'(?<=[.!?:])\s', (a or '').strip(), maxsplit=1)[0]
+            lines.append(f"- {q.strip()[:150]} -> {answer[:150]}")
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
+
+class OpenAILLM:
+    """openai (0.28) ChatCompletion, stream=True"""
+    name = 'openai'
+
+    def __init__(self, api_key, model, temperature=0.2, timeout=60):
+        import openai
+        self.openai = openai
+        self.api_key = api_key
+        self.model = model
+        self.temperature = temperature
+        self.timeout = timeout
+
+    def stream(self, messages):
+        resp = self.openai.ChatCompletion.create(
+            model=self.model, messages=messages, temperature=self.temperature,
+            stream=True, api_key=self.api_key, request_timeout=self.timeout)
+        for chunk in resp:
+            delta = chunk['choices'][0].get('delta', {}).get('content')
+            if delta:
+                yield delta
+
+    def summarize(self, previous, turns, max_tokens):
+        resp = self.openai.ChatCompletion.create(
+            model=self.model, messages=summary_messages(previous, turns, max_tokens), temperature=0,
+            max_tokens=max_tokens, api_key=self.api_key, request_timeout=self.timeout)
+        return resp['choices'][0]['message']['content'].strip()
+
+_llms = {}
+_lock = threading.Lock()
+
+def get_llm(config):
+    """Config'e göre LLM backend'i (süreç başına tek örnek)"""
+    backend = config.get('LLM_BACKEND') or ('openai' if config.get('OPENAI_API_KEY') else 'stub')
+    with _lock:
+        if backend not in _llms:
+            if backend == 'openai':
+                _llms[backend] = OpenAILLM(config['OPENAI_API_KEY'], config.get('LLM_MODEL', 'gpt-3.5-turbo'))
+            elif backend == 'stub':
+                _llms[backend] = StubLLM(float(config.get('LLM_STUB_DELAY') or 0))
+            else:
+                raise ValueError(f"Bilinmeyen LLM_BACKEND: {backend}")
+        return _llms[backend]
@@ -0,0 +1,239 @@
+import os, sys, threading, time
+from collections import Counter as StackCounter
+from datetime import datetime
+
+from flask import Response, current_app, g, request
+import prometheus_client
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from models.database import db
+
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250, 1000)
+SIZE_BUCKETS = tuple(2 ** p for p in range(10, 34, 2))  # 1 KiB .. 8 GiB
+
+# ---- HTTP ----
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'İstek süresi',
+                            ['method', 'route', 'status'], buckets=LATENCY_BUCKETS, registry=REGISTRY)
+REQUEST_STAGE_SECONDS = Histogram('http_request_stage_seconds',
+                                  'İstek içindeki aşamaların toplam süresi (db, commit, read, write, hash)',
+                                  ['route', 'stage'], buckets=LATENCY_BUCKETS, registry=REGISTRY)
+REQUEST_SQL_QUERIES = Histogram('http_request_sql_queries', 'İstek başına SQL sorgu sayısı',
+                                ['route'], buckets=COUNT_BUCKETS, registry=REGISTRY)
+REQUEST_BYTES = Histogram('http_request_size_bytes', 'İstek gövdesi boyutu',
+                          ['route'], buckets=SIZE_BUCKETS, registry=REGISTRY)
+
+# ---- Extraction ----
+EXTRACTION_STAGE_SECONDS = Histogram('extraction_stage_seconds',
+                                     'Çıkarma aşaması süresi (plan, pdf, ocr, sheet, stream, extract, write)',
+                                     ['stage', 'file_type'], buckets=LATENCY_BUCKETS, registry=REGISTRY)
+EXTRACTION_BYTES = Histogram('extraction_document_bytes', 'İşlenen belge boyutu',
+                             ['file_type'], buckets=SIZE_BUCKETS, registry=REGISTRY)
+EXTRACTION_PAGES = Histogram('extraction_document_pages', 'Belge başına çıkarılan sayfa',
+                             ['file_type'], buckets=COUNT_BUCKETS, registry=REGISTRY)
+EXTRACTION_JOBS = Counter('extraction_jobs_total', 'Sonuçlanan çıkarma denemeleri',
+                          ['status'], registry=REGISTRY)
+
+DB_QUERY_SECONDS = Histogram('db_query_duration_seconds', 'SQL sorgu süresi (tüm süreç)',
+                             buckets=LATENCY_BUCKETS, registry=REGISTRY)
+
+# ---- Per-request accumulators ----
+# threading.local: gevent altında monkey-patch ile greenlet başına olur
+_local = threading.local()
+
+def add_stage(stage, seconds):
+    """Etkin isteğin aşama süresine ekle (istek dışında no-op)"""
+    stages = getattr(_local, 'stages', None)
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+def observe_extraction(stage, file_type, seconds):
+    EXTRACTION_STAGE_SECONDS.labels(stage, file_type or '').observe(seconds)
+
+class timed:
+    """with timed('write', 'pdf'): ... -> extraction_stage_seconds"""
+    def __init__(self, stage, file_type=None):
+        self.stage, self.file_type = stage, file_type
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_extraction(self.stage, self.file_type, time.perf_counter() - self.start)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    dt = time.perf_counter() - starts.pop()
+    DB_QUERY_SECONDS.observe(dt)
+    if getattr(_local, 'stages', None) is not None:
+        _local.queries += 1
+        add_stage('db', dt)
+
+def _before_commit(session):
+    session.info['commit_start'] = time.perf_counter()
+
+def _after_commit(session):
+    start = session.info.pop('commit_start', None)
+    if start is not None:
+        add_stage('commit', time.perf_counter() - start)
+
+def _route():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+# ---- Slow request sampling profiler ----
+def _gevent_patched():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+class SlowRequestProfiler:
+    """İstek thread'lerinin (gevent altında greenlet'lerinin) yığınlarını aralıklarla örnekler.
+
+    Eşikten uzun süren isteklerin örnekleri flamegraph.pl / speedscope'un okuduğu
+    katlanmış (collapsed) biçimde PROFILE_DIR'e yazılır: "kök;...;yaprak sayı".
+    gevent'te örnekleyici monkey-patch'siz gerçek bir OS thread'idir (greenlet olsaydı yalnızca
+    istekler beklerken çalışırdı); bekleyen greenlet'in yığını gr_frame'den, o an çalışanınki
+    thread'in yığınından okunur.
+    """
+    def __init__(self, threshold_ms, interval_ms, out_dir):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.out_dir = out_dir
+        self._active = {}  # thread ident ya da greenlet -> (thread ident, Counter)
+        self._gevent = _gevent_patched()
+        if self._gevent:
+            import greenlet
+            from gevent import monkey
+            self._current = greenlet.getcurrent
+            self._get_ident = monkey.get_original('_thread', 'get_ident')
+            self._start_thread = monkey.get_original('_thread', 'start_new_thread')
+            self._sleep = monkey.get_original('time', 'sleep')
+            self._lock = monkey.get_original('_thread', 'allocate_lock')()
+        else:
+            self._current = self._get_ident = threading.get_ident
+            self._start_thread = None
+            self._sleep = time.sleep
+            self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._start_thread is not None:
+            if self._thread is None:
+                self._thread = self._start_thread(self._run, ())
+        elif self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+            self._thread.start()
+
+    def begin(self):
+        with self._lock:
+            self._active[self._current()] = (self._get_ident(), StackCounter())
+            self._ensure_thread()
+
+    def end(self, route, duration):
+        with self._lock:
+            _, samples = self._active.pop(self._current(), (None, None))
+        if not samples or duration < self.threshold:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        name = "%s_%s_%dms.folded" % (datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'),
+                                      route.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root',
+                                      duration * 1000)
+        path = os.path.join(self.out_dir, name)
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def _run(self):
+        while True:
+            self._sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for key, (ident, samples) in self._active.items():
+                    frame = key.gr_frame if self._gevent else None
+                    if frame is None:
+                        frame = frames.get(ident)
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    if stack:
+                        samples[";".join(reversed(stack))] += 1
+
+# ---- Wiring ----
+def _before_request():
+    _local.stages, _local.queries = {}, 0
+    g.metrics_start = time.perf_counter()
+    profiler = current_app.extensions.get('slow_request_profiler')
+    if profiler:
+        profiler.begin()
+
+def _after_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+def _teardown_request(exc):
+    start = g.pop('metrics_start', None)
+    stages, queries = getattr(_local, 'stages', None), getattr(_local, 'queries', 0)
+    _local.stages = None
+    if start is None:
+        return
+    duration = time.perf_counter() - start
+    route = _route()
+    status = g.pop('metrics_status', 500 if exc else 200)
+    REQUEST_SECONDS.labels(request.method, route, str(status)).observe(duration)
+    REQUEST_SQL_QUERIES.labels(route).observe(queries)
+    for stage, seconds in (stages or {}).items():
+        REQUEST_STAGE_SECONDS.labels(route, stage).observe(seconds)
+    if request.content_length:
+        REQUEST_BYTES.labels(route).observe(request.content_length)
+    profiler = current_app.extensions.get('slow_request_profiler')
+    if profiler:
+        path = profiler.end(route, duration)
+        if path:
+            current_app.logger.warning(f"Slow request {request.method} {route} {duration * 1000:.0f}ms -> {path}")
+
+def start_http_server(port):
+    """Web uygulaması olmayan süreçler (extraction-worker) için ayrı /metrics sunucusu"""
+    prometheus_client.start_http_server(port, registry=REGISTRY)
+
+def metrics_view():
+    """Bu sürecin metrikleri; PROMETHEUS_MULTIPROC_DIR ayarlıysa (gunicorn) tüm worker'larınki birleşik"""
+    registry = REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+def init_app(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.session, 'before_commit', _before_commit)
+        event.listen(db.session, 'after_commit', _after_commit)
+    if app.config.get('PROFILE_SLOW_REQUEST_MS'):
+        app.extensions['slow_request_profiler'] = SlowRequestProfiler(
+            app.config['PROFILE_SLOW_REQUEST_MS'], app.config.get('PROFILE_SAMPLE_INTERVAL_MS', 5),
+            app.config.get('PROFILE_DIR') or os.path.join(app.root_path, 'profiles'))
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,252 @@
+import io, os, shutil, subprocess, threading
+from statistics import mean, median, pstdev
+
+import pytesseract
+from PIL import Image, ImageOps
+
+# Bu modül arka plan işçi süreçlerinde çalışır; Flask/DB'ye dokunmamalı.
+
+WINDOWS_TESSERACT = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+OCR_LANG = os.environ.get('OCR_LANG', 'tur+eng')
+OCR_ENGINE = os.environ.get('OCR_ENGINE', 'auto')            # auto | tesserocr | cli
+OCR_PSM = int(os.environ.get('OCR_PSM', 0)) or None           # verilirse düzen analizi yerine sabit PSM
+OCR_TARGET_DPI = int(os.environ.get('OCR_TARGET_DPI', 300))
+OCR_MAX_WIDTH = int(os.environ.get('OCR_MAX_WIDTH', 3600))    # A4 ~440 dpi
+OCR_BINARIZE = os.environ.get('OCR_BINARIZE', '1') not in ('0', 'false', 'no')
+# Paralellik işçi süreç havuzundan gelir; Tesseract'ın OpenMP thread'leri çekirdekleri aşırı paylaştırır
+OCR_THREADS = os.environ.get('OCR_THREADS', '1')
+
+# Metin katmanı bu kadar karakterden kısa ve sayfanın bu oranını kaplayan görsel içeren PDF sayfaları taranmış sayılır
+OCR_PDF_DPI = int(os.environ.get('OCR_PDF_DPI', 300))
+OCR_PDF_MIN_CHARS = int(os.environ.get('OCR_PDF_MIN_CHARS', 16))
+OCR_PDF_MIN_IMAGE_AREA = float(os.environ.get('OCR_PDF_MIN_IMAGE_AREA', 0.3))
+
+def _tesseract_cmd():
+    if os.environ.get('TESSERACT_PATH'):
+        return os.environ['TESSERACT_PATH']
+    if shutil.which('tesseract'):
+        return 'tesseract'
+    return WINDOWS_TESSERACT if os.path.exists(WINDOWS_TESSERACT) else 'tesseract'
+
+pytesseract.pytesseract.tesseract_cmd = _tesseract_cmd()
+
+class OcrText(str):
+    """OCR ile üretilmiş metin (PDF sayfasının content_type'ı 'ocr' olur)"""
+
+# ---- Preprocessing ----
+def _otsu(hist):
+    """Gri ton histogramından Otsu eşiği"""
+    total = sum(hist)
+    sum_all = sum(i * n for i, n in enumerate(hist))
+    w0 = s0 = 0
+    best_var, best_t = -1, 127
+    for t, n in enumerate(hist):
+        w0 += n; s0 += t * n
+        w1 = total - w0
+        if not w0: continue
+        if not w1: break
+        var = w0 * w1 * (s0 / w0 - (sum_all - s0) / w1) ** 2
+        if var > best_var:
+            best_var, best_t = var, t
+    return best_t
+
+def prepare(img):
+    """Gri tona çevir, gereğinden büyükse küçült, Otsu eşiğiyle ikili hale getir.
+
+    Küçültme hedefi OCR_TARGET_DPI (dpi bilgisi varsa) ve OCR_MAX_WIDTH'tir; uzun
+    görseller zaten yatay şeritlere bölündüğünden yalnızca genişlik sınırlanır.
+    Koyu zemin üzerine açık yazı ters çevrilir.
+    """
+    if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        img = Image.new('RGB', rgba.size, 'white')
+        img.paste(rgba, mask=rgba.split()[-1])
+    if img.mode != 'L':
+        img = img.convert('L')
+    w, h = img.size
+    scale = OCR_MAX_WIDTH / w
+    dpi = img.info.get('dpi')
+    if dpi and dpi[0] and dpi[0] > OCR_TARGET_DPI * 1.2:
+        scale = min(scale, OCR_TARGET_DPI / float(dpi[0]))
+    if scale < 1:
+        img = img.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.LANCZOS)
+    if not OCR_BINARIZE:
+        return img
+    t = _otsu(img.histogram())
+    bw = img.point(lambda v: 255 if v > t else 0, '1')
+    hist = bw.histogram()
+    if hist[0] > hist[255]:  # mürekkep zeminden fazla: koyu zemin
+        bw = ImageOps.invert(bw.convert('L')).convert('1')
+    return bw
+
+def _bands(profile, min_height):
+    """Mürekkep profili -> [(başlangıç, bitiş)] dolu aralıklar"""
+    out, start = [], None
+    for i, v in enumerate(profile + [0]):
+        if v > 2 and start is None:
+            start = i
+        elif v <= 2 and start is not None:
+            if i - start >= min_height: out.append((start, i))
+            start = None
+    return out
+
+def choose_psm(img):
+    """Sayfa düzenine göre Tesseract PSM'i; boş görsel için None.
+
+    7: tek satır, 3: çok sütunlu (tam düzen analizi), 11: seyrek metin (form, fiş),
+    6: tek düzgün metin bloğu (düzen analizi atlanır, en hızlısı).
+    """
+    ink = ImageOps.invert(img.convert('L'))
+    box = ink.getbbox()
+    if box is None:
+        return None
+    ink = ink.crop(box)
+    w, h = ink.size
+    lines = _bands(list(ink.resize((1, h), Image.BOX).getdata()), max(2, h // 500))
+    if not lines:
+        return None
+    heights = [b - a for a, b in lines]
+    if len(lines) == 1:
+        return 7 if heights[0] * 4 < w else 6
+    cols = list(ink.resize((w, 1), Image.BOX).getdata())
+    gutter = max(10, w // 50)
+    run = 0
+    for v in cols[w // 4: 3 * w // 4]:
+        run = run + 1 if v == 0 else 0
+        if run >= gutter:
+            return 3
+    # Seyrek: satırlar sayfanın küçük bir kısmı ve aralar geniş; düzenli aralıklı çok satır yine bloktur
+    gaps = [lines[i + 1][0] - lines[i][1] for i in range(len(lines) - 1)]
+    if (sum(heights) < h * 0.25 and median(gaps) > 2 * median(heights)
+            and (len(lines) < 10 or pstdev(gaps) > mean(gaps) / 2)):
+        return 11
+    return 6
+
+# ---- Engines ----
+class _CliEngine:
+    """pytesseract: her çağrı ayrı tesseract süreci"""
+    name = 'cli'
+
+    def __init__(self):
+        self.installed = set(pytesseract.get_languages(config=''))
+
+    def recognize(self, img, psm, lang):
+        return pytesseract.image_to_string(img, lang=lang, config=f'--psm {psm}')
+
+class _TesserocrEngine:
+    """tesserocr: süreç (thread) başına kalıcı TessBaseAPI; dil verisi bir kez yüklenir"""
+    name = 'tesserocr'
+
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.path, langs = tesserocr.get_languages()
+        self.installed = set(langs)
+        self._local = threading.local()
+
+    def recognize(self, img, psm, lang):
+        api = getattr(self._local, 'api', None)
+        if api is None or self._local.lang != lang:
+            if api is not None:
+                api.End()
+            api = self._tesserocr.PyTessBaseAPI(path=self.path, lang=lang or 'eng')
+            self._local.api, self._local.lang = api, lang
+        api.SetPageSegMode(psm)
+        api.SetImage(img)
+        return api.GetUTF8Text()
+
+# İşçi süreç başına tek motor; süreç havuzu kalıcı olduğundan dil verisi her çağrıda yeniden yüklenmez
+_engine = {'engine': None, 'lang': None, 'error': None}
+
+def get_engine():
+    if _engine['engine'] is None:
+        if _engine['error'] is not None:
+            raise _engine['error']
+        os.environ.setdefault('OMP_THREAD_LIMIT', OCR_THREADS)
+        try:
+            engine = None
+            if OCR_ENGINE in ('auto', 'tesserocr'):
+                try:
+                    engine = _TesserocrEngine()
+                except ImportError:
+                    if OCR_ENGINE == 'tesserocr':
+                        raise
+            engine = engine or _CliEngine()
+        except Exception as e:
+            _engine['error'] = e
+            raise
+        # Kurulu olmayan dil istenirse Tesseract hata verir; yalnızca kurulu olanlar kullanılır
+        langs = [l for l in OCR_LANG.split('+') if l in engine.installed]
+        _engine.update(engine=engine, lang='+'.join(langs) or None)
+    return _engine['engine']
+
+def available():
+    try:
+        get_engine()
+        return True
+    except Exception:
+        return False
+
+def ocr_image(img):
+    """Ön işleme + düzene göre PSM + OCR; boş görselde Tesseract çağrılmaz"""
+    img = prepare(img)
+    psm = choose_psm(img)
+    if psm is None:
+        return ""
+    engine = get_engine()
+    return engine.recognize(img, OCR_PSM or psm, _engine['lang']).strip()
+
+# ---- Scanned PDF pages ----
+def needs_ocr(page, text):
+    """Metin katmanı (neredeyse) boş ve sayfanın önemli kısmını görsel kaplıyorsa True"""
+    if len(text) >= OCR_PDF_MIN_CHARS or not page.images:
+        return False
+    area = float(page.width * page.height) or 1.0
+    covered = sum(max(0, im['x1'] - im['x0']) * max(0, im['bottom'] - im['top']) for im in page.images)
+    return covered / area >= OCR_PDF_MIN_IMAGE_AREA
+
+def _embedded_scan(page):
+    """Tam sayfa tek JPEG (tarayıcı çıktısı) ise görseli render etmeden doğrudan aç"""
+    if len(page.images) != 1 or page.rotation % 360:
+        return None
+    from pdfminer.pdftypes import LITERALS_DCT_DECODE
+    im = page.images[0]
+    if (im['x1'] - im['x0']) * (im['bottom'] - im['top']) < 0.9 * page.width * page.height:
+        return None
+    stream = im['stream']
+    filters = [f for f, _ in stream.get_filters()]
+    if len(filters) != 1 or filters[0] not in LITERALS_DCT_DECODE:
+        return None
+    img = Image.open(io.BytesIO(stream.get_rawdata()))
+    if img.mode == 'CMYK':  # Adobe CMYK JPEG'leri çoğunlukla ters renklidir
+        return None
+    dpi = img.size[0] / (float(page.width) / 72.0)
+    img.info['dpi'] = (dpi, dpi)
+    return img
+
+def rasterize_page(page, path, index, dpi=None):
+    """PDF sayfasını görsele çevir: gömülü tarama, pdftoppm (poppler) ya da pdfplumber (ImageMagick)"""
+    img = _embedded_scan(page)
+    if img is not None:
+        return img
+    dpi = dpi or OCR_PDF_DPI
+    if shutil.which('pdftoppm'):
+        n = str(index + 1)
+        png = subprocess.run(['pdftoppm', '-f', n, '-l', n, '-r', str(dpi), '-gray', '-png', path],
+                             check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=300).stdout
+        img = Image.open(io.BytesIO(png))
+    else:
+        img = page.to_image(resolution=dpi).original
+    img.info['dpi'] = (dpi, dpi)
+    return img
+
+def ocr_pdf_page(page, path, index):
+    """Taranmış PDF sayfasının metni; Tesseract ya da rasterleştirici yoksa boş"""
+    if not available():
+        return ""
+    try:
+        img = rasterize_page(page, path, index)
+    except Exception:
+        return ""
+    return OcrText(ocr_image(img))
@@ -0,0 +1,18 @@
+import sys
+
+# gevent altında tek bir thread binlerce bağlantıya hizmet eder; CPU'ya bağlı kısa işler
+# (parola hash'i, sorgu embedding'i) döngüyü bloklamasın diye gerçek bir OS thread'inde çalışır.
+
+def gevent_active():
+    """Süreç gevent ile monkey-patch edilmiş mi (gunicorn -k gevent)"""
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('threading')
+
+def run_blocking(fn, *args, **kwargs):
+    """fn'i gevent'te hub thread havuzunda çalıştırıp bekle; diğer modlarda doğrudan çağır"""
+    if not gevent_active():
+        return fn(*args, **kwargs)
+    from gevent import get_hub
+    return get_hub().threadpool.apply(fn, args, kwargs)
@@ -0,0 +1,26 @@
+from flask import g
+from sqlalchemy.orm import Session
+
+from models.database import db
+
+def read_session():
+    """Salt okunur sorgular (liste, istatistik, arama) için oturum.
+
+    'replica' bind'ı tanımlıysa (DATABASE_REPLICA_URL) istek başına replikaya bağlı
+    ayrı bir oturum açılır; yoksa ana oturum döner. Replika gecikmesi nedeniyle
+    aynı istekte yazılan veriyi okumak için kullanılmamalı.
+    """
+    engine = db.engines.get('replica')
+    if engine is None:
+        return db.session
+    if 'replica_session' not in g:
+        g.replica_session = Session(bind=engine)
+    return g.replica_session
+
+def _close(exc):
+    session = g.pop('replica_session', None)
+    if session is not None:
+        session.close()
+
+def init_app(app):
+    app.teardown_appcontext(_close)
@@ -0,0 +1,237 @@
+import gzip, hashlib, itertools, json, logging
+
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import event, update
+
+from models.database import db, Company, Document
+from .auth_cache import TTLCache
+from .replica import read_session
+
+try:
+    import brotli
+except ImportError:  # isteğe bağlı; yoksa yalnızca gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Yanıt biçimi değiştiğinde artırılır; eski ETag ve önbellek girdileri kendiliğinden geçersizleşir
+RENDER_VERSION = '1'
+
+# ---- Backends ----
+class LocalCache:
+    """Redis'in kullanılan komutlarının (get/set/delete) süreç içi karşılığı: LRU + girdi başına süre"""
+    def __init__(self, maxsize, ttl):
+        self._data = TTLCache(maxsize, ttl)
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value, ex=None):
+        self._data.set(key, value, ttl=ex)
+
+    def delete(self, *keys):
+        for key in keys:
+            self._data.pop(key)
+
+def make_cache(config):
+    """RESPONSE_CACHE_URL'e göre önbellek; 'none' ise None"""
+    url = config.get('RESPONSE_CACHE_URL') or 'none'
+    if url == 'none':
+        return None
+    if url == 'local':
+        return LocalCache(config.get('RESPONSE_CACHE_SIZE', 2000), config.get('RESPONSE_CACHE_TTL', 300))
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        import redis
+        return redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+    raise ValueError(f"Bilinmeyen RESPONSE_CACHE_URL: {url}")
+
+def _cache():
+    return current_app.extensions.get('response_cache')
+
+# Önbellek hatası (Redis erişilemez) isteği düşürmez; ıskalama gibi davranılır
+def _get(key):
+    cache = _cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception:
+        logger.warning("Response cache get error", exc_info=True)
+        return None
+
+def _set(key, value, ex):
+    cache = _cache()
+    if cache is None:
+        return
+    try:
+        cache.set(key, value, ex=ex)
+    except Exception:
+        logger.warning("Response cache set error", exc_info=True)
+
+def _delete(*keys):
+    cache = _cache()
+    if cache is None or not keys:
+        return
+    try:
+        cache.delete(*keys)
+    except Exception:
+        logger.warning("Response cache delete error", exc_info=True)
+
+# ---- Company data version ----
+def touch(company_id, session=None):
+    """Şirketin veri sürümünü transaction başına bir kez artır (commit çağırana ait)"""
+    session = session or db.session
+    bumped = session.info.setdefault('version_bumped', set())
+    if company_id is None or company_id in bumped:
+        return
+    table = Company.__table__
+    session.connection().execute(update(table).where(table.c.id == company_id)
+                                 .values(data_version=table.c.data_version + 1))
+    bumped.add(company_id)
+
+def company_version(company_id):
+    """Şirketin veri sürümü; VERSION_CACHE_TTL süre önbellekten, yoksa tek PK sorgusuyla.
+
+    Liste/istatistikle aynı (okuma) oturumdan okunur; replika gecikse bile sürüm ve veri tutarlıdır.
+    """
+    key = f'ver:{company_id}'
+    cached = _get(key)
+    if cached is not None:
+        return int(cached)
+    version = read_session().query(Company.data_version).filter(Company.id == company_id).scalar() or 0
+    _set(key, str(version).encode(), current_app.config.get('VERSION_CACHE_TTL', 2))
+    return version
+
+# ---- Responses ----
+def _etag(*parts):
+    return hashlib.sha1(json.dumps([RENDER_VERSION, *parts], default=str).encode()).hexdigest()[:20]
+
+def _negotiate(size):
+    """Accept-Encoding'e göre 'br' / 'gzip' / None"""
+    cfg = current_app.config
+    algorithms = [a.strip() for a in (cfg.get('COMPRESS_ALGORITHMS') or '').split(',') if a.strip()]
+    if brotli is None and 'br' in algorithms:
+        algorithms.remove('br')
+    if not algorithms or size < cfg.get('COMPRESS_MIN_SIZE', 1024):
+        return None
+    return request.accept_encodings.best_match(algorithms)
+
+def compress(body, encoding):
+    cfg = current_app.config
+    if encoding == 'br':
+        return brotli.compress(body, quality=cfg.get('COMPRESS_BROTLI_QUALITY', 5))
+    return gzip.compress(body, compresslevel=cfg.get('COMPRESS_LEVEL', 6), mtime=0)
+
+def _revalidate(rv, etag):
+    rv.set_etag(etag, weak=True)
+    rv.cache_control.private = True
+    rv.cache_control.no_cache = True  # tarayıcı her seferinde If-None-Match ile sorar
+    rv.vary.add('Authorization')
+    rv.vary.add('Accept-Encoding')
+    return rv
+
+def _buffer(parts, limit):
+    """parts'tan (str) en fazla limit byte'lık baştaki parçaları topla.
+
+    Dönüş: (gövde, None) tümü sığdıysa; ([toplanan byte'lar], kalan üreteç) sığmadıysa.
+    """
+    parts, buffered, size = iter(parts), [], 0
+    for part in parts:
+        part = part.encode('utf-8')
+        buffered.append(part)
+        size += len(part)
+        if size > limit:
+            return buffered, parts
+    return b''.join(buffered), None
+
+def versioned_json(name, company_id, render, stream=None):
+    """Şirket veri sürümüne bağlı GET yanıtı.
+
+    ETag = sürüm + uç nokta + sorgu parametreleri. If-None-Match eşleşirse gövde üretilmeden
+    304 döner. Değilse render(version) (JSON str) önbellekten alınır ya da üretilip saklanır;
+    sıkıştırılmış hali de sürüm başına bir kez üretilir. stream verilmişse render(version) JSON
+    parçaları üretir ve yalnızca RESPONSE_CACHE_MAX_BYTES'a kadar bellekte toplanır; sayfa bu
+    sınırı aşarsa önbelleğe alınmaz, toplanan parçalar ve kalanı stream(parts) sarmalayıcısıyla
+    (başlık gönderildikten sonraki hatayı gövdede bildirir) sıkıştırılmadan akıtılır.
+    """
+    cfg = current_app.config
+    version = company_version(company_id)
+    etag = f"{version}-{_etag(name, sorted(request.args.items(multi=True)))}"
+    if request.if_none_match.contains_weak(etag):
+        return _revalidate(Response(status=304), etag)
+
+    key = f'resp:{company_id}:{etag}'
+    limit = cfg.get('RESPONSE_CACHE_MAX_BYTES', 1024**2)
+    body = _get(key)
+    cacheable = True
+    if body is None:
+        if stream is None:
+            body = render(version).encode('utf-8')
+        else:
+            body, rest = _buffer(render(version), limit)
+            if rest is not None:
+                parts = itertools.chain(body, rest)  # Response str ve bytes parçaları birlikte kabul eder
+                return _revalidate(Response(stream_with_context(stream(parts)), mimetype='application/json'), etag)
+        cacheable = len(body) <= limit
+        if cacheable:
+            _set(key, body, cfg.get('RESPONSE_CACHE_TTL', 300))
+    rv = Response(body, mimetype='application/json')
+    encoding = _negotiate(len(body))
+    if encoding:
+        encoded = _get(f'{key}:{encoding}') if cacheable else None
+        if encoded is None:
+            encoded = compress(body, encoding)
+            if cacheable:
+                _set(f'{key}:{encoding}', encoded, cfg.get('RESPONSE_CACHE_TTL', 300))
+        rv.set_data(encoded)
+        rv.headers['Content-Encoding'] = encoding
+    return _revalidate(rv, etag)
+
+def hashed_json(data):
+    """Küçük, zaten önbellekte tutulan veriler (/me) için gövde hash'inden zayıf ETag + 304"""
+    body = current_app.json.dumps(data)
+    etag = _etag(body)
+    if request.if_none_match.contains_weak(etag):
+        return _revalidate(Response(status=304), etag)
+    return _revalidate(Response(body + "\n", mimetype='application/json'), etag)
+
+def _compress_response(rv):
+    """after_request: diğer büyük JSON/metin yanıtlarını sıkıştır (akış ve dosya yanıtları hariç)"""
+    if (rv.status_code != 200 or rv.direct_passthrough or rv.is_streamed
+            or 'Content-Encoding' in rv.headers or rv.mimetype not in ('application/json', 'text/plain', 'text/html')):
+        return rv
+    encoding = _negotiate(rv.content_length or 0)
+    rv.vary.add('Accept-Encoding')
+    if encoding:
+        rv.set_data(compress(rv.get_data(), encoding))
+        rv.headers['Content-Encoding'] = encoding
+        if rv.headers.get('ETag') and not rv.headers['ETag'].startswith('W/'):
+            etag, _ = rv.get_etag()
+            rv.set_etag(etag, weak=True)  # sıkıştırılmış byte'lar farklı; eşdeğer ama aynı değil
+    return rv
+
+# ---- Wiring ----
+def _collect_changes(session, flush_context, instances):
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Document):
+            touch(obj.company_id, session)
+    for obj in session.dirty:
+        if isinstance(obj, Document) and session.is_modified(obj):
+            touch(obj.company_id, session)
+
+def _after_commit(session):
+    companies = session.info.pop('version_bumped', ())
+    if companies:
+        _delete(*[f'ver:{cid}' for cid in companies])
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('version_bumped', None)
+
+def init_app(app):
+    app.extensions['response_cache'] = make_cache(app.config)
+    app.after_request(_compress_response)
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'before_flush', _collect_changes)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_transaction_end', _after_transaction_end)
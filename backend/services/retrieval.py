@@ -0,0 +1,182 @@
+import logging, re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import tuple_
+
+from models.database import DocumentChunk, DocumentContent
+from .auth_cache import TTLCache
+from .embeddings import get_reranker
+from .indexing import _embedder, company_index
+from .offload import run_blocking
+from .replica import read_session
+from .response_cache import company_version
+from .search import keyword_pages
+
+logger = logging.getLogger(__name__)
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# Parçası olmayan (henüz indekslenmemiş) sayfadan alınan pencerenin uzunluğu (karakter)
+PAGE_WINDOW = 1200
+
+class RetrievalCache:
+    """Sorgu embedding'leri (şirketten bağımsız) ve şirket başına sonuç kümeleri.
+
+    Sonuç anahtarı şirket veri sürümünü içerir; belge değişince eski girdiler bir daha
+    okunmaz. İndeks güncellemesi DB commit'inden sonra geldiği için invalidate ayrıca çağrılır.
+    """
+    def __init__(self, config):
+        size, ttl = config.get('QUERY_CACHE_SIZE', 1000), config.get('QUERY_CACHE_TTL', 300)
+        self.embeddings = TTLCache(size, ttl)
+        self.results = TTLCache(size, ttl)
+        # Anahtar kelime ayağı vektör aramasıyla paralel, kendi DB oturumunda çalışır
+        self.pool = ThreadPoolExecutor(max_workers=config.get('RETRIEVAL_THREADS', 4),
+                                       thread_name_prefix='retrieval')
+
+    def invalidate(self, company_id):
+        self.results.drop_where(lambda key, _: key[0] == company_id)
+
+def _cache():
+    return current_app.extensions['retrieval']
+
+def invalidate(company_id):
+    """Şirketin önbellekteki sonuç kümelerini at (vektör indeksi değiştiğinde)"""
+    _cache().invalidate(company_id)
+
+# ---- Legs ----
+def embed_query(query):
+    """Sorgu vektörü; aynı soru (ör. sohbette tekrar) yeniden embed edilmez"""
+    embedder = _embedder()
+    key = (embedder.name, query)
+    vec = _cache().embeddings.get(key)
+    if vec is None:
+        vec = run_blocking(embedder.encode, [query])[0]
+        _cache().embeddings.set(key, vec)
+    return vec
+
+def _vector_leg(company_id, query, n):
+    """Vektör benzerliğiyle en yakın n parça, sıralı"""
+    hits = company_index(company_id).search(embed_query(query), n)
+    if not hits:
+        return []
+    rows = {r.id: r for r in read_session().query(DocumentChunk.id, DocumentChunk.document_id,
+                                                  DocumentChunk.page_number, DocumentChunk.content)
+            .filter(DocumentChunk.id.in_([i for i, _ in hits]), DocumentChunk.company_id == company_id)}
+    return [_passage(rows[i]) for i, _ in hits if i in rows]
+
+def _passage(chunk):
+    return {'key': ('chunk', chunk.id), 'chunk_id': chunk.id, 'document_id': chunk.document_id,
+            'page_number': chunk.page_number, 'content': chunk.content}
+
+def _term_hits(text, terms):
+    return sum(1 for tok in _TERM_RE.findall(text.lower()) if any(tok.startswith(t) for t in terms))
+
+def _window(text, terms):
+    """Sayfa metninden ilk eşleşen terimin çevresindeki pencere"""
+    low = text.lower()
+    pos = min((i for i in (low.find(t) for t in terms) if i >= 0), default=0)
+    start = max(0, pos - PAGE_WINDOW // 4)
+    if start:
+        start = text.find(' ', start) + 1 or start  # kelime ortasından başlama
+    return text[start:start + PAGE_WINDOW]
+
+def _keyword_leg(app, company_id, query, n):
+    """bm25 ile en iyi n sayfa; her sayfa için soru terimlerini en çok içeren parçası, sıralı"""
+    with app.app_context():
+        pages = keyword_pages(company_id, query, n)
+        if not pages:
+            return []
+        terms = {t.lower() for t in _TERM_RE.findall(query) if len(t) > 1}
+        keys = {(doc_id, page) for _, doc_id, page, _ in pages}
+        best = {}
+        for chunk in (read_session().query(DocumentChunk.id, DocumentChunk.document_id,
+                                           DocumentChunk.page_number, DocumentChunk.content)
+                      .filter(DocumentChunk.company_id == company_id,
+                              tuple_(DocumentChunk.document_id, DocumentChunk.page_number).in_(keys))):
+            score = _term_hits(chunk.content, terms)
+            page = (chunk.document_id, chunk.page_number)
+            if page not in best or score > best[page][0]:
+                best[page] = (score, chunk)
+        # Henüz parçalanmamış sayfalar (indeksleme bekliyor) sayfa metninden pencereyle temsil edilir
+        missing = [cid for cid, doc_id, page, _ in pages if (doc_id, page) not in best]
+        texts = dict(read_session().query(DocumentContent.id, DocumentContent.content)
+                     .filter(DocumentContent.id.in_(missing))) if missing else {}
+        out = []
+        for cid, doc_id, page, _ in pages:
+            if (doc_id, page) in best:
+                out.append(_passage(best[(doc_id, page)][1]))
+            elif cid in texts:
+                out.append({'key': ('page', cid), 'chunk_id': None, 'document_id': doc_id,
+                            'page_number': page, 'content': _window(texts[cid], terms)})
+        return out
+
+# ---- Fusion ----
+def rrf(rankings, k0=60):
+    """Reciprocal rank fusion: anahtar başına sum(1 / (k0 + sıra)); büyükten küçüğe"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] += 1.0 / (k0 + rank)
+    return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+
+def _rerank(query, candidates):
+    reranker = get_reranker(current_app.config)
+    if reranker is None or not candidates:
+        return candidates
+    scores = run_blocking(reranker.score, query, [c['content'] for c in candidates],
+                          current_app.config.get('RERANK_BATCH_SIZE', 16))
+    for c, s in zip(candidates, scores):
+        c['score'] = s
+    return sorted(candidates, key=lambda c: -c['score'])
+
+def retrieve(company_id, query, k=5):
+    """Sorunun bağlamı için en iyi k pasaj.
+
+    RETRIEVAL_MODE=hybrid: bm25 (sayfa) ve vektör (parça) aramaları paralel çalışır,
+    sonuçlar RRF ile birleştirilir; RERANK_MODEL verilmişse ilk RERANK_TOP_N aday
+    cross-encoder ile yeniden sıralanır. Bir ayak hata verirse diğeriyle devam edilir.
+    Dönüş: [{'chunk_id', 'document_id', 'page_number', 'content', 'score', 'matched'}]
+    """
+    cfg = current_app.config
+    query = " ".join(query.split())
+    mode = cfg.get('RETRIEVAL_MODE', 'hybrid')
+    cache = _cache()
+    cache_key = (company_id, company_version(company_id), mode, k, query)
+    hit = cache.results.get(cache_key)
+    if hit is not None:
+        return hit
+
+    n = max(k, cfg.get('RETRIEVAL_CANDIDATES', 30))
+    keyword = None
+    if mode in ('hybrid', 'keyword'):
+        keyword = cache.pool.submit(_keyword_leg, current_app._get_current_object(), company_id, query, n)
+    legs = {}
+    if mode in ('hybrid', 'vector'):
+        try:
+            legs['vector'] = _vector_leg(company_id, query, n)
+        except Exception:
+            logger.exception("Vector retrieval error")
+    if keyword is not None:
+        try:
+            legs['keyword'] = keyword.result()
+        except Exception:
+            logger.exception("Keyword retrieval error")
+
+    passages, matched = {}, defaultdict(list)
+    for name, leg in legs.items():
+        for p in leg:
+            passages.setdefault(p['key'], p)
+            matched[p['key']].append(name)
+    fused = rrf([[p['key'] for p in leg] for leg in legs.values()], cfg.get('RETRIEVAL_RRF_K', 60))
+    top_n = max(k, cfg.get('RERANK_TOP_N', 20)) if cfg.get('RERANK_MODEL') else k
+    candidates = [{**{f: passages[key][f] for f in ('chunk_id', 'document_id', 'page_number', 'content')},
+                   'score': score, 'matched': matched[key]}
+                  for key, score in fused[:top_n]]
+    results = _rerank(query, candidates)[:k]
+    cache.results.set(cache_key, results)
+    return results
+
+def init_app(app):
+    app.extensions['retrieval'] = RetrievalCache(app.config)
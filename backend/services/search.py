@@ -0,0 +1,159 @@
+import re
+from html import escape
+
+from sqlalchemy import text
+
+from models.database import db
+from .replica import read_session
+
+# Snippet işaretleri: metin HTML-escape edildikten sonra <mark> ile değiştirilir
+_SEL_START, _SEL_STOP = '\x02', '\x03'
+
+# ---- Schema ----
+# Migration 0008 aynı DDL'i uygular; değişiklikler yeni bir migration sürümüyle yapılmalı
+_PG_DDL = [
+    # Türkçe + İngilizce kök bulma; generated column olduğu için uygulama ayrıca güncellemez
+    """ALTER TABLE document_contents ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (to_tsvector('turkish', coalesce(content, ''))
+                            || to_tsvector('english', coalesce(content, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_document_contents_search ON document_contents USING GIN (search_vector)",
+]
+
+_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS document_contents_fts USING fts5(
+       content, content='document_contents', content_rowid='id',
+       tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS document_contents_fts_ai AFTER INSERT ON document_contents BEGIN
+       INSERT INTO document_contents_fts(rowid, content) VALUES (new.id, new.content); END""",
+    """CREATE TRIGGER IF NOT EXISTS document_contents_fts_ad AFTER DELETE ON document_contents BEGIN
+       INSERT INTO document_contents_fts(document_contents_fts, rowid, content) VALUES ('delete', old.id, old.content); END""",
+    """CREATE TRIGGER IF NOT EXISTS document_contents_fts_au AFTER UPDATE ON document_contents BEGIN
+       INSERT INTO document_contents_fts(document_contents_fts, rowid, content) VALUES ('delete', old.id, old.content);
+       INSERT INTO document_contents_fts(rowid, content) VALUES (new.id, new.content); END""",
+]
+
+def _dialect():
+    return db.engine.dialect.name
+
+def init_schema():
+    """Tam metin indeksini oluştur (db.create_all sonrası, idempotent)"""
+    if _dialect() == 'postgresql':
+        for ddl in _PG_DDL:
+            db.session.execute(text(ddl))
+    elif _dialect() == 'sqlite':
+        exists = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name='document_contents_fts'")).first()
+        for ddl in _SQLITE_DDL:
+            db.session.execute(text(ddl))
+        if not exists:
+            # Mevcut içerikleri indekse al
+            db.session.execute(text("INSERT INTO document_contents_fts(document_contents_fts) VALUES ('rebuild')"))
+    db.session.commit()
+
+# ---- Query ----
+def _fts5_query(q, any_term=False):
+    """Kullanıcı girdisini FTS5 sözdiziminden arındır: her kelime tırnaklı önek, örtük AND.
+
+    Kök bulma olmadığından önek eşleşmesi Türkçe ekleri yakalar (fatura -> faturası).
+    any_term: terimler OR ile bağlanır (soru cümlelerinde her kelime geçmez; bm25 sıralar),
+    tek harfli terimler atlanır.
+    """
+    terms = re.findall(r'\w+', q, flags=re.UNICODE)
+    if any_term:
+        return " OR ".join(f'"{t}"*' for t in terms if len(t) > 1)
+    return " ".join(f'"{t}"*' for t in terms)
+
+def _render_snippet(s):
+    return escape(s or '').replace(_SEL_START, '<mark>').replace(_SEL_STOP, '</mark>')
+
+def _pg_search(company_id, q, limit, offset, file_type):
+    # ts_headline pahalı olduğu için yalnızca sayfalanmış en iyi sonuçlar için hesaplanır
+    sql = f"""
+        WITH query AS (
+            SELECT websearch_to_tsquery('turkish', :q) || websearch_to_tsquery('english', :q) AS tsq
+        ), hits AS (
+            SELECT dc.id, dc.document_id, dc.page_number, d.original_filename, d.file_type,
+                   ts_rank_cd(dc.search_vector, query.tsq) AS rank
+            FROM document_contents dc
+            JOIN documents d ON d.id = dc.document_id, query
+            WHERE d.company_id = :company_id AND dc.search_vector @@ query.tsq
+                  {"AND d.file_type = :file_type" if file_type else ""}
+            ORDER BY rank DESC, dc.id
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT hits.*, ts_headline('turkish', dc.content, query.tsq,
+                   'StartSel=' || chr(2) || ', StopSel=' || chr(3) || ', MaxFragments=2, MaxWords=30, MinWords=10') AS snippet
+        FROM hits JOIN document_contents dc ON dc.id = hits.id, query
+        ORDER BY hits.rank DESC, hits.id
+    """
+    return read_session().execute(text(sql), {'q': q, 'company_id': company_id, 'limit': limit,
+                                          'offset': offset, 'file_type': file_type}).mappings().all()
+
+def _sqlite_search(company_id, q, limit, offset, file_type):
+    match = _fts5_query(q)
+    if not match:
+        return []
+    # bm25 küçük = daha iyi; API'de büyük = daha iyi olacak şekilde işareti çevrilir
+    sql = f"""
+        SELECT dc.id, dc.document_id, dc.page_number, d.original_filename, d.file_type,
+               -bm25(document_contents_fts) AS rank,
+               snippet(document_contents_fts, 0, char(2), char(3), '…', 24) AS snippet
+        FROM document_contents_fts
+        JOIN document_contents dc ON dc.id = document_contents_fts.rowid
+        JOIN documents d ON d.id = dc.document_id
+        WHERE document_contents_fts MATCH :q AND d.company_id = :company_id
+              {"AND d.file_type = :file_type" if file_type else ""}
+        ORDER BY bm25(document_contents_fts), dc.id
+        LIMIT :limit OFFSET :offset
+    """
+    return read_session().execute(text(sql), {'q': match, 'company_id': company_id, 'limit': limit,
+                                          'offset': offset, 'file_type': file_type}).mappings().all()
+
+def search(company_id, q, limit=20, offset=0, file_type=None):
+    """Şirketin belgelerinde sayfa bazlı tam metin arama; sıralı, vurgulu snippet'lerle"""
+    backend = _pg_search if _dialect() == 'postgresql' else _sqlite_search
+    rows = backend(company_id, q, limit, offset, file_type)
+    return [{
+        'document_id': r['document_id'],
+        'original_filename': r['original_filename'],
+        'file_type': r['file_type'],
+        'page_number': r['page_number'],
+        'rank': float(r['rank'] or 0),
+        'snippet': _render_snippet(r['snippet'])
+    } for r in rows]
+
+# ---- Ranked pages for retrieval ----
+def keyword_pages(company_id, q, limit=30):
+    """Soru için bm25 / ts_rank_cd sırasıyla en iyi limit sayfa: [(content_id, document_id, page_number, rank)].
+
+    Aramadan farklı olarak terimler OR ile bağlanır ve snippet üretilmez.
+    """
+    if _dialect() == 'postgresql':
+        sql = """
+            WITH query AS (
+                SELECT replace(plainto_tsquery('turkish', :q)::text, '&', '|')::tsquery
+                       || replace(plainto_tsquery('english', :q)::text, '&', '|')::tsquery AS tsq
+            )
+            SELECT dc.id, dc.document_id, dc.page_number, ts_rank_cd(dc.search_vector, query.tsq) AS rank
+            FROM document_contents dc JOIN documents d ON d.id = dc.document_id, query
+            WHERE d.company_id = :company_id AND dc.search_vector @@ query.tsq
+            ORDER BY rank DESC, dc.id
+            LIMIT :limit
+        """
+        params = {'q': q}
+    else:
+        match = _fts5_query(q, any_term=True)
+        if not match:
+            return []
+        sql = """
+            SELECT dc.id, dc.document_id, dc.page_number, -bm25(document_contents_fts) AS rank
+            FROM document_contents_fts
+            JOIN document_contents dc ON dc.id = document_contents_fts.rowid
+            JOIN documents d ON d.id = dc.document_id
+            WHERE document_contents_fts MATCH :q AND d.company_id = :company_id
+            ORDER BY bm25(document_contents_fts), dc.id
+            LIMIT :limit
+        """
+        params = {'q': match}
+    rows = read_session().execute(text(sql), {**params, 'company_id': company_id, 'limit': limit}).all()
+    return [(r[0], r[1], r[2], float(r[3] or 0)) for r in rows]
@@ -0,0 +1,126 @@
+import threading, time
+
+import click
+from flask import current_app
+from sqlalchemy import case, event, func
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db, Document, CompanyStats
+from .replica import read_session
+from .response_cache import touch
+
+# ---- Counters ----
+def bump(company_id, file_type, total=0, processed=0, size=0):
+    """Sayaçları artır/azalt (commit çağırana ait); commit sonrası önbellek geçersizlenir.
+
+    Satır kilitleri her yolda aynı sırayla alınır (PostgreSQL'de eşzamanlı yükleme/silme kilitlenmesin):
+    önce companies (touch; belge flush'ındaki touch da aynı satırı ilk alır), sonra company_stats.
+    Birden çok dosya türü güncelleyen çağıranlar türleri sıralı geçer.
+    """
+    touch(company_id)
+    file_type = file_type or ''
+    values = {'total': CompanyStats.total + total, 'processed': CompanyStats.processed + processed,
+              'bytes': CompanyStats.bytes + size}
+    n = CompanyStats.query.filter_by(company_id=company_id, file_type=file_type)\
+        .update(values, synchronize_session=False)
+    if not n:
+        try:
+            with db.session.begin_nested():
+                db.session.add(CompanyStats(company_id=company_id, file_type=file_type,
+                                            total=total, processed=processed, bytes=size))
+        except IntegrityError:
+            CompanyStats.query.filter_by(company_id=company_id, file_type=file_type)\
+                .update(values, synchronize_session=False)
+    db.session.info.setdefault('stats_dirty', set()).add(company_id)
+
+def _aggregate(session, company_id=None):
+    """documents tablosundan [(company_id, file_type, total, processed, bytes)]"""
+    q = (session.query(Document.company_id, Document.file_type, func.count(Document.id),
+                       func.sum(case((Document.is_processed == True, 1), else_=0)),
+                       func.coalesce(func.sum(Document.file_size), 0))
+         .group_by(Document.company_id, Document.file_type))
+    if company_id is not None:
+        q = q.filter(Document.company_id == company_id)
+    return q.all()
+
+def reconcile(company_id=None):
+    """Sayaçları documents tablosundan toplu olarak yeniden hesapla. Dönüş: güncellenen şirket sayısı"""
+    stale = CompanyStats.query
+    if company_id is not None:
+        stale = stale.filter_by(company_id=company_id)
+    rows = _aggregate(db.session, company_id)
+    companies = {r[0] for r in rows} | ({company_id} if company_id is not None else set())
+    for cid in sorted(companies):  # bump ile aynı kilit sırası: önce companies
+        touch(cid)
+    stale.delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(CompanyStats, [
+        {'company_id': cid, 'file_type': ft or '', 'total': t, 'processed': int(p or 0), 'bytes': int(b)}
+        for cid, ft, t, p, b in rows
+    ])
+    db.session.info.setdefault('stats_dirty', set()).update(companies)
+    db.session.commit()
+    return len(companies)
+
+# ---- Cached reads ----
+_cache = {}
+_lock = threading.Lock()
+
+def invalidate(company_id):
+    with _lock:
+        _cache.pop(company_id, None)
+
+def get_stats(company_id, version=None):
+    """Şirket istatistikleri; STATS_CACHE_TTL saniye süreç içinde önbelleklenir.
+
+    version (şirket veri sürümü) verilirse farklı sürümde hesaplanmış önbellek girdisi kullanılmaz;
+    başka süreçteki yazımdan sonra eski sayılar yeni sürümün ETag'iyle sunulmaz.
+    """
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(company_id)
+        if hit and hit[0] > now and (version is None or hit[1] == version):
+            return hit[2]
+
+    session = read_session()
+    rows = [(r.file_type, r.total, r.processed, r.bytes)
+            for r in session.query(CompanyStats).filter_by(company_id=company_id)]
+    if not rows:
+        # Sayaçları olmayan şirket (migration 0009 / reconcile-stats öncesi veri): okuma isteği
+        # yazmaz, toplu sorguyla hesaplanır
+        rows = [(ft or '', t, int(p or 0), int(b)) for _, ft, t, p, b in _aggregate(session, company_id)]
+
+    total = sum(r[1] for r in rows)
+    processed = sum(r[2] for r in rows)
+    total_bytes = sum(r[3] for r in rows)
+    data = {
+        'total_documents': total,
+        'processed_documents': processed,
+        'pending_documents': total - processed,
+        'storage_used': total_bytes,
+        'by_file_type': {ft: {'total': t, 'processed': p, 'bytes': b}
+                         for ft, t, p, b in rows if t or b},
+    }
+    with _lock:
+        _cache[company_id] = (now + current_app.config.get('STATS_CACHE_TTL', 5), version, data)
+    return data
+
+# ---- Wiring ----
+def _after_commit(session):
+    for company_id in session.info.pop('stats_dirty', ()):
+        invalidate(company_id)
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:  # savepoint geri alınması dış transaction'ın sayaçlarını silmesin
+        session.info.pop('stats_dirty', None)
+
+def init_app(app):
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_transaction_end', _after_transaction_end)
+
+    @app.cli.command('reconcile-stats')
+    @click.option('--company-id', type=int, default=None, help='Yalnızca bu şirket')
+    def reconcile_stats(company_id):
+        """company_stats sayaçlarını documents tablosundan yeniden hesapla"""
+        n = reconcile(company_id)
+        click.echo(f"{n} şirketin istatistikleri yeniden hesaplandı")
@@ -0,0 +1,392 @@
+import atexit, logging, os, queue, shutil, threading, uuid, hashlib, time
+from collections import defaultdict
+
+from flask import current_app, request
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError
+from werkzeug.formparser import parse_form_data
+
+from models.database import db, Company, Document, UploadSession, FileBlob
+from . import metrics
+from .auth_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class UploadError(Exception):
+    """Yükleme reddedildi; status HTTP koduna karşılık gelir"""
+    status = 400
+
+class FileTooLarge(UploadError):
+    status = 413
+
+class QuotaExceeded(UploadError):
+    status = 413
+
+# ---- Streaming write ----
+def copy_stream(src, dst, limit=None, chunk_size=None, hasher=None):
+    """src'yi sabit boyutlu parçalarla dst'ye kopyala, boyut ve sha256'yı yolda hesapla.
+
+    limit aşılırsa kopyalama durur ve FileTooLarge fırlatılır.
+    Dönüş: (yazılan byte, hasher)
+    """
+    chunk_size = chunk_size or current_app.config.get('UPLOAD_CHUNK_SIZE', 1024**2)
+    hasher = hasher or hashlib.sha256()
+    size, spent = 0, {'read': 0.0, 'hash': 0.0, 'write': 0.0}
+    clock = time.perf_counter
+    try:
+        while True:
+            t0 = clock()
+            chunk = src.read(chunk_size)
+            t1 = clock(); spent['read'] += t1 - t0
+            if not chunk:
+                break
+            size += len(chunk)
+            if limit is not None and size > limit:
+                raise FileTooLarge('Dosya boyutu sınırı aşıldı')
+            hasher.update(chunk)
+            t2 = clock(); spent['hash'] += t2 - t1
+            dst.write(chunk)
+            spent['write'] += clock() - t2
+    finally:
+        # Ağdan okuma / hash / diske yazma ayrımı /metrics'te http_request_stage_seconds olarak görünür
+        for stage, seconds in spent.items():
+            metrics.add_stage(stage, seconds)
+    return size, hasher
+
+def save_stream(src, path, limit=None):
+    """Akışı diske yaz; yarım kalan dosya bırakmaz. Dönüş: (size, sha256 hex)"""
+    part = path + '.part'
+    try:
+        with open(part, 'wb') as dst:
+            size, hasher = copy_stream(src, dst, limit=limit)
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    return size, hasher.hexdigest()
+
+class UploadTarget:
+    """Çok parçalı ayrıştırıcının dosya parçasını doğrudan yazdığı geçici dosya.
+
+    Boyut sınırı (bir istekteki tüm dosyalara paylaşılan) ve sha256 yazarken tutulur;
+    sınır aşılınca ayrıştırma FileTooLarge ile durur.
+    """
+    def __init__(self, path, budget):
+        self.path, self.budget = path, budget
+        self.size = 0
+        self.hasher = hashlib.sha256()
+        self._file = open(path, 'wb+')
+
+    def write(self, data):
+        self.size += len(data)
+        self.budget['used'] += len(data)
+        if self.budget['limit'] is not None and self.budget['used'] > self.budget['limit']:
+            raise FileTooLarge('Dosya boyutu sınırı aşıldı')
+        t0 = time.perf_counter()
+        self.hasher.update(data)
+        t1 = time.perf_counter()
+        n = self._file.write(data)
+        metrics.add_stage('hash', t1 - t0); metrics.add_stage('write', time.perf_counter() - t1)
+        return n
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+def parse_upload_form(limit, temps):
+    """multipart/form-data gövdesini ayrıştır; dosya parçaları gelirken UploadTarget'lara yazılır.
+
+    Werkzeug'un gövdeyi önce kendi geçici dosyasına biriktirip sonra kopyalanmasının yerine tek
+    geçiştir ve sınır gövdenin sonunu beklemeden uygulanır. Oluşan geçici yollar temps'e eklenir
+    (hata olsa da çağıran temizler). Dönüş: files (MultiDict: alan adı -> FileStorage; stream,
+    kapatılmış UploadTarget: path, size, hasher)
+    """
+    budget, targets = {'limit': limit, 'used': 0}, []
+
+    def factory(total_content_length, content_type, filename, content_length=None):
+        path = new_temp_path(); temps.append(path)
+        targets.append(UploadTarget(path, budget))
+        return targets[-1]
+
+    try:
+        _, _, files = parse_form_data(request.environ, stream_factory=factory,
+                                      max_content_length=current_app.config.get('MAX_CONTENT_LENGTH'))
+    finally:
+        for target in targets:
+            target.close()
+    return files
+
+def file_sha256(path, chunk_size=None, hasher=None, start=0):
+    """Dosyanın sha256'sını belleğe almadan hesapla (hasher verilirse start'tan itibaren devam eder)"""
+    chunk_size = chunk_size or current_app.config.get('UPLOAD_CHUNK_SIZE', 1024**2)
+    h = hasher or hashlib.sha256()
+    with open(path, 'rb') as f:
+        f.seek(start)
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+# ---- Resumable upload hashing ----
+# Parçalar geldikçe sürdürülen sha256 durumu: {upload_id: (hash'lenen byte, hasher)}. hashlib durumu
+# serileştirilemediği için süreç içidir; parçalar başka bir sürece düştüyse tamamlamada yalnızca
+# bu süreçte hash'lenmemiş kuyruk okunur (en kötü durumda tüm dosya).
+_upload_hashers = TTLCache(1024, 24 * 3600)
+
+def upload_hasher(upload_id, offset):
+    """offset'ten başlayan parça için hasher; önceki parçaların durumu bu süreçte yoksa None"""
+    if offset == 0:
+        return hashlib.sha256()
+    item = _upload_hashers.get(upload_id)
+    return item[1].copy() if item and item[0] == offset else None
+
+def save_upload_hasher(upload_id, received, hasher):
+    if hasher is not None:
+        _upload_hashers.set(upload_id, (received, hasher))
+
+def finish_upload_hash(upload_id, path):
+    """Tamamlanan yüklemenin sha256'sı; parçalarda tutulan durumdan devam eder"""
+    item = _upload_hashers.get(upload_id)
+    if item is None:
+        return file_sha256(path)
+    return file_sha256(path, hasher=item[1].copy(), start=item[0])
+
+def discard_upload_hasher(upload_id):
+    _upload_hashers.pop(upload_id)
+
+# ---- Quota ----
+def company_usage(company_id):
+    """Şirketin kullandığı alan: kayıtlı belgeler + açık yükleme oturumlarının rezervi"""
+    used = db.session.query(func.coalesce(func.sum(Document.file_size), 0))\
+        .filter(Document.company_id == company_id).scalar()
+    reserved = db.session.query(func.coalesce(func.sum(UploadSession.total_size), 0))\
+        .filter(UploadSession.company_id == company_id).scalar()
+    return int(used) + int(reserved)
+
+def remaining_quota(company_id):
+    """Kalan kota (byte); sınırsızsa None"""
+    quota = db.session.query(Company.storage_quota).filter_by(id=company_id).scalar()
+    if quota is None:
+        quota = current_app.config.get('COMPANY_STORAGE_QUOTA') or 0
+    if not quota:
+        return None
+    return max(0, quota - company_usage(company_id))
+
+def upload_limit(company_id, declared_size=None):
+    """Bu yükleme için yazılabilecek en fazla byte; bildirilen boyut sınırı aşıyorsa diske dokunmadan reddet"""
+    quota = remaining_quota(company_id)
+    limits = [l for l in (current_app.config.get('UPLOAD_MAX_FILE_SIZE') or None, quota) if l is not None]
+    limit = min(limits) if limits else None
+    if declared_size is not None and limit is not None and declared_size > limit:
+        if quota is not None and declared_size > quota:
+            raise QuotaExceeded('Depolama kotası aşıldı')
+        raise FileTooLarge('Dosya boyutu sınırı aşıldı')
+    return limit
+
+# ---- Content-addressed blob store ----
+def blob_key(sha):
+    """sha256 -> 'ab/cd/abcd...' (dizin başına dosya sayısını sınırlı tutmak için iki seviye)"""
+    return f"{sha[:2]}/{sha[2:4]}/{sha}"
+
+def blob_path(sha):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'blobs', *blob_key(sha).split('/'))
+
+def new_temp_path():
+    """Hash'i henüz bilinmeyen akış için geçici yol (blob ile aynı dosya sisteminde)"""
+    tmp_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], '.tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, str(uuid.uuid4()))
+
+# PostgreSQL advisory lock ad alanı (iki anahtarlı biçim; tek anahtarlı kilitlerle çakışmaz)
+BLOB_LOCK_NS = 4004
+
+def lock_blobs(hashes, wait=True):
+    """Blob'ları transaction sonuna kadar kilitle; aynı içeriğin yazılması ile silinmesi serileşir.
+
+    PostgreSQL: hash başına advisory lock (wait=False ise alınamayanlar atlanır).
+    SQLite: boş bir UPDATE veritabanı yazma kilidini alır (tek yazar; hepsi kilitlenir).
+    Dönüş: kilitlenen hash'ler
+    """
+    hashes = sorted(set(hashes))
+    if not hashes:
+        return set()
+    if db.session.get_bind().dialect.name == 'postgresql':
+        fn = 'pg_advisory_xact_lock' if wait else 'pg_try_advisory_xact_lock'
+        locked = set()
+        for sha in hashes:
+            got = db.session.execute(text(f"SELECT {fn}(:ns, :key)"),
+                                     {'ns': BLOB_LOCK_NS, 'key': int(sha[:7], 16)}).scalar()
+            if wait or got:
+                locked.add(sha)
+        return locked
+    FileBlob.query.filter(FileBlob.content_hash.in_(hashes))\
+        .update({'ref_count': FileBlob.ref_count}, synchronize_session=False)
+    return set(hashes)
+
+def put_blob(temp_path, sha, size):
+    """Geçici dosyayı blob deposuna taşı ve referansı artır (commit çağırana ait).
+
+    Dosya zaten varsa dokunulmaz; yoksa geçici dosyaya sabit bağlantı (aynı dosya sistemi) olarak
+    oluşturulur. Geçici dosya her durumda yerinde kalır: çağıran onu commit'ten sonra siler, hata
+    olursa aynı geçici dosyayla yeniden denenebilir. Dosya, blob kilitlenip referans yazıldıktan
+    sonra yerine konur; kilit commit'e kadar tutulduğundan eşzamanlı bir unlink dosyayı bu
+    yüklemenin altından silemez.
+    Dönüş: (path, created) - created, dosya bu çağrıda oluştuysa True
+    """
+    lock_blobs([sha])
+    n = FileBlob.query.filter_by(content_hash=sha)\
+        .update({'ref_count': FileBlob.ref_count + 1}, synchronize_session=False)
+    if not n:
+        try:
+            with db.session.begin_nested():
+                db.session.add(FileBlob(content_hash=sha, size=size, ref_count=1))
+        except IntegrityError:
+            # Aynı dosya eşzamanlı yüklendi
+            FileBlob.query.filter_by(content_hash=sha)\
+                .update({'ref_count': FileBlob.ref_count + 1}, synchronize_session=False)
+
+    path = blob_path(sha)
+    if os.path.exists(path):
+        return path, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.link(temp_path, path)
+    except FileExistsError:
+        return path, False
+    except OSError:
+        # Sabit bağlantı desteklenmiyor: kopyala
+        shutil.copyfile(temp_path, path + '.part')
+        os.replace(path + '.part', path)
+    return path, True
+
+def release_blob(sha):
+    """Referansı azalt; son referanssa kaydı sil. Dönüş: silinmesi gereken dosya yolu ya da None.
+
+    Dosya, DB commit edildikten sonra çağıran tarafından silinmeli.
+    """
+    paths = release_blobs({sha: 1})
+    return paths[0] if paths else None
+
+def release_blobs(counts):
+    """Birden çok blob'un referansını azalt ({sha: belge sayısı}); aynı sayıdakiler tek UPDATE.
+
+    Dönüş: referansı kalmayan, commit sonrası silinmesi gereken dosya yolları.
+    """
+    by_count = defaultdict(list)
+    for sha, n in counts.items():
+        by_count[n].append(sha)
+    for n, hashes in by_count.items():
+        FileBlob.query.filter(FileBlob.content_hash.in_(hashes), FileBlob.ref_count > 0)\
+            .update({'ref_count': FileBlob.ref_count - n}, synchronize_session=False)
+    dead = [sha for (sha,) in db.session.query(FileBlob.content_hash)
+            .filter(FileBlob.content_hash.in_(list(counts)), FileBlob.ref_count <= 0)]
+    if dead:
+        FileBlob.query.filter(FileBlob.content_hash.in_(dead), FileBlob.ref_count <= 0)\
+            .delete(synchronize_session=False)
+    return [blob_path(sha) for sha in dead]
+
+# ---- Deferred unlink ----
+def _remove(path):
+    try:
+        if os.path.exists(path): os.remove(path)
+    except OSError as e:
+        logger.warning(f"File delete warn: {e}")
+
+def unlink_blobs(paths):
+    """Dosyaları sil; blob yolları kilit altında file_blobs'ta yeniden aranır, referansı olanlar kalır.
+
+    Silme ile unlink arasında aynı içerik yeniden yüklenmiş (ya da yüklemesi henüz commit
+    edilmemiş) olabilir; put_blob aynı kilidi commit'e kadar tuttuğu için ikisi serileşir.
+    Kilitler beklemeden toplu alınır; alınamayanlar (yükleme sürüyor) tek tek beklenerek işlenir,
+    böylece birden çok kilit tutarken beklenmez. Kendi transaction'larını commit eder.
+    """
+    blob_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'blobs') + os.sep
+    blobs = {}
+    for path in paths:
+        if path.startswith(blob_dir):
+            blobs[os.path.basename(path)] = path
+        else:
+            _remove(path)  # eski (hash'siz) kayıtların dosyası paylaşılmaz
+    try:
+        locked = lock_blobs(blobs, wait=False)
+        for i, group in enumerate([locked] + [{sha} for sha in sorted(set(blobs) - locked)]):
+            if i:
+                lock_blobs(group)
+            if group:
+                alive = {sha for (sha,) in db.session.query(FileBlob.content_hash)
+                         .filter(FileBlob.content_hash.in_(list(group)))}
+                for sha in group - alive:
+                    _remove(blobs[sha])
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+class BlobUnlinker:
+    """Silinen belgelerin dosyalarını commit sonrasında arka plan thread'inde kaldırır (unlink_blobs)"""
+    def __init__(self, app, batch_size=500):
+        self.app = app
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='blob-unlinker', daemon=True)
+        self._thread.start()
+        atexit.register(self.drain)
+
+    def submit(self, paths):
+        for path in paths:
+            self._queue.put(path)
+
+    def _take(self, block=True):
+        paths = [self._queue.get(block=block)]
+        while len(paths) < self.batch_size:
+            try:
+                paths.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return paths
+
+    def _unlink(self, paths):
+        with self.app.app_context():
+            try:
+                unlink_blobs(paths)
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        while True:
+            paths = self._take()
+            try:
+                self._unlink(paths)
+            except Exception:
+                logger.exception("Blob unlink error")
+
+    def drain(self):
+        """Kuyrukta kalanları senkron sil (süreç kapanırken)"""
+        while True:
+            try:
+                paths = self._take(block=False)
+            except queue.Empty:
+                return
+            try:
+                self._unlink(paths)
+            except Exception:
+                logger.exception("Blob unlink error")
+
+_unlinker_lock = threading.Lock()
+
+def unlink_later(paths):
+    """Dosyaları commit sonrasında sil; BLOB_UNLINK_ASYNC kapalıysa hemen (aynı yeniden denetimle)"""
+    paths = [p for p in paths if p]
+    if not paths:
+        return
+    app = current_app._get_current_object()
+    if not app.config.get('BLOB_UNLINK_ASYNC', True):
+        try:
+            unlink_blobs(paths)
+        except Exception:
+            logger.exception("Blob unlink error")
+        return
+    with _unlinker_lock:
+        unlinker = app.extensions.get('blob_unlinker')
+        if unlinker is None:
+            unlinker = app.extensions['blob_unlinker'] = BlobUnlinker(app)
+    unlinker.submit(paths)
@@ -0,0 +1,331 @@
+import glob, json, os, threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: yalnızca süreç içi kilit
+    fcntl = None
+
+# Şirket başına diskteki ANN indeksi.
+#
+# IVF-Flat: vektörler k-means merkezlerine göre listelere ayrılır ve liste sırasıyla
+# tek bir (mmap'lenen) dizide tutulur; sorguda yalnızca en yakın nprobe liste taranır.
+# Yeni vektörler küçük bir "delta" dizisine eklenir ve düz taranır; delta dolunca ana
+# diziyle birleştirilir. Silinenler birleştirmeye kadar mezar taşı (tombstone) listesinde
+# bekler. Her yazım yeni bir nesil dosyası ve atomik manifest değişimi olarak yapılır;
+# böylece diğer süreçler tutarlı bir anlık görüntü okur. Yazımlar (web süreçlerinden silme,
+# indeksleyiciden ekleme) dizindeki kilit dosyası üzerinden süreçler arası sıraya girer.
+
+class IVFIndex:
+    """Tek şirketin vektör indeksi (iç çarpım; vektörler normalize)"""
+    def __init__(self, path, dim, nprobe=8, delta_limit=50000, train_min=2048):
+        self.path = path
+        self.dim = dim
+        self.nprobe = nprobe
+        self.delta_limit = delta_limit
+        self.train_min = train_min
+        self.lock = threading.RLock()
+        self._mtime = None
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    # ---- persistence ----
+    def _file(self, kind, gen):
+        return os.path.join(self.path, f'{kind}-{gen}.npy')
+
+    def _manifest_path(self):
+        return os.path.join(self.path, 'manifest.json')
+
+    @contextmanager
+    def _writing(self):
+        """Yeniden yükle -> yaz -> manifest değişimi -> gc adımlarını tüm süreçlerde tek yazara indir"""
+        with self.lock:
+            if fcntl is None:
+                self._maybe_reload(strict=True)
+                yield
+                return
+            with open(os.path.join(self.path, '.lock'), 'a') as lf:
+                fcntl.flock(lf, fcntl.LOCK_EX)
+                try:
+                    self._maybe_reload(strict=True)
+                    yield
+                finally:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _load(self):
+        # Okuyucu kilit almaz; manifesti okuduktan sonra dosyası gc ile silinmiş bir nesle
+        # denk gelirse (arada iki yazım) güncel manifestle yeniden dener
+        for attempt in range(5):
+            try:
+                return self._load_once()
+            except FileNotFoundError:
+                if attempt == 4:
+                    raise
+
+    def _load_once(self):
+        mp = self._manifest_path()
+        if os.path.exists(mp):
+            with open(mp) as f:
+                m = json.load(f)
+            if m['dim'] != self.dim:
+                raise ValueError(f"İndeks boyutu uyuşmuyor: {m['dim']} != {self.dim}")
+            self._mtime = os.stat(mp).st_mtime_ns
+        else:
+            m = {'dim': self.dim, 'main_gen': 0, 'delta_gen': 0, 'trained_size': 0}
+            self._mtime = None
+        self.manifest = m
+        g, h = m['main_gen'], m['delta_gen']
+        if g:
+            self.main_vecs = np.load(self._file('main.vecs', g), mmap_mode='r')
+            self.main_ids = np.load(self._file('main.ids', g), mmap_mode='r')
+            self.offsets = np.load(self._file('main.offsets', g))
+            cpath = self._file('main.centroids', g)
+            self.centroids = np.load(cpath) if os.path.exists(cpath) else None
+        else:
+            self.main_vecs = np.zeros((0, self.dim), dtype=np.float32)
+            self.main_ids = np.zeros(0, dtype=np.int64)
+            self.offsets, self.centroids = None, None
+        if h:
+            self.delta_vecs = np.load(self._file('delta.vecs', h))
+            self.delta_ids = np.load(self._file('delta.ids', h))
+            self.deleted = np.load(self._file('deleted', h))
+        else:
+            self.delta_vecs = np.zeros((0, self.dim), dtype=np.float32)
+            self.delta_ids = np.zeros(0, dtype=np.int64)
+            self.deleted = np.zeros(0, dtype=np.int64)
+
+    def _maybe_reload(self, strict=False):
+        """Başka bir süreç indeksi güncellediyse yeniden yükle.
+
+        strict: mtime çözünürlüğüne güvenmeden manifestteki nesilleri karşılaştır (yazım öncesi)
+        """
+        try:
+            mtime = os.stat(self._manifest_path()).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self._load()
+        elif strict:
+            with open(self._manifest_path()) as f:
+                m = json.load(f)
+            if (m['main_gen'], m['delta_gen']) != (self.manifest['main_gen'], self.manifest['delta_gen']):
+                self._load()
+
+    def _write_manifest(self, **changes):
+        m = {**self.manifest, **changes}
+        tmp = self._manifest_path() + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(m, f)
+        os.replace(tmp, self._manifest_path())
+        self.manifest = m
+        self._mtime = os.stat(self._manifest_path()).st_mtime_ns
+        self._gc()
+
+    def _gc(self):
+        """Eski nesil dosyalarını sil; eski manifesti okumakta olan süreçler için bir önceki nesil tutulur"""
+        for f in glob.glob(os.path.join(self.path, '*.npy')):
+            kind, _, gen = os.path.basename(f)[:-4].rpartition('-')
+            current = self.manifest['main_gen'] if kind.startswith('main') else self.manifest['delta_gen']
+            if int(gen) < current - 1:
+                try: os.remove(f)
+                except OSError: pass
+
+    def _save_delta(self):
+        h = self.manifest['delta_gen'] + 1
+        np.save(self._file('delta.vecs', h), self.delta_vecs)
+        np.save(self._file('delta.ids', h), self.delta_ids)
+        np.save(self._file('deleted', h), self.deleted)
+        self._write_manifest(delta_gen=h)
+
+    # ---- writes ----
+    def add(self, ids, vecs):
+        ids = np.asarray(ids, dtype=np.int64)
+        vecs = np.asarray(vecs, dtype=np.float32).reshape(-1, self.dim)
+        if not len(ids):
+            return
+        with self._writing():
+            # Zaten indeksteki id'ler atlanır (parça içeriği değişmez); yeniden deneme çift kayıt üretmez.
+            # Silinmiş bir id yeniden eklenirse delta'ya girer; ana dizideki eski vektörünün mezar
+            # taşı birleştirmeye kadar kalır (search mezar taşlarını yalnızca ana diziye uygular)
+            present = np.isin(ids, self.delta_ids) | (np.isin(ids, self.main_ids) & ~np.isin(ids, self.deleted))
+            if present.all():
+                return
+            ids, vecs = ids[~present], vecs[~present]
+            self.delta_vecs = np.concatenate([self.delta_vecs, vecs])
+            self.delta_ids = np.concatenate([self.delta_ids, ids])
+            if len(self.delta_ids) > self.delta_limit:
+                self._merge()
+            else:
+                self._save_delta()
+
+    def remove(self, ids):
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not len(ids):
+            return
+        with self._writing():
+            in_delta = np.isin(self.delta_ids, ids)
+            fresh = ids[np.isin(ids, self.main_ids) & ~np.isin(ids, self.deleted)]
+            if not in_delta.any() and not len(fresh):
+                return  # zaten silinmiş (ör. değişiklik günlüğünden tekrar); yeni nesil yazma
+            if in_delta.any():
+                self.delta_vecs = self.delta_vecs[~in_delta]
+                self.delta_ids = self.delta_ids[~in_delta]
+            self.deleted = np.union1d(self.deleted, fresh)
+            if len(self.deleted) > 0.2 * max(len(self.main_ids), 1) and len(self.deleted) > 1000:
+                self._merge()
+            else:
+                self._save_delta()
+
+    def _merge(self):
+        """Delta'yı ana diziye kat, silinenleri at; gerekirse k-means'i yeniden eğit"""
+        keep = ~np.isin(self.main_ids, self.deleted) if len(self.deleted) else slice(None)
+        main_vecs, main_ids = np.asarray(self.main_vecs[keep]), np.asarray(self.main_ids[keep])
+        if self.centroids is not None:
+            main_assign = np.repeat(np.arange(len(self.centroids)), np.diff(self.offsets))[keep]
+        vecs = np.concatenate([main_vecs, self.delta_vecs])
+        ids = np.concatenate([main_ids, self.delta_ids])
+        total = len(ids)
+
+        centroids, trained_size = self.centroids, self.manifest.get('trained_size', 0)
+        retrain = total >= self.train_min and (centroids is None or total > 4 * trained_size)
+        if retrain:
+            centroids = kmeans(vecs, max(1, int(np.sqrt(total))))
+            trained_size = total
+            assign = assign_lists(vecs, centroids)
+        elif centroids is not None:
+            assign = np.concatenate([main_assign, assign_lists(self.delta_vecs, centroids)])
+        else:
+            assign = np.zeros(total, dtype=np.int64)
+
+        g = self.manifest['main_gen'] + 1
+        order = np.argsort(assign, kind='stable')
+        np.save(self._file('main.vecs', g), vecs[order])
+        np.save(self._file('main.ids', g), ids[order])
+        if centroids is not None:
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+            np.save(self._file('main.offsets', g), offsets)
+            np.save(self._file('main.centroids', g), centroids)
+        else:
+            np.save(self._file('main.offsets', g), np.array([0, total]))
+
+        self.delta_vecs = np.zeros((0, self.dim), dtype=np.float32)
+        self.delta_ids = np.zeros(0, dtype=np.int64)
+        self.deleted = np.zeros(0, dtype=np.int64)
+        h = self.manifest['delta_gen'] + 1
+        np.save(self._file('delta.vecs', h), self.delta_vecs)
+        np.save(self._file('delta.ids', h), self.delta_ids)
+        np.save(self._file('deleted', h), self.deleted)
+        self._write_manifest(main_gen=g, delta_gen=h, trained_size=trained_size)
+        self._load()
+
+    # ---- reads ----
+    def search(self, query, k=10):
+        """En yakın k vektör: [(id, skor), ...] (skor büyük = daha benzer)"""
+        q = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        with self.lock:
+            self._maybe_reload()
+            main_vecs, main_ids, offsets, centroids = self.main_vecs, self.main_ids, self.offsets, self.centroids
+            delta_vecs, delta_ids, deleted = self.delta_vecs, self.delta_ids, self.deleted
+
+        parts_ids, parts_scores = [], []
+        if len(main_ids):
+            if centroids is not None:
+                nprobe = min(self.nprobe, len(centroids))
+                probe = np.argpartition(centroids @ q, -nprobe)[-nprobe:]
+                for p in probe:
+                    a, b = offsets[p], offsets[p + 1]
+                    if b > a:
+                        parts_scores.append(main_vecs[a:b] @ q); parts_ids.append(main_ids[a:b])
+            else:
+                parts_scores.append(main_vecs @ q); parts_ids.append(main_ids)
+        if parts_ids and len(deleted):
+            # Mezar taşları yalnızca ana dizidekileri gizler; silinip yeniden eklenen (SQLite rowid'i
+            # yeniden kullanılabilir) id'nin güncel vektörü delta'dadır ve görünür kalır
+            ids = np.concatenate(parts_ids); alive = ~np.isin(ids, deleted)
+            parts_ids, parts_scores = [ids[alive]], [np.concatenate(parts_scores)[alive]]
+        if len(delta_ids):
+            parts_scores.append(delta_vecs @ q); parts_ids.append(delta_ids)
+        if not parts_ids:
+            return []
+
+        ids = np.concatenate(parts_ids); scores = np.concatenate(parts_scores)
+        if len(ids) > k:
+            top = np.argpartition(scores, -k)[-k:]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores)
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    def __len__(self):
+        return len(self.main_ids) + len(self.delta_ids) - len(self.deleted)
+
+class ChromaIndex:
+    """chromadb (HNSW) tabanlı alternatif; VECTOR_BACKEND=chroma"""
+    def __init__(self, path, dim):
+        import chromadb
+        self.dim = dim
+        self.client = chromadb.PersistentClient(path=path)
+        self.col = self.client.get_or_create_collection('chunks', metadata={'hnsw:space': 'ip'})
+
+    def add(self, ids, vecs):
+        if len(ids):
+            self.col.add(ids=[str(i) for i in ids], embeddings=np.asarray(vecs).tolist())
+
+    def remove(self, ids):
+        ids = [str(i) for i in ids]
+        if ids:
+            self.col.delete(ids=ids)
+
+    def search(self, query, k=10):
+        n = min(k, self.col.count())
+        if not n:
+            return []
+        r = self.col.query(query_embeddings=[np.asarray(query).tolist()], n_results=n)
+        return [(int(i), 1.0 - d) for i, d in zip(r['ids'][0], r['distances'][0])]
+
+    def __len__(self):
+        return self.col.count()
+
+# ---- k-means ----
+def assign_lists(vecs, centroids, batch=8192):
+    out = np.empty(len(vecs), dtype=np.int64)
+    for i in range(0, len(vecs), batch):
+        out[i:i + batch] = np.argmax(vecs[i:i + batch] @ centroids.T, axis=1)
+    return out
+
+def kmeans(vecs, nlist, iters=10, sample=None, seed=0):
+    """Küresel k-means (kosinüs); merkezler örneklem üzerinde eğitilir"""
+    rng = np.random.default_rng(seed)
+    sample = sample or min(len(vecs), nlist * 40)
+    x = vecs[rng.choice(len(vecs), sample, replace=False)] if sample < len(vecs) else np.asarray(vecs)
+    c = x[rng.choice(len(x), nlist, replace=False)].copy()
+    for _ in range(iters):
+        a = assign_lists(x, c)
+        sums = np.zeros_like(c)
+        np.add.at(sums, a, x)
+        counts = np.bincount(a, minlength=nlist)
+        empty = counts == 0
+        sums[empty] = x[rng.choice(len(x), int(empty.sum()))]  # boş kalan merkezleri yeniden tohumla
+        norms = np.linalg.norm(sums, axis=1, keepdims=True); norms[norms == 0] = 1.0
+        c = (sums / norms).astype(np.float32)
+    return c
+
+# ---- registry ----
+_indexes = {}
+_lock = threading.Lock()
+
+def get_index(config, embedder, company_id):
+    """Şirketin indeksini döndür (süreç içinde önbellekli)"""
+    root = os.path.join(config['VECTOR_INDEX_FOLDER'], embedder.name, f'company_{company_id}')
+    backend = config.get('VECTOR_BACKEND', 'ivf')
+    key = (backend, root)
+    with _lock:
+        if key not in _indexes:
+            if backend == 'chroma':
+                _indexes[key] = ChromaIndex(root, embedder.dim)
+            else:
+                _indexes[key] = IVFIndex(root, embedder.dim,
+                                         nprobe=config.get('VECTOR_NPROBE', 8),
+                                         delta_limit=config.get('VECTOR_DELTA_LIMIT', 50000))
+        return _indexes[key]
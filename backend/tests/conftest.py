@@ -0,0 +1,46 @@
+import io, os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, create_tables
+from models.database import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app('testing',
+                     SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+                     UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+                     VECTOR_INDEX_FOLDER=str(tmp_path / 'vectors'),
+                     PROFILE_DIR=str(tmp_path / 'profiles'),
+                     BLOB_UNLINK_ASYNC=False, CHAT_SUMMARY_ASYNC=False)
+    create_tables(app)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth(client):
+    """Demo kullanıcının Authorization başlığı"""
+    r = client.post('/api/auth/login', json={'email': 'admin@demo.com', 'password': '123456'})
+    return {'Authorization': 'Bearer ' + r.get_json()['token']}
+
+
+@pytest.fixture
+def upload(client, auth):
+    """upload(name, text) -> yüklenen belgenin dict'i"""
+    def _upload(name, text):
+        r = client.post('/api/documents/upload', headers=auth, content_type='multipart/form-data',
+                        data={'files': [(io.BytesIO(text.encode()), name)]})
+        assert r.status_code == 201, r.get_data(as_text=True)
+        return r.get_json()['files'][0]
+    return _upload
@@ -0,0 +1,25 @@
+from app import create_app
+from models.database import db, Company, User
+
+
+def test_profile_change_in_another_process_is_seen(app, client, auth):
+    app.config['VERSION_CACHE_TTL'] = 0
+    assert client.get('/api/auth/me', headers=auth).get_json()['user']['full_name'] != 'Yeni Ad'
+    # Aynı veritabanına bağlı ikinci uygulama başka bir worker süreci yerine geçer
+    other = create_app('testing', SQLALCHEMY_DATABASE_URI=app.config['SQLALCHEMY_DATABASE_URI'],
+                       UPLOAD_FOLDER=app.config['UPLOAD_FOLDER'], BLOB_UNLINK_ASYNC=False)
+    with other.app_context():
+        user = User.query.filter_by(email='admin@demo.com').first()
+        user.full_name = 'Yeni Ad'
+        db.session.commit()
+        db.session.remove()
+    assert client.get('/api/auth/me', headers=auth).get_json()['user']['full_name'] == 'Yeni Ad'
+
+
+def test_login_does_not_bump_company_data_version(app, client, auth):
+    with app.app_context():
+        version = db.session.get(Company, 1).data_version
+    client.post('/api/auth/login', json={'email': 'admin@demo.com', 'password': '123456'})
+    with app.app_context():
+        assert db.session.get(Company, 1).data_version == version
+        assert User.query.filter_by(email='admin@demo.com').first().last_login is not None
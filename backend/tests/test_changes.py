@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from models.database import db, DocumentChange
+from services import changes
+
+
+def _add(seq, company_id=1, age=0):
+    db.session.add(DocumentChange(seq=seq, company_id=company_id, document_id=seq, op=changes.CREATED,
+                                  created_at=datetime.utcnow() - timedelta(seconds=age)))
+    db.session.commit()
+
+
+def test_gap_from_rolled_back_writer_is_skipped_immediately(app):
+    with app.app_context():
+        for seq in (1, 2, 4):
+            _add(seq)
+        rows, next_after = changes.read_changes(0, 10)
+        assert [c.seq for c in rows] == [1, 2, 4] and next_after == 4
+        # Yeni kayıtlar boşluğun arkasından devam eder; okunmuş kayıt tekrar gelmez
+        _add(5)
+        rows, next_after = changes.read_changes(next_after, 10)
+        assert [c.seq for c in rows] == [5] and next_after == 5
+
+
+def test_company_filter_advances_past_other_companies(app):
+    with app.app_context():
+        for seq in (1, 2, 3):
+            _add(seq, company_id=2)
+        _add(4, company_id=1)
+        rows, next_after = changes.read_changes(0, 10, company_id=1)
+        assert [c.seq for c in rows] == [4] and next_after == 4
+        rows, next_after = changes.read_changes(0, 2, company_id=2)
+        assert [c.seq for c in rows] == [1, 2] and next_after == 2
+        rows, next_after = changes.read_changes(2, 2, company_id=2)
+        assert [c.seq for c in rows] == [3] and next_after == 4
+
+
+def test_consumer_offset_survives_upload_and_delete(app, client, auth, upload):
+    doc = upload('a.txt', 'bir iki üç')
+    resp = client.delete(f"/api/documents/delete/{doc['id']}", headers=auth)
+    assert resp.status_code == 200, resp.get_json()
+    with app.app_context():
+        seen = []
+        assert changes.consume('test', seen.extend) >= 2
+        ops = [(c['document_id'], c['op']) for c in seen]
+        assert (doc['id'], changes.CREATED) in ops and (doc['id'], changes.DELETED) in ops
+        assert changes.get_offset('test') == changes.latest_seq()
+        assert changes.consume('test', seen.extend) == 0
+
+
+def test_http_feed_reports_more_past_the_scan_horizon(app, client, auth):
+    app.config['CHANGE_FEED_SCAN'] = 2
+    with app.app_context():
+        for seq in (1, 2, 3, 4):
+            _add(seq, company_id=2)
+        _add(5, company_id=1)
+    data = client.get('/api/documents/changes?after=0&limit=1', headers=auth).get_json()
+    assert data['changes'] == [] and data['has_more'] and data['next_after'] == 2
+    seen = []
+    while data['has_more']:
+        data = client.get(f"/api/documents/changes?after={data['next_after']}&limit=1", headers=auth).get_json()
+        seen += [c['seq'] for c in data['changes']]
+    assert seen == [5] and data['next_after'] == 5
+
+
+def test_log_rows_are_written_at_commit_and_dropped_on_rollback(app):
+    with app.app_context():
+        changes.record(1, [10], changes.CREATED)
+        assert DocumentChange.query.count() == 0  # küresel sıra ancak commit anında alınır
+        db.session.rollback()
+        db.session.commit()
+        assert DocumentChange.query.count() == 0
+        changes.record(1, [11, 12], changes.CONTENT)
+        db.session.commit()
+        assert [(c.document_id, c.op) for c in DocumentChange.query.order_by(DocumentChange.seq)] == \
+            [(11, changes.CONTENT), (12, changes.CONTENT)]
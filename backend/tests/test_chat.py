@@ -0,0 +1,29 @@
+import threading
+
+from models.database import db, ChatSession
+from services.llm import StubLLM
+
+
+def test_summary_runs_after_the_stream_closes(app, client, auth, upload, monkeypatch):
+    upload('kira.txt', 'Kira sözleşmesi yıllık olarak yenilenir.')
+    app.config.update(CHAT_SUMMARY_ASYNC=True, CHAT_HISTORY_TURNS=1, CHAT_SUMMARY_BATCH=1)
+    release, started = threading.Event(), threading.Event()
+    original = StubLLM.summarize
+
+    def slow_summarize(self, *args):
+        started.set()
+        assert release.wait(10)
+        return original(self, *args)
+    monkeypatch.setattr(StubLLM, 'summarize', slow_summarize)
+
+    session_id = client.post('/api/chat/message', headers=auth,
+                             json={'message': 'kira ne zaman yenilenir?'}).get_json()['session_id']
+    r = client.post('/api/chat/message', headers={**auth, 'Accept': 'text/event-stream'},
+                    json={'message': 'depozito?', 'session_id': session_id})
+    body = r.get_data(as_text=True)  # özet beklenmeden akış biter
+    assert 'event: done' in body and started.wait(10)
+    release.set()
+    app.extensions['chat_compactor'].pool.shutdown(wait=True)
+    with app.app_context():
+        session = db.session.get(ChatSession, session_id)
+        assert session.summary and 'kira ne zaman yenilenir?' in session.summary
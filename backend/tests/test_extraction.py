@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from models.database import db, DocumentContent, Document
+from services import extraction, jobs
+
+
+def _lines(tmp_path, n, width=20):
+    path = tmp_path / 'doc.txt'
+    path.write_text('\n'.join(f"{i:05d} " + 'x' * width for i in range(n)))
+    return str(path)
+
+
+def test_stream_unit_spools_pages_and_iteration_removes_spool(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction, 'EXTRACT_ROWS_PER_PAGE', 10)
+    path = _lines(tmp_path, 35)
+    units = extraction.plan_units(path, 'txt')
+    result = extraction.extract_unit(units[0])
+    assert isinstance(result, extraction.SpooledPages) and result.count == 4
+    pages = list(extraction.iter_pages(units, {units[0].seq: result}))
+    assert [n for n, _, _ in pages] == [1, 2, 3, 4]
+    assert pages[0][1].startswith('00000') and not os.path.exists(result.path)
+
+
+def test_pdf_page_cache_is_flushed(tmp_path, monkeypatch):
+    class Page:
+        flushed = False
+        def flush_cache(self):
+            self.flushed = True
+    path = _lines(tmp_path, 1)
+    pages = [Page(), Page()]
+    monkeypatch.setattr(extraction, '_open_pdf',
+                        {'key': (path, os.path.getmtime(path)), 'pdf': type('P', (), {'pages': pages})()})
+    monkeypatch.setattr(extraction, '_page_text', lambda page, path, index: 'metin')
+    assert extraction._pdf_page_text(path, 1) == 'metin'
+    assert pages[1].flushed and not pages[0].flushed
+
+
+def test_pages_are_written_in_batches_and_capped_per_document(app, upload, monkeypatch):
+    monkeypatch.setattr(extraction, 'EXTRACT_ROWS_PER_PAGE', 10)
+    app.config['EXTRACTION_WRITE_BATCH'] = 2
+    doc = upload('kisa.txt', '\n'.join(f"satır {i}" for i in range(45)))
+    with app.app_context():
+        assert DocumentContent.query.filter_by(document_id=doc['id']).count() == 5
+        assert not db.session.get(Document, doc['id']).content_truncated
+
+    monkeypatch.setattr(jobs, 'EXTRACT_MAX_CHARS', 500)
+    doc = upload('uzun.txt', '\n'.join(f"uzun satır {i}" for i in range(400)))
+    with app.app_context():
+        pages = (DocumentContent.query.filter_by(document_id=doc['id'])
+                 .order_by(DocumentContent.page_number).all())
+        assert sum(len(p.content) for p in pages) <= 500 + len(extraction.TRUNCATED_NOTE) + 1
+        assert pages[-1].content.endswith(extraction.TRUNCATED_NOTE)
+        assert db.session.get(Document, doc['id']).content_truncated
+
+
+def test_failed_extraction_removes_spooled_pages(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    path = _lines(tmp_path, 5)
+    units = extraction.plan_units(path, 'txt')
+    failing = extraction.Unit(units[0].seq + 1, 1, 'pdf', path, 'pdf', (0,))
+    monkeypatch.setattr(extraction, 'plan_units', lambda path, ext: [units[0], failing])
+    spooled = []
+    original = extraction.extract_unit
+
+    def extract(unit):
+        if unit is failing:
+            raise RuntimeError('bozuk sayfa')
+        result = original(unit)
+        spooled.append(result.path)
+        return result
+    monkeypatch.setattr(extraction, 'extract_unit', extract)
+    for executor in (None, ThreadPoolExecutor(2)):
+        with pytest.raises(RuntimeError):
+            extraction.extract_pages(path, 'txt', executor)
+    assert len(spooled) == 2 and not any(os.path.exists(p) for p in spooled)
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from models.database import db, Document, DocumentChunk
+from services import indexing
+from services.vector_index import IVFIndex
+
+
+def _indexed_ids(company_id=1):
+    index = indexing.company_index(company_id)
+    ids = set(index.delta_ids.tolist()) | set(index.main_ids.tolist())
+    return ids - set(index.deleted.tolist())
+
+
+def test_crash_before_vector_write_leaves_document_pending(app, upload, monkeypatch):
+    def boom(self, ids, vecs):
+        raise RuntimeError('indeksleyici çöktü')
+    monkeypatch.setattr(IVFIndex, 'add', boom)
+    upload('a.txt', 'kira sözleşmesi ' * 50)
+    monkeypatch.undo()
+
+    with app.app_context():
+        doc = Document.query.one()
+        assert doc.is_processed and not doc.is_indexed
+        # Sahiplik süresi dolana kadar başka indeksleyici almaz
+        assert indexing.index_pending() == 0
+        doc.index_claimed_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+        assert indexing.index_pending() == 1
+        chunk_ids = {c for (c,) in db.session.query(DocumentChunk.id)}
+        assert chunk_ids and _indexed_ids() == chunk_ids
+        assert db.session.get(Document, doc.id).is_indexed
+
+
+def test_claim_is_exclusive(app, upload, monkeypatch):
+    monkeypatch.setattr(indexing, 'index_pending', lambda limit=20: 0)  # yüklemede indeksleme yapılmasın
+    upload('a.txt', 'bir iki üç')
+    with app.app_context():
+        assert len(indexing.claim_pending(10)) == 1
+        assert indexing.claim_pending(10) == {}
+
+
+def test_content_change_during_indexing_keeps_document_pending(app, upload, monkeypatch):
+    from services import jobs
+    calls = []
+    original = indexing.claim_pending
+
+    def claim_then_reprocess(limit):
+        claimed = original(limit)
+        if claimed and not calls:
+            calls.append(1)
+            doc = db.session.get(Document, next(iter(claimed)))
+            jobs._write_pages(doc, [(1, 'yeni içerik', 'text')])
+            db.session.commit()
+        return claimed
+    monkeypatch.setattr(indexing, 'claim_pending', claim_then_reprocess)
+    upload('a.txt', 'eski içerik')
+    with app.app_context():
+        doc = Document.query.one()
+        # İlk tur eski içeriği işaretleyemedi; ikinci tur yeni içeriği indeksledi
+        assert doc.is_indexed
+        assert [c.content for c in DocumentChunk.query] == ['yeni içerik']
+        assert _indexed_ids() == {c.id for c in DocumentChunk.query}
@@ -0,0 +1,91 @@
+import os, time
+from datetime import datetime, timedelta
+
+from models.database import db, Document, ExtractionJob
+from services import jobs
+
+
+def _die(arg):
+    os._exit(1)  # işçi sürecinin OOM ile öldürülmesini taklit eder
+
+
+def _pending_job(app, tmp_path, name='a.txt', text='merhaba dünya'):
+    path = tmp_path / name
+    path.write_text(text)
+    with app.app_context():
+        doc = Document(filename=name, original_filename=name, file_path=str(path), file_type='txt',
+                       file_size=path.stat().st_size, company_id=1, uploaded_by=1)
+        db.session.add(doc); db.session.flush()
+        job = ExtractionJob(document_id=doc.id, company_id=1, status='pending')
+        db.session.add(job); db.session.commit()
+        return doc.id, job.id
+
+
+def _drain(runner, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        runner._reap(); runner._claim(); runner._dispatch()
+        db.session.expire_all()
+        if db.session.get(ExtractionJob, job_id).status in ('done', 'failed') and not runner._active:
+            return
+        time.sleep(0.05)
+    raise AssertionError('iş bitmedi')
+
+
+def test_worker_crash_requeues_job_and_rebuilds_pool(app, tmp_path, monkeypatch):
+    doc_id, job_id = _pending_job(app, tmp_path)
+    runner = jobs.LocalRunner(app)
+    runner.workers = 1
+    plan = jobs._plan
+    with app.app_context():
+        try:
+            monkeypatch.setattr(jobs, '_plan', _die)
+            runner._pool = jobs.ProcessPoolExecutor(max_workers=1)
+            broken_pool = runner._pool
+            runner._claim()
+            deadline = time.monotonic() + 30
+            while not all(f.done() for f in runner._inflight) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            runner._reap()
+
+            job = db.session.get(ExtractionJob, job_id)
+            assert job.status == 'pending' and job.attempts == 1
+            assert not runner._active and not runner._inflight
+            assert runner._pool is not broken_pool
+
+            monkeypatch.setattr(jobs, '_plan', plan)
+            _drain(runner, job_id)
+            assert db.session.get(ExtractionJob, job_id).status == 'done'
+            assert db.session.get(Document, doc_id).is_processed
+        finally:
+            runner._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def test_submit_failure_does_not_leave_job_running(app, tmp_path):
+    _, job_id = _pending_job(app, tmp_path)
+    runner = jobs.LocalRunner(app)
+
+    class Broken:
+        def submit(self, *a):
+            raise jobs.BrokenProcessPool('gone')
+
+        def shutdown(self, **kw):
+            pass
+
+    with app.app_context():
+        runner._pool = Broken()
+        runner._rebuild_pool = lambda: None  # yeni havuz da bozuk
+        runner._claim()
+        assert not runner._active
+        assert db.session.get(ExtractionJob, job_id).status == 'pending'
+
+
+def test_recover_stale_jobs_skips_own_active_jobs(app, tmp_path):
+    _, job_id = _pending_job(app, tmp_path)
+    with app.app_context():
+        ExtractionJob.query.filter_by(id=job_id).update(
+            {'status': 'running', 'started_at': datetime.utcnow() - timedelta(hours=1)})
+        db.session.commit()
+        assert jobs.recover_stale_jobs(60, exclude=[job_id]) == 0
+        assert jobs.recover_stale_jobs(60) == 1
+        assert db.session.get(ExtractionJob, job_id).status == 'pending'
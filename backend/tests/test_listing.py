@@ -0,0 +1,32 @@
+def test_list_etag_revalidates_until_documents_change(client, auth, upload):
+    upload('a.txt', 'bir')
+    r = client.get('/api/documents/list', headers=auth)
+    etag = r.headers['ETag']
+    assert r.status_code == 200 and r.get_json()['count'] == 1 and etag.startswith('W/')
+    r = client.get('/api/documents/list', headers={**auth, 'If-None-Match': etag})
+    assert r.status_code == 304 and not r.data
+    upload('b.txt', 'iki')
+    r = client.get('/api/documents/list', headers={**auth, 'If-None-Match': etag})
+    assert r.status_code == 200 and r.headers['ETag'] != etag and r.get_json()['count'] == 2
+
+
+def test_small_list_page_is_buffered_and_cached(app, client, auth, upload):
+    upload('a.txt', 'bir')
+    r = client.get('/api/documents/list', headers=auth)
+    assert r.headers.get('Content-Length')
+    cache = app.extensions['response_cache']
+    assert cache.get(f"resp:1:{r.headers['ETag'][3:-1]}") == r.data
+
+
+def test_list_page_over_cache_limit_is_streamed(app, client, auth, upload):
+    for i in range(3):
+        upload(f'belge-{i}.txt', 'metin')
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = 100
+    r = client.get('/api/documents/list?limit=2', headers={**auth, 'Accept-Encoding': 'gzip'})
+    data = r.get_json()
+    assert r.status_code == 200 and 'Content-Length' not in r.headers and 'Content-Encoding' not in r.headers
+    assert data['count'] == 2 and data['next_cursor']
+    cache = app.extensions['response_cache']
+    assert cache.get(f"resp:1:{r.headers['ETag'][3:-1]}") is None
+    rest = client.get(f"/api/documents/list?limit=2&cursor={data['next_cursor']}", headers=auth).get_json()
+    assert rest['count'] == 1 and rest['next_cursor'] is None
@@ -0,0 +1,56 @@
+import os
+
+from flask_migrate import upgrade, downgrade
+
+from app import create_app
+from models.database import db, Company, User, Document, DocumentContent, CompanyStats
+from services import search
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def _migrated_app(tmp_path):
+    return create_app('testing', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'migrated.db'}",
+                      UPLOAD_FOLDER=str(tmp_path / 'uploads'), VECTOR_INDEX_FOLDER=str(tmp_path / 'vectors'))
+
+
+def _document(file_size=1):
+    company = Company(name='Ş', email='s@example.com')
+    db.session.add(company); db.session.flush()
+    user = User(full_name='U', email='u@example.com', company_id=company.id)
+    user.set_password('x'); db.session.add(user); db.session.flush()
+    doc = Document(filename='a', original_filename='a.txt', file_path='/dev/null', file_type='txt',
+                   file_size=file_size, company_id=company.id, uploaded_by=user.id)
+    db.session.add(doc); db.session.flush()
+    return company, doc
+
+
+def test_upgrade_alone_builds_searchable_schema(tmp_path):
+    app = _migrated_app(tmp_path)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)  # create_tables / init-db olmadan
+        company, doc = _document()
+        db.session.add(DocumentContent(document_id=doc.id, content='kira sözleşmesi ekleri', page_number=1))
+        db.session.commit()
+        assert [r['document_id'] for r in search.search(company.id, 'sözleşmesi')] == [doc.id]
+
+        downgrade(directory=MIGRATIONS, revision='0008')
+        downgrade(directory=MIGRATIONS, revision='0007')
+        upgrade(directory=MIGRATIONS)  # mevcut içerik yeniden indekslenir
+        assert [r['document_id'] for r in search.search(company.id, 'sözleşmesi')] == [doc.id]
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_upgrade_backfills_company_stats(tmp_path):
+    app = _migrated_app(tmp_path)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        company_id = _document(file_size=42)[0].id  # sayaçsız belge (bump yok)
+        db.session.commit(); db.session.remove()
+        downgrade(directory=MIGRATIONS, revision='0008')
+        upgrade(directory=MIGRATIONS)
+        row = CompanyStats.query.filter_by(company_id=company_id).one()
+        assert (row.file_type, row.total, row.processed, row.bytes) == ('txt', 1, 0, 42)
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,48 @@
+import os, subprocess, sys, textwrap, threading, time
+
+from services.metrics import SlowRequestProfiler
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _slow_handler(profiler, seconds):
+    profiler.begin()
+    time.sleep(seconds)
+    return profiler.end('/api/slow', seconds)
+
+
+def test_profiler_samples_request_threads(tmp_path):
+    profiler = SlowRequestProfiler(100, 5, str(tmp_path))
+    paths = []
+    t = threading.Thread(target=lambda: paths.append(_slow_handler(profiler, 0.3)))
+    t.start(); t.join()
+    assert paths[0] and '_slow_handler' in open(paths[0]).read()
+
+
+def test_profiler_samples_greenlets_under_gevent(tmp_path):
+    # monkey-patch süreç genelidir; ayrı yorumlayıcıda çalıştırılır
+    script = textwrap.dedent(f"""
+        from gevent import monkey; monkey.patch_all()
+        import sys, time, gevent
+        sys.path.insert(0, {BACKEND!r})
+        from services.metrics import SlowRequestProfiler
+
+        def waiting(profiler):
+            profiler.begin(); gevent.sleep(0.3); return profiler.end('/api/wait', 0.3)
+
+        def busy(profiler):
+            profiler.begin()
+            end = time.perf_counter() + 0.3
+            while time.perf_counter() < end:
+                pass
+            return profiler.end('/api/busy', 0.3)
+
+        profiler = SlowRequestProfiler(100, 5, {str(tmp_path)!r})
+        jobs = [gevent.spawn(waiting, profiler), gevent.spawn(busy, profiler)]
+        gevent.joinall(jobs)
+        for name, job in zip(('waiting', 'busy'), jobs):
+            print(bool(job.value) and name in open(job.value).read())
+    """)
+    out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.split() == ['True', 'True'], out.stdout
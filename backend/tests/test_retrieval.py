@@ -0,0 +1,48 @@
+from services import retrieval
+
+
+def _docs(upload):
+    upload('kira.txt', 'Kira sözleşmesi yıllık olarak yenilenir ve depozito iki aylık kiradır.')
+    upload('izin.txt', 'Çalışanların yıllık izin hakkı on dört gündür; izin talebi yöneticiye iletilir.')
+
+
+def test_hybrid_retrieval_fuses_both_legs(app, upload):
+    _docs(upload)
+    with app.test_request_context():
+        hits = retrieval.retrieve(1, 'depozito kira', k=2)
+        assert hits[0]['content'].startswith('Kira sözleşmesi')
+        assert set(hits[0]['matched']) == {'vector', 'keyword'}
+        assert hits[0]['score'] > hits[-1]['score']
+
+
+def test_failing_leg_falls_back_to_the_other(app, upload, monkeypatch):
+    _docs(upload)
+    def boom(*args):
+        raise RuntimeError('indeks okunamadı')
+    monkeypatch.setattr(retrieval, '_vector_leg', boom)
+    with app.test_request_context():
+        hits = retrieval.retrieve(1, 'izin talebi', k=2)
+        assert hits and hits[0]['matched'] == ['keyword'] and 'izin' in hits[0]['content']
+
+
+def test_results_are_cached_until_documents_change(app, upload, monkeypatch):
+    _docs(upload)
+    app.config['VERSION_CACHE_TTL'] = 0
+    calls = []
+    original = retrieval._keyword_leg
+    monkeypatch.setattr(retrieval, '_keyword_leg', lambda *a: calls.append(1) or original(*a))
+    with app.test_request_context():
+        first = retrieval.retrieve(1, 'yıllık izin', k=3)
+        assert retrieval.retrieve(1, 'yıllık  izin', k=3) == first and len(calls) == 1
+    upload('izin2.txt', 'Yıllık izin yarım gün olarak da kullanılabilir.')
+    with app.test_request_context():
+        assert len(retrieval.retrieve(1, 'yıllık izin', k=3)) == 3 and len(calls) == 2
+
+
+def test_chat_answer_cites_retrieved_sources(client, auth, upload):
+    _docs(upload)
+    r = client.post('/api/chat/message', headers=auth, json={'message': 'depozito ne kadar?'})
+    data = r.get_json()
+    assert r.status_code == 200, data
+    assert data['sources'][0]['original_filename'] == 'kira.txt' and 'content' not in data['sources'][0]
+    assert 'kira.txt' in data['response']
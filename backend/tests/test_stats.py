@@ -0,0 +1,43 @@
+from models.database import db, CompanyStats
+
+
+def test_stats_follow_uploads(app, client, auth, upload):
+    upload('a.txt', 'bir'); upload('b.txt', 'iki üç')
+    data = client.get('/api/documents/stats', headers=auth).get_json()
+    assert data['total_documents'] == 2 and data['by_file_type']['txt']['total'] == 2
+
+
+def test_stats_without_counters_are_computed_read_only(app, client, auth, upload):
+    upload('a.txt', 'bir'); upload('b.txt', 'iki üç')
+    with app.app_context():
+        CompanyStats.query.delete(); db.session.commit()
+    app.config['STATS_CACHE_TTL'] = 0
+    data = client.get('/api/documents/stats', headers=auth).get_json()
+    assert data['total_documents'] == 2 and data['processed_documents'] == 2
+    assert data['storage_used'] == len('bir') + len('iki üç'.encode())
+    with app.app_context():
+        assert CompanyStats.query.count() == 0  # GET yazmaz
+
+
+
+def test_company_row_is_locked_before_stats_rows(app, client, auth, upload):
+    from sqlalchemy import event
+    a = upload('a.txt', 'bir')
+    transactions = [[]]
+    def capture(conn, cursor, statement, *args):
+        table = statement.split()[1] if statement.startswith('UPDATE') else None
+        if table in ('companies', 'company_stats'):
+            transactions[-1].append(table)
+    def next_transaction(conn):
+        transactions.append([])
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        event.listen(db.engine, 'commit', next_transaction)
+        try:
+            upload('b.txt', 'iki')
+            assert client.delete(f"/api/documents/delete/{a['id']}", headers=auth).status_code == 200
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+            event.remove(db.engine, 'commit', next_transaction)
+    locked = [t for t in transactions if 'company_stats' in t]
+    assert len(locked) >= 2 and all(t[0] == 'companies' for t in locked)
@@ -0,0 +1,60 @@
+import hashlib, os, threading
+
+from models.database import db, FileBlob
+from services import storage
+
+
+def _put(sha, data):
+    tmp = storage.new_temp_path()
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    return storage.put_blob(tmp, sha, len(data))
+
+
+def test_shared_blob_survives_until_last_reference(app, client, auth, upload):
+    a, b = upload('a.txt', 'aynı içerik'), upload('b.txt', 'aynı içerik')
+    with app.app_context():
+        blob = FileBlob.query.one()
+        assert blob.ref_count == 2
+        path = storage.blob_path(blob.content_hash)
+    assert client.delete(f"/api/documents/delete/{a['id']}", headers=auth).status_code == 200
+    assert os.path.exists(path)
+    assert client.delete(f"/api/documents/delete/{b['id']}", headers=auth).status_code == 200
+    assert not os.path.exists(path)
+    with app.app_context():
+        assert FileBlob.query.count() == 0
+
+
+def test_unlink_keeps_blob_reuploaded_after_release(app):
+    data = b'yeniden yuklenen'
+    sha = hashlib.sha256(data).hexdigest()
+    with app.app_context():
+        path, _ = _put(sha, data); db.session.commit()
+        dead = storage.release_blobs({sha: 1}); db.session.commit()
+        assert dead == [path]
+        _put(sha, data); db.session.commit()
+        storage.unlink_blobs(dead)
+        assert os.path.exists(path)
+
+
+def test_unlink_waits_for_uncommitted_upload(app):
+    data = b'eszamanli yukleme'
+    sha = hashlib.sha256(data).hexdigest()
+    with app.app_context():
+        path, _ = _put(sha, data); db.session.commit()
+        dead = storage.release_blobs({sha: 1}); db.session.commit()
+        _put(sha, data)  # commit edilmemiş yükleme kilidi tutuyor
+
+        def unlink():
+            with app.app_context():
+                storage.unlink_blobs(dead)
+                db.session.remove()
+        t = threading.Thread(target=unlink)
+        t.start()
+        t.join(0.3)
+        assert t.is_alive() and os.path.exists(path)
+        db.session.commit()
+        t.join(10)
+        assert not t.is_alive()
+        assert os.path.exists(path)
+        assert FileBlob.query.filter_by(content_hash=sha).one().ref_count == 1
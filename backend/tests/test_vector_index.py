@@ -0,0 +1,51 @@
+import multiprocessing
+
+import numpy as np
+
+from services.vector_index import IVFIndex
+
+DIM = 8
+
+
+def _writer(path, start, n):
+    index = IVFIndex(path, DIM)
+    rng = np.random.default_rng(start)
+    for i in range(start, start + n):
+        index.add([i], rng.standard_normal((1, DIM)).astype(np.float32))
+
+
+def test_concurrent_process_writes_are_not_lost(tmp_path):
+    path = str(tmp_path / 'idx')
+    IVFIndex(path, DIM)
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=_writer, args=(path, start, 40)) for start in (0, 1000, 2000)]
+    for p in procs: p.start()
+    for p in procs: p.join(60)
+    assert all(p.exitcode == 0 for p in procs)
+    index = IVFIndex(path, DIM)
+    assert sorted(index.delta_ids.tolist()) == sorted(list(range(0, 40)) + list(range(1000, 1040)) + list(range(2000, 2040)))
+
+
+def test_add_is_idempotent_and_remove_replays_are_noops(tmp_path):
+    index = IVFIndex(str(tmp_path / 'idx'), DIM, delta_limit=3)
+    vecs = np.eye(DIM, dtype=np.float32)[:4]
+    index.add([1, 2, 3, 4], vecs)  # delta_limit aşıldı -> ana diziye birleşir
+    index.add([1, 2], vecs[:2])
+    assert len(index) == 4
+    index.remove([2])
+    gen = index.manifest['delta_gen']
+    index.remove([2])
+    assert index.manifest['delta_gen'] == gen
+    assert [i for i, _ in index.search(vecs[1], k=4)] != [] and 2 not in [i for i, _ in index.search(vecs[1], k=4)]
+
+
+def test_readded_id_is_searchable_and_replaces_old_vector(tmp_path):
+    index = IVFIndex(str(tmp_path / 'idx'), DIM, delta_limit=3)
+    vecs = np.eye(DIM, dtype=np.float32)[:4]
+    index.add([1, 2, 3, 4], vecs)
+    index.remove([2])
+    index.add([2], vecs[3:4])  # aynı id, farklı içerik (yeniden kullanılan rowid)
+    assert dict(index.search(vecs[1], k=8)).get(2, 0) < 0.5  # eski vektör gizli
+    assert {i for i, _ in index.search(vecs[3], k=2)} == {2, 4} and len(index) == 4
+    index.add([5, 6, 7], np.eye(DIM, dtype=np.float32)[4:7])  # birleştirme: eski vektör düşer
+    assert list(index.main_ids).count(2) == 1 and 2 in {i for i, _ in index.search(vecs[3], k=2)}
@@ -0,0 +1,29 @@
+"""Üretim WSGI girişi:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+SERVER_MODE=gevent (varsayılan) her bağlantıyı bir greenlet'te karşılar; açık SSE akışları ve
+yavaş yüklemeler thread tutmaz. Bu modda web süreçleri CPU işi yapmaz: çıkarma ve indeksleme
+ayrı `flask --app app extraction-worker` süreç havuzunda, parola hash'i ve sorgu embedding'i
+gevent'in thread havuzunda (services.offload) çalışır.
+"""
+import logging
+
+from app import create_app, start_background
+from services.offload import gevent_active
+
+app = create_app()
+
+if gevent_active():
+    if app.config.get('EXTRACTION_RUNNER') != 'external':
+        raise RuntimeError("gevent modunda EXTRACTION_RUNNER=external olmalı; "
+                           "çıkarma için ayrıca 'flask --app app extraction-worker' çalıştırın")
+    try:
+        # psycopg2 soket beklemelerini gevent'e devret; yoksa her sorgu tüm worker'ı bloklar
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+            logging.getLogger(__name__).warning("psycogreen kurulu değil: PostgreSQL sorguları gevent döngüsünü bloklar")
+else:
+    start_background(app)
@@ -4,6 +4,7 @@ const API_BASE_URL = 'http://127.0.0.1:5000';
 // Global Variables
 let currentUser = null;
 let authToken = localStorage.getItem('authToken');
+let currentChatSessionId = null;
 
 // Initialize App
 document.addEventListener('DOMContentLoaded', function() {
@@ -302,9 +303,15 @@ function updateDashboardStats(stats) {
 }
 
 // Documents Functions
-async function loadDocuments() {
+let documentsCursor = null;
+
+async function loadDocuments(append = false) {
     try {
-        const response = await fetch(`${API_BASE_URL}/api/documents/list`, {
+        // Liste sayfalıdır; sonraki sayfa next_cursor ile istenir
+        const params = new URLSearchParams({ limit: 50 });
+        if (append && documentsCursor) params.set('cursor', documentsCursor);
+        
+        const response = await fetch(`${API_BASE_URL}/api/documents/list?${params}`, {
             headers: {
                 'Authorization': `Bearer ${authToken}`,
                 'Content-Type': 'application/json'
@@ -313,7 +320,8 @@ async function loadDocuments() {
         
         if (response.ok) {
             const data = await response.json();
-            displayDocuments(data.documents);
+            documentsCursor = data.next_cursor;
+            displayDocuments(data.documents, append);
         }
     } catch (error) {
         console.error('Load documents error:', error);
@@ -321,10 +329,12 @@ async function loadDocuments() {
     }
 }
 
-function displayDocuments(documents) {
+function displayDocuments(documents, append = false) {
     const grid = document.getElementById('documentsGrid');
+    const moreButton = document.getElementById('loadMoreDocuments');
+    if (moreButton) moreButton.remove();
     
-    if (!documents || documents.length === 0) {
+    if (!append && (!documents || documents.length === 0)) {
         grid.innerHTML = `
             <div class="col-12">
                 <div class="text-center py-5">
@@ -340,19 +350,19 @@ function displayDocuments(documents) {
         return;
     }
     
-    grid.innerHTML = documents.map(doc => `
+    const cards = documents.map(doc => `
         <div class="col-md-6 col-lg-4">
             <div class="document-card">
                 <div class="card-body">
                     <div class="document-icon">
                         <i class="fas fa-${getFileIcon(doc.file_type)}"></i>
                     </div>
-                    <h5 class="card-title">${doc.filename}</h5>
+                    <h5 class="card-title">${doc.original_filename || doc.filename}</h5>
                     <p class="card-text text-muted">
                         <small>${formatFileSize(doc.file_size)} • ${formatDate(doc.upload_date)}</small>
                     </p>
                     <div class="d-flex gap-2">
-                        <button class="btn btn-sm btn-outline-primary" onclick="downloadDocument('${doc.id}', '${doc.filename}')">
+                        <button class="btn btn-sm btn-outline-primary" onclick="downloadDocument('${doc.id}', '${doc.original_filename || doc.filename}')">
                             <i class="fas fa-download"></i>
                         </button>
                         <button class="btn btn-sm btn-outline-danger" onclick="deleteDocument('${doc.id}')">
@@ -363,6 +373,20 @@ function displayDocuments(documents) {
             </div>
         </div>
     `).join('');
+    
+    if (append) {
+        grid.insertAdjacentHTML('beforeend', cards);
+    } else {
+        grid.innerHTML = cards;
+    }
+    
+    if (documentsCursor) {
+        grid.insertAdjacentHTML('beforeend', `
+            <div id="loadMoreDocuments" class="col-12 text-center">
+                <button class="btn btn-outline-secondary" onclick="loadDocuments(true)">Daha fazla yükle</button>
+            </div>
+        `);
+    }
 }
 
 // File Upload Functions
@@ -545,11 +569,27 @@ async function deleteDocument(docId) {
     }
 }
 
-function downloadDocument(docId, filename) {
-    const link = document.createElement('a');
-    link.href = `${API_BASE_URL}/api/documents/download/${docId}`;
-    link.download = filename;
-    link.click();
+async function downloadDocument(docId, filename) {
+    try {
+        // Tarayıcı indirmesi Authorization başlığı gönderemez; kısa ömürlü imzalı bağlantı alınır
+        const response = await fetch(`${API_BASE_URL}/api/documents/${docId}/download-url`, {
+            headers: {
+                'Authorization': `Bearer ${authToken}`
+            }
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            showError(data.error || 'İndirme başarısız');
+            return;
+        }
+        const link = document.createElement('a');
+        link.href = `${API_BASE_URL}${data.url}`;
+        link.download = filename;
+        link.click();
+    } catch (error) {
+        console.error('Download error:', error);
+        showError('İndirme sırasında hata oluştu');
+    }
 }
 
 // Chat Functions
@@ -578,19 +618,60 @@ async function handleChatMessage(e) {
             method: 'POST',
             headers: {
                 'Authorization': `Bearer ${authToken}`,
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
             },
-            body: JSON.stringify({ message })
+            body: JSON.stringify({ message, session_id: currentChatSessionId })
         });
         
-        removeTypingIndicator(typingId);
-        
-        if (response.ok) {
-            const data = await response.json();
-            addChatMessage(data.response, 'ai');
-        } else {
+        if (!response.ok || !response.body) {
+            removeTypingIndicator(typingId);
             addChatMessage('Üzgünüm, şu anda yanıt veremiyorum. Lütfen daha sonra tekrar deneyin.', 'ai');
+            return;
         }
+        
+        // Yanıt SSE olarak token token gelir; ilk token'da yazıyor göstergesi kalkar
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let answerEl = null;
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let sep;
+            while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+                
+                let event = 'message';
+                let data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (!data) continue;
+                const payload = JSON.parse(data);
+                
+                if (event === 'meta') {
+                    currentChatSessionId = payload.session_id;
+                } else if (event === 'error') {
+                    removeTypingIndicator(typingId);
+                    addChatMessage(payload.error, 'ai');
+                } else if (payload.token !== undefined) {
+                    if (!answerEl) {
+                        removeTypingIndicator(typingId);
+                        answerEl = addChatMessage('', 'ai');
+                    }
+                    answerEl.textContent += payload.token;
+                    const messagesContainer = document.getElementById('chatMessages');
+                    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+                }
+            }
+        }
+        removeTypingIndicator(typingId);
     } catch (error) {
         console.error('Chat error:', error);
         removeTypingIndicator(typingId);
@@ -612,6 +693,8 @@ function addChatMessage(content, type) {
     
     messagesContainer.appendChild(messageDiv);
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    
+    return messageDiv.querySelector('.message-content p');
 }
 
 function addTypingIndicator() {